@@ -7,8 +7,12 @@ from datetime import datetime
 from colorama import init, Fore, Style
 from llm_reasoner.llm_client import query_model
 
-HISTORY_LOG = "logs/admin_history.json"
-RULE_LOG = "logs/test_pf.conf"
+# Anchored to the repo root so the backend, which runs from backend/ and calls
+# run_once in-process, writes to the same logs as the CLI
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_LOG = os.path.join(BASE_DIR, "logs", "admin_history.json")
+RULE_LOG = os.path.join(BASE_DIR, "logs", "test_pf.conf")
+LLM_CACHE = os.path.join(BASE_DIR, "logs", "llm_cache.db")
 
 # Initialize colorama
 init(autoreset=True)
@@ -52,7 +56,8 @@ def run_once(user_input: str) -> dict:
                 "→ ADD 192.168.1.25 TO TABLE suspicious_ips\n"
                 "→ block in quick on en0 proto tcp from 203.0.113.7 to any port 22\n"
                 "→ pass in quick on en0 proto tcp from any to any port 443"
-            )
+            ),
+            cache_path=LLM_CACHE
         )
     except Exception as e:
         return {
@@ -95,7 +100,7 @@ def run_once(user_input: str) -> dict:
         "status": "success" if actions_applied else "no-valid-actions"
     }
 
-    os.makedirs("logs", exist_ok=True)
+    os.makedirs(os.path.dirname(HISTORY_LOG), exist_ok=True)
     with open(HISTORY_LOG, "a") as f:
         f.write(json.dumps(log_entry) + "\n")
 
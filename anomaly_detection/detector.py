@@ -1,26 +1,54 @@
-import statistics
+import operator
+from flow_sniffer.flow_table import FlowStats, format_flow_id
+
+# Threshold rules, checked in order; a flow is reported for the first rule it
+# matches. Conditions are (feature, op, value) over the FEATURES below, so the
+# per-flow loop and the vectorized detector evaluate the same table.
+RULES = [
+    {"name": "syn_flood",
+     "when": [("syn", ">", 10), ("packets", "<", 15)],
+     "reason": "Possible SYN flood: {syn:.0f} SYNs, {packets:.0f} packets"},
+    {"name": "small_packet_spam",
+     "when": [("mean_size", "<", 60), ("packets", ">", 100)],
+     "reason": "Suspicious small-packet spam: avg size {mean_size:.1f}"},
+]
+
+FEATURES = FlowStats.__slots__ + ("mean_size", "duration")
+OPS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le,
+       "==": operator.eq, "!=": operator.ne}
+
+# Below this many flows building the feature matrix costs more than it saves
+VECTOR_MIN_FLOWS = 5000
+
+
+def flow_features(stats):
+    return {name: getattr(stats, name) for name in FEATURES}
 
-def analyze_flows(flow_data):
-    suspicious_flows = []
 
-    for flow_id, packets in flow_data.items():
-        pkt_count = len(packets)
-        total_bytes = sum(pkt["length"] for pkt in packets)
-        avg_pkt_size = total_bytes / pkt_count if pkt_count else 0
+def rule_matches(rule, stats):
+    return all(OPS[op](getattr(stats, feature), value) for feature, op, value in rule["when"])
 
-        flag_counts = {"SYN": 0, "ACK": 0, "FIN": 0}
-        for pkt in packets:
-            flags = pkt.get("flags", "").upper()
-            for flag in flag_counts:
-                if flag in flags:
-                    flag_counts[flag] += 1
 
-        if flag_counts["SYN"] > 10 and pkt_count < 15:
-            reason = f"Possible SYN flood: {flag_counts['SYN']} SYNs, {pkt_count} packets"
-            suspicious_flows.append((flow_id, reason))
+def format_reason(rule, features):
+    return rule["reason"].format(**features)
 
-        elif avg_pkt_size < 60 and pkt_count > 100:
-            reason = f"Suspicious small-packet spam: avg size {avg_pkt_size:.1f}"
-            suspicious_flows.append((flow_id, reason))
+
+def analyze_flows_loop(flow_data, rules=RULES):
+    suspicious_flows = []
+
+    for flow_key, stats in flow_data.items():
+        for rule in rules:
+            if rule_matches(rule, stats):
+                suspicious_flows.append((format_flow_id(flow_key), format_reason(rule, flow_features(stats))))
+                break
 
     return suspicious_flows
+
+
+def analyze_flows(flow_data, rules=RULES):
+    if len(flow_data) >= VECTOR_MIN_FLOWS:
+        from .vector_detector import analyze_flows_vectorized
+        suspicious_flows = analyze_flows_vectorized(flow_data, rules)
+        if suspicious_flows is not None:
+            return suspicious_flows
+    return analyze_flows_loop(flow_data, rules)
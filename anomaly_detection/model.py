@@ -0,0 +1,430 @@
+import csv
+import glob
+import hashlib
+import json
+import math
+import os
+import struct
+from collections import OrderedDict
+from datetime import datetime
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from flow_sniffer.flow_logger import FLOW_LOG_DIR, read_flow_log
+from flow_sniffer.flow_table import FlowStats, format_flow_id
+
+BASELINE_PATH = "logs/baseline_model.bin"
+
+METRICS = ("packet rate", "byte rate", "SYN ratio")
+UNITS = (" pkt/s", " B/s", "")
+# Smallest standard deviation used for scoring, per metric, so a host with a
+# perfectly steady history doesn't flag on the first tiny wobble.
+STD_FLOORS = (1.0, 512.0, 0.05)
+# Very short flows would otherwise produce absurd rates
+MIN_DURATION = 1.0
+
+HEADER = struct.Struct("<4sHdI")
+ENTRY = struct.Struct("<3d3dId")
+MAGIC = b"AFBL"
+VERSION = 1
+KINDS = ("src", "dport")
+
+
+def flow_metrics(stats):
+    duration = max(stats.duration, MIN_DURATION)
+    syn_ratio = stats.syn / stats.packets if stats.packets else 0.0
+    return stats.packets / duration, stats.bytes / duration, syn_ratio
+
+
+class Baseline:
+    # EWMA mean and variance of each metric for one host or port
+    __slots__ = ("mean", "var", "count", "last_seen")
+
+    def __init__(self, mean=None, var=None, count=0, last_seen=0.0):
+        self.mean = mean or [0.0] * len(METRICS)
+        self.var = var or [0.0] * len(METRICS)
+        self.count = count
+        self.last_seen = last_seen
+
+    def zscores(self, values):
+        scores = []
+        for i, x in enumerate(values):
+            std = max(math.sqrt(self.var[i]), STD_FLOORS[i], 0.1 * abs(self.mean[i]))
+            scores.append((x - self.mean[i]) / std)
+        return scores
+
+    def update(self, values, alpha, ts):
+        if self.count == 0:
+            self.mean = list(values)
+        else:
+            for i, x in enumerate(values):
+                diff = x - self.mean[i]
+                incr = alpha * diff
+                self.mean[i] += incr
+                self.var[i] = (1 - alpha) * (self.var[i] + diff * incr)
+        self.count += 1
+        if ts > self.last_seen:
+            self.last_seen = ts
+
+
+class BaselineModel:
+    # Online per-source-host and per-destination-port baselines. Each flow is
+    # scored against the baselines it belongs to and then folded into them,
+    # both in constant time. Least recently seen entries are evicted once
+    # max_entries is reached.
+
+    def __init__(self, alpha=0.05, threshold=4.0, min_samples=10, max_entries=50000):
+        self.alpha = alpha
+        self.threshold = threshold
+        self.min_samples = min_samples
+        self.max_entries = max_entries
+        self.baselines = OrderedDict()
+        self.evicted = 0
+
+    def _get(self, key):
+        baseline = self.baselines.get(key)
+        if baseline is None:
+            baseline = self.baselines[key] = Baseline()
+            if len(self.baselines) > self.max_entries:
+                self.baselines.popitem(last=False)
+                self.evicted += 1
+        else:
+            self.baselines.move_to_end(key)
+        return baseline
+
+    def observe(self, flow_key, stats):
+        # Returns [(kind, key, metric index, value, z-score, mean)] for every
+        # metric that is above its baseline by more than the threshold.
+        src, _, _, dport, _ = flow_key
+        values = flow_metrics(stats)
+        deviations = []
+        for key in (("src", src), ("dport", str(dport))):
+            baseline = self._get(key)
+            if baseline.count >= self.min_samples:
+                for i, z in enumerate(baseline.zscores(values)):
+                    if z > self.threshold:
+                        deviations.append((key[0], key[1], i, values[i], z, baseline.mean[i]))
+            baseline.update(values, self.alpha, stats.last_seen)
+        return deviations
+
+    def score_flows(self, flows):
+        # flows: dict or iterable of (flow_key, FlowStats), in arrival order
+        items = flows.items() if isinstance(flows, dict) else flows
+        anomalies = []
+        for flow_key, stats in items:
+            if isinstance(flow_key, str):
+                continue
+            deviations = self.observe(flow_key, stats)
+            if deviations:
+                kind, key, i, value, z, mean = max(deviations, key=lambda d: d[4])
+                reason = (f"Baseline deviation for {kind} {key}: {METRICS[i]} {value:.2f}{UNITS[i]} "
+                          f"(z={z:.1f}, usual {mean:.2f})")
+                anomalies.append((format_flow_id(flow_key), reason))
+        return anomalies
+
+    def save(self, path=BASELINE_PATH):
+        # Compact binary layout: header, then per entry the kind, the key and
+        # six doubles + count + last_seen.
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.alpha, len(self.baselines)))
+            for (kind, key), baseline in self.baselines.items():
+                raw = key.encode("utf-8")
+                f.write(struct.pack("<BB", KINDS.index(kind), len(raw)) + raw)
+                f.write(ENTRY.pack(*baseline.mean, *baseline.var, baseline.count, baseline.last_seen))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=BASELINE_PATH, **kwargs):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, alpha, count = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} baseline file")
+
+        kwargs.setdefault("alpha", alpha)
+        model = cls(**kwargs)
+        pos = HEADER.size
+        for _ in range(count):
+            kind, length = struct.unpack_from("<BB", data, pos)
+            pos += 2
+            key = data[pos:pos + length].decode("utf-8")
+            pos += length
+            values = ENTRY.unpack_from(data, pos)
+            pos += ENTRY.size
+            n = len(METRICS)
+            model.baselines[(KINDS[kind], key)] = Baseline(list(values[:n]), list(values[n:2 * n]),
+                                                           values[2 * n], values[2 * n + 1])
+        # Entries beyond a smaller max_entries are the least recently seen ones
+        while len(model.baselines) > model.max_entries:
+            model.baselines.popitem(last=False)
+        return model
+
+
+def load_baseline(path=BASELINE_PATH, **kwargs):
+    if os.path.exists(path):
+        try:
+            return BaselineModel.load(path, **kwargs)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"[!] Could not load baseline model ({e}), starting a new one")
+    return BaselineModel(**kwargs)
+
+
+# Isolation forest trained on historical flow logs
+
+MODEL_DIR = "logs/models/isoforest"
+# Legacy CSV exports, read in addition to the binary flow log
+FLOW_LOGS = ("logs/flow_log.csv", "logs/pcap_flow_log.csv")
+TREE_ARRAYS = ("feature", "threshold", "left", "right", "leaf_value")
+MODEL_FEATURES = ("log_packets", "log_bytes", "log_mean_size", "log_size_range", "syn_ratio", "ack_ratio",
+                  "fin_ratio", "rst_ratio", "log_duration", "log_packet_rate")
+EULER_GAMMA = 0.5772156649015329
+
+
+def average_path_length(n):
+    # Expected depth of an unsuccessful BST search over n points, used to
+    # normalise path lengths and to credit leaves that still hold n samples
+    n = np.asarray(n, dtype=np.float64)
+    result = np.zeros_like(n)
+    result[n == 2] = 1.0
+    big = n > 2
+    result[big] = 2.0 * (np.log(n[big] - 1.0) + EULER_GAMMA) - 2.0 * (n[big] - 1.0) / n[big]
+    return result
+
+
+def model_features(matrix):
+    # matrix has the vector_detector column layout (one row per flow)
+    from .vector_detector import COLUMNS
+    col = lambda name: matrix[:, COLUMNS[name]]
+    packets = np.maximum(col("packets"), 1.0)
+    duration = np.maximum(col("duration"), 0.0)
+    return np.column_stack([
+        np.log1p(col("packets")),
+        np.log1p(col("bytes")),
+        np.log1p(col("mean_size")),
+        np.log1p(np.maximum(col("max_size") - col("min_size"), 0.0)),
+        col("syn") / packets,
+        col("ack") / packets,
+        col("fin") / packets,
+        col("rst") / packets,
+        np.log1p(duration),
+        np.log1p(col("packets") / np.maximum(duration, MIN_DURATION)),
+    ])
+
+
+def _epoch(value):
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def _flows_from_csv(path, since=None, until=None):
+    # Older flow_logger CSV exports
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            try:
+                stats = FlowStats(_epoch(row["first_seen"]))
+                stats.last_seen = _epoch(row["last_seen"])
+                for name in ("packets", "bytes", "min_size", "max_size", "syn", "ack", "fin", "rst"):
+                    setattr(stats, name, int(float(row[name])))
+            except (KeyError, TypeError, ValueError):
+                continue
+            if (since is None or stats.last_seen >= since) and (until is None or stats.last_seen <= until):
+                yield row.get("flow_id", ""), stats
+
+
+def load_flow_logs(paths=None, since=None, until=None):
+    # Reads the binary flow log (directories) and/or flow CSVs into (flow
+    # ids, feature matrix) with the column layout build_feature_matrix uses
+    # for live flow tables
+    from .vector_detector import build_feature_matrix
+    if paths is None:
+        paths = [p for p in (FLOW_LOG_DIR,) + FLOW_LOGS if os.path.exists(p)]
+    elif isinstance(paths, str):
+        paths = sorted(glob.glob(paths)) or [paths]
+
+    records = []
+    for path in paths:
+        if os.path.isdir(path):
+            records.extend(read_flow_log(path, since, until))
+        else:
+            records.extend(_flows_from_csv(path, since, until))
+    keys, matrix = build_feature_matrix(records)
+    return [format_flow_id(key) for key in keys], matrix
+
+
+class IsolationForest:
+    # Trees are stored as flat per-tree arrays padded to the same node count:
+    # split feature (-1 for leaves), threshold, child indices, and for leaves
+    # the depth plus the expected remaining depth for the samples left there.
+    # Inference walks all trees over a whole batch of rows at once.
+
+    def __init__(self, n_trees=100, sample_size=256, seed=42):
+        self.n_trees = n_trees
+        self.sample_size = sample_size
+        self.seed = seed
+        self.arrays = {}
+        self.threshold = None
+        self.max_depth = 0
+
+    def fit(self, X, contamination=0.01):
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(self.sample_size, len(X))
+        self.max_depth = int(np.ceil(np.log2(max(sample_size, 2))))
+        trees = [self._build_tree(X[rng.choice(len(X), sample_size, replace=False)], rng)
+                 for _ in range(self.n_trees)]
+
+        width = max(len(tree["feature"]) for tree in trees)
+        fill = {"feature": -1, "threshold": 0.0, "left": 0, "right": 0, "leaf_value": 0.0}
+        dtypes = {"feature": np.int32, "threshold": np.float64, "left": np.int32, "right": np.int32,
+                  "leaf_value": np.float64}
+        self.arrays = {}
+        for name in TREE_ARRAYS:
+            array = np.full((self.n_trees, width), fill[name], dtype=dtypes[name])
+            for t, tree in enumerate(trees):
+                array[t, :len(tree[name])] = tree[name]
+            self.arrays[name] = array
+        self.sample_size = sample_size
+
+        # Flag roughly `contamination` of the training flows
+        self.threshold = float(np.quantile(self.score(X), 1.0 - contamination))
+        return self
+
+    def _build_tree(self, X, rng):
+        tree = {name: [] for name in TREE_ARRAYS}
+
+        def grow(rows, depth):
+            i = len(tree["feature"])
+            for name in TREE_ARRAYS:
+                tree[name].append(0)
+            tree["feature"][i] = -1
+            lo, hi = (rows.min(axis=0), rows.max(axis=0)) if len(rows) else (None, None)
+            splittable = np.flatnonzero(hi > lo) if len(rows) > 1 and depth < self.max_depth else []
+            if len(splittable) == 0:
+                tree["leaf_value"][i] = depth + float(average_path_length([len(rows)])[0])
+                return i
+            f = int(rng.choice(splittable))
+            t = float(rng.uniform(lo[f], hi[f]))
+            mask = rows[:, f] < t
+            tree["feature"][i] = f
+            tree["threshold"][i] = t
+            tree["left"][i] = grow(rows[mask], depth + 1)
+            tree["right"][i] = grow(rows[~mask], depth + 1)
+            return i
+
+        grow(X, 0)
+        return tree
+
+    def score(self, X, batch_size=2048):
+        # Anomaly score in (0, 1]; higher is more isolated. Tree arrays are
+        # indexed flat (tree offset + node) which is much cheaper than 2-D
+        # fancy indexing.
+        flat = {name: np.asarray(self.arrays[name]).ravel() for name in TREE_ARRAYS}
+        width = self.arrays["feature"].shape[1]
+        offsets = (np.arange(self.n_trees, dtype=np.int64) * width)[:, None]
+        norm = float(average_path_length([self.sample_size])[0]) or 1.0
+
+        scores = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), batch_size):
+            batch = np.ascontiguousarray(X[start:start + batch_size], dtype=np.float64)
+            row_offsets = (np.arange(len(batch), dtype=np.int64) * batch.shape[1])[None, :]
+            values_flat = batch.ravel()
+            index = np.broadcast_to(offsets, (self.n_trees, len(batch))).copy()
+            for _ in range(self.max_depth + 1):
+                f = flat["feature"][index]
+                active = f >= 0
+                if not active.any():
+                    break
+                values = values_flat[row_offsets + np.maximum(f, 0)]
+                step = np.where(values < flat["threshold"][index], flat["left"][index], flat["right"][index])
+                index = np.where(active, offsets + step, index)
+            depth = flat["leaf_value"][index].mean(axis=0)
+            scores[start:start + len(batch)] = 2.0 ** (-depth / norm)
+        return scores
+
+    def version(self):
+        h = hashlib.sha256()
+        for name in TREE_ARRAYS:
+            h.update(np.ascontiguousarray(self.arrays[name]).tobytes())
+        return h.hexdigest()[:12]
+
+    def save(self, root=MODEL_DIR, **meta):
+        # Each model gets its own directory named by content hash; LATEST
+        # points at the one detect should use.
+        version = self.version()
+        path = os.path.join(root, version)
+        os.makedirs(path, exist_ok=True)
+        for name in TREE_ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), self.arrays[name])
+        meta.update({
+            "version": version,
+            "features": list(MODEL_FEATURES),
+            "n_trees": self.n_trees,
+            "sample_size": self.sample_size,
+            "max_depth": self.max_depth,
+            "seed": self.seed,
+            "threshold": self.threshold,
+        })
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+        tmp_path = os.path.join(root, "LATEST.tmp")
+        with open(tmp_path, "w") as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(root, "LATEST"))
+        return path
+
+    @classmethod
+    def load(cls, root=MODEL_DIR, version=None):
+        if version is None:
+            with open(os.path.join(root, "LATEST")) as f:
+                version = f.read().strip()
+        path = os.path.join(root, version)
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("features") != list(MODEL_FEATURES):
+            raise ValueError(f"model {version} was trained on a different feature set")
+
+        model = cls(meta["n_trees"], meta["sample_size"], meta["seed"])
+        model.max_depth = meta["max_depth"]
+        model.threshold = meta["threshold"]
+        # Memory-mapped: loading is just opening the files
+        model.arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in TREE_ARRAYS}
+        model.meta = meta
+        return model
+
+    def detect(self, flow_data, batch_size=2048):
+        from .vector_detector import build_feature_matrix
+        if not flow_data:
+            return []
+        keys, matrix = build_feature_matrix(flow_data)
+        scores = self.score(model_features(matrix), batch_size)
+        return [(format_flow_id(keys[i]), f"Isolation forest outlier: score {scores[i]:.3f} "
+                                          f"(threshold {self.threshold:.3f})")
+                for i in np.flatnonzero(scores > self.threshold).tolist()]
+
+
+def train_flow_model(paths=None, since=None, until=None, n_trees=100, sample_size=256, seed=42, contamination=0.01,
+                     root=MODEL_DIR):
+    if np is None:
+        raise ImportError("numpy is required to train the flow model")
+    ids, matrix = load_flow_logs(paths, since, until)
+    if len(ids) < 2:
+        raise ValueError("not enough flow records to train on")
+    model = IsolationForest(n_trees, sample_size, seed).fit(model_features(matrix), contamination)
+    path = model.save(root, trained=datetime.now().isoformat(), flows=len(ids), contamination=contamination)
+    return model, path
+
+
+def load_flow_model(root=MODEL_DIR, version=None):
+    if np is None or not os.path.exists(os.path.join(root, "LATEST" if version is None else version)):
+        return None
+    try:
+        return IsolationForest.load(root, version)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[!] Could not load flow model ({e})")
+        return None
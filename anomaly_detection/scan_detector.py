@@ -0,0 +1,144 @@
+from collections import OrderedDict
+
+from .sketches import HyperLogLog, CountMinSketch, hash64
+
+EPHEMERAL_PORTS = 1024
+
+
+class SourceWindow:
+    # Distinct destination hosts and ports seen from one source, for the
+    # current and the previous window. Estimates cover both, so the detector
+    # looks back between one and two windows.
+    __slots__ = ("epoch", "hosts", "ports", "prev_hosts", "prev_ports", "reported")
+
+    def __init__(self, epoch, precision):
+        self.epoch = epoch
+        self.hosts = HyperLogLog(precision)
+        self.ports = HyperLogLog(precision)
+        self.prev_hosts = None
+        self.prev_ports = None
+        self.reported = None
+
+    def rotate(self, epoch, precision):
+        if epoch == self.epoch:
+            return
+        if epoch == self.epoch + 1:
+            self.prev_hosts, self.prev_ports = self.hosts, self.ports
+        else:
+            self.prev_hosts = self.prev_ports = None
+        self.hosts = HyperLogLog(precision)
+        self.ports = HyperLogLog(precision)
+        self.epoch = epoch
+
+    def distinct(self):
+        hosts = self.hosts.union(self.prev_hosts) if self.prev_hosts else self.hosts
+        ports = self.ports.union(self.prev_ports) if self.prev_ports else self.ports
+        return hosts.count(), ports.count()
+
+
+class ScanDetector:
+    # Per-source fan-out over a sliding window of two rotating buckets:
+    #  - horizontal scan: one source reaching many hosts on few ports
+    #  - vertical scan: one source reaching many ports on few hosts
+    # Memory is fixed: one HyperLogLog pair per tracked source (LRU-bounded)
+    # and a count-min sketch per bucket for per-source packet counts.
+
+    def __init__(self, window=60, host_threshold=50, port_threshold=100, max_sources=10000, precision=8,
+                 cms_width=2048, cms_depth=4):
+        self.window = window
+        self.host_threshold = host_threshold
+        self.port_threshold = port_threshold
+        self.max_sources = max_sources
+        self.precision = precision
+        self.cms_shape = (cms_width, cms_depth)
+        self.sources = OrderedDict()
+        self.epoch = None
+        self.packets = CountMinSketch(*self.cms_shape)
+        self.prev_packets = None
+        self.dirty = {}
+        # Findings from windows that rotated out while a batch was observed
+        self.pending = []
+
+    def _rotate(self, epoch):
+        if self.epoch is None:
+            self.epoch = epoch
+        elif epoch > self.epoch:
+            self.prev_packets = self.packets if epoch == self.epoch + 1 else None
+            self.packets = CountMinSketch(*self.cms_shape)
+            self.epoch = epoch
+
+    def observe(self, flow_key, stats):
+        if isinstance(flow_key, str):
+            return
+        src, sport, dst, dport, _ = flow_key
+        if sport < EPHEMERAL_PORTS <= dport:
+            # Flow keys are one-directional; a service answering many clients
+            # would otherwise look like it is sweeping their ephemeral ports
+            return
+        # Late flows are counted in the current bucket rather than reopening
+        # an old one
+        epoch = max(int(stats.last_seen // self.window), self.epoch or 0)
+        if self.epoch is not None and epoch > self.epoch and self.dirty:
+            # Sources are evaluated before the window they were seen in is
+            # dropped, so a long replay doesn't only report its last windows
+            self.pending += self.findings()
+        self._rotate(epoch)
+
+        source = self.sources.get(src)
+        if source is None:
+            source = self.sources[src] = SourceWindow(epoch, self.precision)
+            if len(self.sources) > self.max_sources:
+                evicted, _ = self.sources.popitem(last=False)
+                self.dirty.pop(evicted, None)
+        else:
+            self.sources.move_to_end(src)
+            source.rotate(epoch, self.precision)
+
+        source.hosts.add_hash(hash64(dst))
+        source.ports.add_hash(hash64(dport))
+        self.packets.add(src, stats.packets)
+        self.dirty[src] = None
+
+    def packet_estimate(self, src):
+        count = self.packets.estimate(src)
+        if self.prev_packets:
+            count += self.prev_packets.estimate(src)
+        return count
+
+    def findings(self):
+        # Evaluates only sources that saw new flows since the last call, and
+        # reports each source at most once per window.
+        results = []
+        for src in self.dirty:
+            source = self.sources.get(src)
+            if source is None:
+                continue
+            source.rotate(self.epoch, self.precision)
+            if source.reported == source.epoch:
+                continue
+            hosts, ports = source.distinct()
+            wide, deep = hosts >= self.host_threshold, ports >= self.port_threshold
+            if not (wide or deep):
+                continue
+            kind = ("Horizontal and vertical scan" if wide and deep
+                    else "Horizontal scan" if wide else "Vertical scan")
+            results.append((f"{src} -> * (scan)",
+                            f"{kind}: ~{hosts:.0f} hosts, ~{ports:.0f} ports, ~{self.packet_estimate(src)} packets "
+                            f"within {self.window * 2}s"))
+            source.reported = source.epoch
+        self.dirty.clear()
+        return results
+
+    def update(self, flows):
+        items = flows.items() if isinstance(flows, dict) else flows
+        # Oldest first so windows rotate forward
+        for flow_key, stats in sorted(items, key=lambda item: item[1].last_seen):
+            self.observe(flow_key, stats)
+        results = self.pending + self.findings()
+        self.pending = []
+        return results
+
+
+def detect_scans(flow_data, detector=None):
+    # Same (flow_id, reason) output as analyze_flows
+    return (detector or ScanDetector()).update(flow_data)
@@ -0,0 +1,101 @@
+import hashlib
+import math
+
+MASK64 = (1 << 64) - 1
+
+
+def hash64(item):
+    if not isinstance(item, bytes):
+        item = str(item).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(item, digest_size=8).digest(), "little")
+
+
+class HyperLogLog:
+    # Distinct-count estimate in 2**precision one-byte registers; the standard
+    # error is about 1.04 / sqrt(2**precision) (6.5% at the default of 8).
+    __slots__ = ("precision", "registers")
+
+    # 2**-rank lookup so count() is a table walk rather than pow() calls
+    INVERSE_POWERS = [2.0 ** -r for r in range(65)]
+
+    def __init__(self, precision=8):
+        if not 4 <= precision <= 16:
+            raise ValueError("HyperLogLog precision must be between 4 and 16")
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, item):
+        self.add_hash(hash64(item))
+
+    def add_hash(self, x):
+        p = self.precision
+        index = x >> (64 - p)
+        rest = x & ((1 << (64 - p)) - 1)
+        rank = (64 - p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m) if m >= 128 else {16: 0.673, 32: 0.697, 64: 0.709}[m]
+        powers = self.INVERSE_POWERS
+        estimate = alpha * m * m / sum(powers[r] for r in self.registers)
+        if estimate <= 2.5 * m:
+            zeros = self.registers.count(0)
+            if zeros:
+                # Linear counting is more accurate while many registers are empty
+                return m * math.log(m / zeros)
+        return estimate
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("cannot merge HyperLogLogs of different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def union(self, other):
+        return self.copy().merge(other)
+
+    def copy(self):
+        clone = HyperLogLog(self.precision)
+        clone.registers = bytearray(self.registers)
+        return clone
+
+    def __len__(self):
+        return int(round(self.count()))
+
+
+class CountMinSketch:
+    # Approximate per-key counters in depth x width cells. Estimates never
+    # undercount; the overcount is at most total / width * e with probability
+    # 1 - e**-depth.
+    __slots__ = ("width", "depth", "rows", "total")
+
+    def __init__(self, width=2048, depth=4):
+        self.width = width
+        self.depth = depth
+        self.rows = [[0] * width for _ in range(depth)]
+        self.total = 0
+
+    def _cells(self, item):
+        # Double hashing: depth independent-enough indexes from one 64-bit hash
+        x = hash64(item)
+        h1, h2 = x & 0xFFFFFFFF, (x >> 32) | 1
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def add(self, item, count=1):
+        for row, cell in zip(self.rows, self._cells(item)):
+            row[cell] += count
+        self.total += count
+
+    def estimate(self, item):
+        return min(row[cell] for row, cell in zip(self.rows, self._cells(item)))
+
+    def merge(self, other):
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("cannot merge count-min sketches of different shape")
+        for row, other_row in zip(self.rows, other.rows):
+            for i, value in enumerate(other_row):
+                row[i] += value
+        self.total += other.total
+        return self
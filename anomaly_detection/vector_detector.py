@@ -0,0 +1,69 @@
+from operator import attrgetter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from flow_sniffer.flow_table import FlowStats, format_flow_id
+from .detector import RULES, FEATURES, OPS, format_reason
+
+# Column layout of the feature matrix: the FlowStats counters in slot order,
+# then the derived columns.
+RAW_FEATURES = FlowStats.__slots__
+COLUMNS = {name: i for i, name in enumerate(FEATURES)}
+
+
+def build_feature_matrix(flow_data):
+    # One row per flow (a dict, or (key, FlowStats) pairs). Column-major,
+    # since every rule reads whole columns.
+    if isinstance(flow_data, dict):
+        keys, values = list(flow_data), list(flow_data.values())
+    else:
+        keys = [key for key, _ in flow_data]
+        values = [stats for _, stats in flow_data]
+    n = len(keys)
+
+    matrix = np.empty((n, len(FEATURES)), dtype=np.float64, order="F")
+    for name in RAW_FEATURES:
+        matrix[:, COLUMNS[name]] = np.fromiter(map(attrgetter(name), values), dtype=np.float64, count=n)
+    packets = matrix[:, COLUMNS["packets"]]
+    np.divide(matrix[:, COLUMNS["bytes"]], packets, out=matrix[:, COLUMNS["mean_size"]], where=packets > 0)
+    matrix[packets == 0, COLUMNS["mean_size"]] = 0.0
+    np.subtract(matrix[:, COLUMNS["last_seen"]], matrix[:, COLUMNS["first_seen"]],
+                out=matrix[:, COLUMNS["duration"]])
+    return keys, matrix
+
+
+def rule_mask(matrix, rule, columns=COLUMNS):
+    mask = np.ones(matrix.shape[0], dtype=bool)
+    for feature, op, value in rule["when"]:
+        mask &= OPS[op](matrix[:, columns[feature]], value)
+    return mask
+
+
+def detect_matrix(matrix, rules=RULES, columns=COLUMNS):
+    # Returns (row indices, rule indices) of flagged rows; like the per-flow
+    # loop, a row is attributed to the first rule it matches.
+    assigned = np.full(matrix.shape[0], -1, dtype=np.int32)
+    for rule_id, rule in enumerate(rules):
+        mask = rule_mask(matrix, rule, columns)
+        mask &= assigned < 0
+        assigned[mask] = rule_id
+    indices = np.flatnonzero(assigned >= 0)
+    return indices, assigned[indices]
+
+
+def analyze_flows_vectorized(flow_data, rules=RULES):
+    if np is None:
+        return None
+
+    keys, matrix = build_feature_matrix(flow_data)
+    indices, rule_ids = detect_matrix(matrix, rules)
+
+    # Reasons are only formatted for the (few) flagged rows
+    suspicious_flows = []
+    for row, rule_id in zip(indices.tolist(), rule_ids.tolist()):
+        features = dict(zip(FEATURES, matrix[row].tolist()))
+        suspicious_flows.append((format_flow_id(keys[row]), format_reason(rules[rule_id], features)))
+    return suspicious_flows
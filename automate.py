@@ -6,8 +6,8 @@ from datetime import datetime
 
 def run_full_pipeline():
     print("\n[🟢] Running full pipeline at:", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-    subprocess.run(["python", "main.py", "alerts"])
-    subprocess.run(["python", "main.py", "explain"])
+    subprocess.run(["python", "main.py", "alerts", "--follow"])
+    subprocess.run(["python", "main.py", "explain", "--mode=combined"])
     subprocess.run(["sudo", "python", "main.py", "enforce"])
     subprocess.run(["python", "report/report_generator.py"])
 
@@ -15,11 +15,13 @@ def run_full_pipeline():
     print("\n[⏱️] Running full pipeline at:", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
 
     # Step 1: Parse alerts
-    subprocess.run(["python", "main.py", "alerts"])
+    subprocess.run(["python", "main.py", "alerts", "--follow"])
 
-    # Step 2: Run LLM summarizer and rulegen
-    subprocess.run(["python", "main.py", "explain", "--mode=summary"])
-    subprocess.run(["python", "main.py", "explain", "--mode=rulegen"])
+    # Step 2: Run LLM summarizer and rulegen in a single pass
+    # (with a 25 minute budget so a flood can't overrun the 30 minute cycle).
+    # Without a window, explain picks up only the alerts stored since its last
+    # run, from logs/explain_checkpoint.json
+    subprocess.run(["python", "main.py", "explain", "--mode=combined", "--time_budget=1500"])
 
     # Step 3: Enforce rules
     subprocess.run(["python", "main.py", "enforce"])
@@ -32,6 +34,10 @@ def run_full_pipeline():
 
     print("[✅] Full pipeline run complete.")
 
+# Expired blocks are lifted by a separate process, so a long pipeline run
+# doesn't hold them back
+expiry_process = subprocess.Popen(["python", "main.py", "expire", "--watch", "--interval=60"])
+
 # Run once immediately
 run_full_pipeline()
 
@@ -1,7 +1,8 @@
 # Step 4: Add POST endpoints to control the firewall
 
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
+from typing import Optional
 import os
 import json
 import subprocess
@@ -22,15 +23,22 @@ def handle_admin_command(cmd: AdminCommand):
         f.write(instruction + "\n")
     print("[📝] Logged to ../logs/admin_actions.txt")
 
-    # Call admin_interface.py logic
-    try:
-        print(f"[⚙️] Invoking admin_interface.py with: {instruction}")
-        result = subprocess.check_output([
-            "sudo", "python3", "../admin_interface.py", "prompt", instruction
-        ], stderr=subprocess.STDOUT).decode()
-        return {"status": "success", "output": result}
-    except subprocess.CalledProcessError as e:
-        return {"status": "error", "output": e.output.decode()}
+    # Queued for admin_interface.run_once in-process; the LLM call can take
+    # seconds, so the request returns the job id right away
+    from jobs import admin_jobs, run_admin_instruction
+    job_id = admin_jobs.submit(run_admin_instruction, instruction, instruction=instruction)
+    print(f"[⚙️] Queued admin job {job_id}")
+    return {"status": "queued", "job_id": job_id}
+
+# Poll with GET /jobs/<id>; `wait` (seconds, at most 60) holds the request
+# until the job finishes, so a client can long-poll instead of looping
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: Optional[float] = None):
+    from jobs import admin_jobs
+    job = await admin_jobs.wait(job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job id")
+    return job
 
 @router.post("/trigger-pipeline")
 def run_pipeline():
@@ -42,21 +50,35 @@ def run_pipeline():
         return {"status": "error", "detail": str(e)}
 
 @router.get("/alerts")
-def get_alerts():
-    from utils.file_loader import load_csv
-    return load_csv("../logs/suricata_alerts.csv")
+def get_alerts(last: Optional[float] = None, since: Optional[str] = None, until: Optional[str] = None,
+               src_ip: Optional[str] = None, dest_ip: Optional[str] = None, signature: Optional[str] = None,
+               severity: Optional[int] = None, max_severity: Optional[int] = None, limit: Optional[int] = None,
+               cursor: Optional[int] = None):
+    from utils.file_loader import load_csv, load_alert_db
+    # Either source returns the newest `limit` alerts with next/prev cursors;
+    # for the store the cursors are alert ids, for the CSV byte offsets
+    if os.path.exists("../logs/alerts.db"):
+        return load_alert_db("../logs/alerts.db", last=last, since=since, until=until, src_ip=src_ip,
+                             dest_ip=dest_ip, signature=signature, severity=severity,
+                             max_severity=max_severity, limit=limit, cursor=cursor)
+    return load_csv("../logs/suricata_alerts.csv", limit=limit, cursor=cursor, since=since)
+
+# Without parameters these return the whole file as before. `limit` alone
+# returns the newest entries; `cursor` (a next_cursor/prev_cursor from an
+# earlier response) pages from there, and `since` keeps entries from that
+# time on. Parsed files are cached until they change.
 
 @router.get("/summaries")
-def get_summaries():
+def get_summaries(limit: Optional[int] = None, cursor: Optional[int] = None, since: Optional[str] = None):
     from utils.file_loader import load_text
-    return load_text("../logs/summary_report.txt")
+    return load_text("../logs/summary_report.txt", limit=limit, cursor=cursor, since=since)
 
 @router.get("/rules")
-def get_rules():
+def get_rules(limit: Optional[int] = None, cursor: Optional[int] = None, since: Optional[str] = None):
     from utils.file_loader import load_text
-    return load_text("../logs/rule_suggestions.txt")
+    return load_text("../logs/rule_suggestions.txt", limit=limit, cursor=cursor, since=since)
 
 @router.get("/history")
-def get_history():
+def get_history(limit: Optional[int] = None, cursor: Optional[int] = None, since: Optional[str] = None):
     from utils.file_loader import load_json_lines
-    return load_json_lines("../logs/admin_history.json")
+    return load_json_lines("../logs/admin_history.json", limit=limit, cursor=cursor, since=since)
@@ -0,0 +1,91 @@
+# jobs.py
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Admin instructions each make an LLM call; this many run at once, the rest
+# wait in the queue instead of holding request threads
+ADMIN_CONCURRENCY = int(os.environ.get("ADMIN_CONCURRENCY", 2))
+# Finished jobs are kept this long (and at most MAX_JOBS of them) for polling
+JOB_TTL = 3600
+MAX_JOBS = 1000
+MAX_WAIT = 60
+
+
+class JobQueue:
+    def __init__(self, workers=ADMIN_CONCURRENCY, ttl=JOB_TTL, max_jobs=MAX_JOBS):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="admin-job")
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.jobs = OrderedDict()
+        self.futures = {}
+        self.lock = threading.Lock()
+
+    def submit(self, fn, *args, **info):
+        job_id = uuid.uuid4().hex
+        job = {"id": job_id, "status": "queued", "submitted": time.time(), "started": None, "finished": None,
+               "result": None, "error": None, **info}
+        with self.lock:
+            self._prune()
+            self.jobs[job_id] = job
+            self.futures[job_id] = self.executor.submit(self._run, job, fn, args)
+        return job_id
+
+    def _run(self, job, fn, args):
+        job["status"] = "running"
+        job["started"] = time.time()
+        try:
+            job["result"] = fn(*args)
+            job["status"] = "done"
+        except Exception as e:
+            job["error"] = str(e)
+            job["status"] = "error"
+        finally:
+            job["finished"] = time.time()
+
+    def _prune(self):
+        now = time.time()
+        for job_id in [j for j, job in self.jobs.items() if job["finished"] and now - job["finished"] > self.ttl]:
+            del self.jobs[job_id]
+            self.futures.pop(job_id, None)
+        finished = [j for j, job in self.jobs.items() if job["finished"]]
+        for job_id in finished[:max(len(self.jobs) - self.max_jobs, 0)]:
+            del self.jobs[job_id]
+            self.futures.pop(job_id, None)
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+            if job["status"] == "queued":
+                # Jobs ahead of this one that have not started yet
+                queued = [j for j, other in self.jobs.items() if other["status"] == "queued"]
+                job["position"] = queued.index(job_id) if job_id in queued else 0
+        return job
+
+    async def wait(self, job_id, timeout):
+        # Long-poll without tying up a thread: the request coroutine sleeps
+        # on the job's future until it finishes or the timeout passes
+        future = self.futures.get(job_id)
+        if future is not None and timeout and timeout > 0:
+            await asyncio.wait({asyncio.wrap_future(future)}, timeout=min(timeout, MAX_WAIT))
+        return self.get(job_id)
+
+
+admin_jobs = JobQueue()
+
+
+def run_admin_instruction(instruction):
+    # admin_interface runs in this process; its module (and the LLM client) is
+    # loaded once instead of starting an interpreter per command
+    from admin_interface import run_once
+    return run_once(instruction)
@@ -3,32 +3,217 @@
 import csv
 import json
 import os
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 
-def load_csv(filepath):
+from suricata_alerts.alert_store import to_epoch
+
+TS_RE = re.compile(r"\[(\d{4}-\d\d-\d\dT[^\]]+)\]")
+SEPARATOR = "==="
+# Bytes kept from just before the parsed end, to tell an append from a
+# rewrite that happens to leave the file larger
+TAIL_BYTES = 64
+# A last line without "\n" is taken as complete once the file has not
+# changed for this long, or is found unchanged on the next look
+SETTLE_SECONDS = 2
+
+# Parsed files by (path, kind). An entry is reused while (mtime, size) is
+# unchanged; when the file only grew, just the appended lines are parsed.
+_cache = {}
+_lock = threading.Lock()
+
+
+class ParsedFile:
+    def __init__(self, st):
+        self.inode = st.st_ino
+        self.mtime = None
+        self.size = None
+        self.end = 0          # bytes consumed (complete lines only)
+        self.tail = b""
+        self.offsets = []     # byte offset where each record starts
+        self.records = []
+        self.ts = []          # epoch per record, for `since`
+        self.header = None
+        # Set while an unterminated last line is parsed: what to restore if
+        # the line turns out to be still growing
+        self.provisional = None
+
+
+def parse_epoch(value):
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return to_epoch(str(value))
+
+
+def parse_csv_line(entry, line, offset):
+    row = next(csv.reader([line]), None)
+    if not row:
+        return
+    if entry.header is None:
+        entry.header = row
+        return
+    record = dict(zip(entry.header, row))
+    entry.offsets.append(offset)
+    entry.records.append(record)
+    entry.ts.append(parse_epoch(record.get("timestamp")))
+
+
+def parse_json_line(entry, line, offset):
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError:
+        return
+    entry.offsets.append(offset)
+    entry.records.append(record)
+    entry.ts.append(parse_epoch(record.get("timestamp")) if isinstance(record, dict) else None)
+
+
+def parse_text_line(entry, line, offset):
+    # One record per "===" block; the first [timestamp] in a block dates it
+    line = line.rstrip("\n")
+    if not entry.records or line.strip() == SEPARATOR:
+        entry.offsets.append(offset)
+        entry.records.append([])
+        entry.ts.append(None)
+    entry.records[-1].append(line)
+    if entry.ts[-1] is None:
+        match = TS_RE.search(line)
+        if match:
+            entry.ts[-1] = to_epoch(match.group(1))
+
+
+PARSERS = {"csv": parse_csv_line, "jsonl": parse_json_line, "text": parse_text_line}
+
+
+def parse_unterminated(entry, parse, raw):
+    # The text parser extends the last block in place, so a copy of it is
+    # kept along with the counts
+    last = entry.records[-1] if entry.records else None
+    entry.provisional = (len(entry.records), entry.header, list(last) if isinstance(last, list) else None,
+                         entry.ts[-1] if entry.ts else None)
+    parse(entry, raw.decode("utf-8", errors="ignore"), entry.end)
+
+
+def undo_unterminated(entry):
+    count, header, last, last_ts = entry.provisional
+    del entry.records[count:]
+    del entry.offsets[count:]
+    del entry.ts[count:]
+    entry.header = header
+    if last is not None:
+        entry.records[-1] = last
+    if entry.ts:
+        entry.ts[-1] = last_ts
+    entry.provisional = None
+
+
+def load_parsed(filepath, kind):
+    st = os.stat(filepath)
+    key = (os.path.abspath(filepath), kind)
+    with _lock:
+        entry = _cache.get(key)
+        parse = PARSERS[kind]
+        if entry is not None and (entry.mtime, entry.size) == (st.st_mtime_ns, st.st_size) \
+                and entry.inode == st.st_ino:
+            if entry.provisional is None and entry.end < st.st_size:
+                # Unchanged since the last look: the unterminated last line
+                # is not being written any more
+                with open(filepath, "rb") as f:
+                    f.seek(entry.end)
+                    parse_unterminated(entry, parse, f.read())
+            return entry
+        with open(filepath, "rb") as f:
+            if entry is not None and entry.provisional is not None:
+                undo_unterminated(entry)
+            # Rotated, truncated or rewritten: start over
+            if entry is not None and entry.inode == st.st_ino and st.st_size >= entry.end:
+                f.seek(entry.end - len(entry.tail))
+                if f.read(len(entry.tail)) != entry.tail:
+                    entry = None
+            else:
+                entry = None
+            if entry is None:
+                entry = _cache[key] = ParsedFile(st)
+
+            f.seek(entry.end)
+            offset = entry.end
+            unterminated = None
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    # May still be being written; parsed below if it has settled
+                    unterminated = raw
+                    break
+                parse(entry, raw.decode("utf-8", errors="ignore"), offset)
+                offset += len(raw)
+            entry.end = offset
+            f.seek(max(offset - TAIL_BYTES, 0))
+            entry.tail = f.read(offset - max(offset - TAIL_BYTES, 0))
+            if unterminated and time.time() - st.st_mtime >= SETTLE_SECONDS:
+                parse_unterminated(entry, parse, unterminated)
+        entry.mtime, entry.size = st.st_mtime_ns, st.st_size
+        return entry
+
+
+def paginate(entry, limit=None, cursor=None, since=None):
+    # cursor is a byte offset from a previous page's next_cursor/prev_cursor.
+    # With only a limit the newest `limit` records are returned (tail).
+    since = parse_epoch(since)
+    if since is None:
+        indices = range(len(entry.records))
+    else:
+        indices = [i for i, ts in enumerate(entry.ts) if ts is not None and ts >= since]
+
+    if cursor is not None:
+        start = bisect_left(indices, bisect_left(entry.offsets, int(cursor)))
+    elif limit is not None and since is None:
+        start = max(len(indices) - int(limit), 0)
+    else:
+        start = 0
+    end = len(indices) if limit is None else min(start + int(limit), len(indices))
+
+    page = [entry.records[i] for i in indices[start:end]]
+    info = {
+        "total": len(indices),
+        # Polling with next_cursor returns records appended since this page
+        "next_cursor": entry.offsets[indices[end]] if end < len(indices) else entry.end,
+        "prev_cursor": entry.offsets[indices[max(start - int(limit), 0)]] if limit is not None and start > 0 else None,
+    }
+    return page, info
+
+
+def load_csv(filepath, limit=None, cursor=None, since=None):
     if not os.path.exists(filepath):
         return {"status": "error", "message": f"{filepath} not found"}
-    
-    with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
-        reader = csv.DictReader(f)
-        return {"status": "success", "data": list(reader)}
 
-def load_text(filepath):
+    page, info = paginate(load_parsed(filepath, "csv"), limit, cursor, since)
+    return {"status": "success", "data": page, **info}
+
+def load_text(filepath, limit=None, cursor=None, since=None):
     if not os.path.exists(filepath):
         return {"status": "error", "message": f"{filepath} not found"}
-    
-    with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
-        content = f.read().strip()
-        return {"status": "success", "content": content}
 
-def load_json_lines(filepath):
+    page, info = paginate(load_parsed(filepath, "text"), limit, cursor, since)
+    content = "\n".join(line for block in page for line in block).strip()
+    return {"status": "success", "content": content, **info}
+
+def load_json_lines(filepath, limit=None, cursor=None, since=None):
     if not os.path.exists(filepath):
         return {"status": "error", "message": f"{filepath} not found"}
 
-    data = []
-    with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
-        for line in f:
-            try:
-                data.append(json.loads(line))
-            except json.JSONDecodeError:
-                continue
-    return {"status": "success", "entries": data}
+    page, info = paginate(load_parsed(filepath, "jsonl"), limit, cursor, since)
+    return {"status": "success", "entries": page, **info}
+
+def load_alert_db(db_path, limit=None, cursor=None, **filters):
+    if not os.path.exists(db_path):
+        return {"status": "error", "message": f"{db_path} not found"}
+
+    from suricata_alerts.alert_store import page_alerts
+    page, info = page_alerts(db_path, limit=limit, cursor=cursor, **filters)
+    return {"status": "success", "data": page, **info}
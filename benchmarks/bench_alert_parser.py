@@ -0,0 +1,119 @@
+# benchmarks/bench_alert_parser.py
+#
+# Compares the single-threaded eve.json loop against the mmap + pre-filter +
+# process pool bulk parser on a synthetic eve.json.
+#
+#   python benchmarks/bench_alert_parser.py --size-mb 2048 --workers 8
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import json
+import random
+import tempfile
+import time
+
+from suricata_alerts.alert_parser import parse_suricata_alerts
+from suricata_alerts.bulk_parser import parse_suricata_alerts_bulk
+
+# Rough event mix of a busy sensor: alerts are a small minority
+EVENT_MIX = [("flow", 0.45), ("dns", 0.25), ("tls", 0.15), ("stats", 0.05), ("alert", 0.10)]
+
+
+def make_event(event_type, i, rng):
+    event = {
+        "timestamp": f"2025-07-16T18:{(i // 60) % 60:02d}:{i % 60:02d}.{i % 1000000:06d}+0530",
+        "flow_id": rng.getrandbits(48),
+        "event_type": event_type,
+        "src_ip": f"192.168.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+        "src_port": rng.randint(1024, 65535),
+        "dest_ip": f"10.0.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+        "dest_port": rng.choice([53, 80, 443, 3478, 22]),
+        "proto": rng.choice(["TCP", "UDP"]),
+    }
+    if event_type == "alert":
+        event["alert"] = {
+            "action": "allowed",
+            "gid": 1,
+            "signature_id": 2016149,
+            "rev": 2,
+            "signature": "ET INFO Session Traversal Utilities for NAT (STUN Binding Request)",
+            "category": "Attempted User Privilege Gain",
+            "severity": rng.choice([1, 2, 3]),
+        }
+    elif event_type == "flow":
+        event["flow"] = {"pkts_toserver": 4, "pkts_toclient": 3, "bytes_toserver": 320,
+                         "bytes_toclient": 410, "state": "closed", "reason": "timeout"}
+    elif event_type == "dns":
+        event["dns"] = {"type": "query", "id": i % 65535, "rrname": f"host{i % 5000}.example.com", "rrtype": "A"}
+    elif event_type == "tls":
+        event["tls"] = {"subject": "CN=example.com", "issuerdn": "CN=Example CA", "version": "TLS 1.3"}
+    else:
+        event["stats"] = {"uptime": i, "capture": {"kernel_packets": i * 100, "kernel_drops": 0}}
+    return json.dumps(event, separators=(",", ":"))
+
+
+def generate_eve(path, size_mb, seed=1):
+    rng = random.Random(seed)
+    types = [t for t, _ in EVENT_MIX]
+    weights = [w for _, w in EVENT_MIX]
+    target = size_mb * 1024 * 1024
+    written = 0
+    lines = 0
+
+    # Build a pool of distinct lines once and cycle through it; generating
+    # gigabytes of fresh JSON would dominate the benchmark setup time.
+    pool = [make_event(rng.choices(types, weights)[0], i, rng) + "\n" for i in range(20000)]
+    with open(path, "w") as f:
+        while written < target:
+            block = "".join(pool)
+            f.write(block)
+            written += len(block)
+            lines += len(pool)
+    return lines
+
+
+def timed(label, fn, lines):
+    start = time.perf_counter()
+    alerts = fn()
+    elapsed = time.perf_counter() - start
+    rate = lines / elapsed if elapsed else float("inf")
+    print(f"{label:<28} {elapsed:8.2f}s  {rate:12,.0f} lines/s  {len(alerts):,} alerts")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="eve.json parsing throughput")
+    parser.add_argument("--size-mb", type=int, default=2048)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--eve", help="use an existing eve.json instead of a synthetic one")
+    parser.add_argument("--skip-baseline", action="store_true")
+    args = parser.parse_args()
+    # Resolved before moving into the scratch directory the parsers write
+    # their logs to
+    eve = os.path.abspath(args.eve) if args.eve else None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        eve_path = eve or os.path.join(tmp, "eve.json")
+        if args.eve:
+            with open(eve_path, "rb") as f:
+                lines = sum(1 for _ in f)
+        else:
+            print(f"[*] Generating {args.size_mb} MB synthetic eve.json...")
+            lines = generate_eve(eve_path, args.size_mb)
+        print(f"[*] {lines:,} lines, {os.path.getsize(eve_path) / 1e6:,.0f} MB\n")
+
+        baseline = None
+        if not args.skip_baseline:
+            baseline = timed("single-threaded json loop", lambda: parse_suricata_alerts(eve_path), lines)
+        bulk = timed(f"bulk ({args.workers} workers)",
+                     lambda: parse_suricata_alerts_bulk(eve_path, workers=args.workers), lines)
+        if baseline:
+            print(f"\n[+] Speedup: {baseline / bulk:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# benchmarks/bench_pcap_ingest.py
+#
+# Packets per second for the offline pcap reader (single process and sharded
+# over a process pool) against pyshark.FileCapture + extract_features, on a
+# synthetic Ethernet/IPv4 capture.
+#
+#   python benchmarks/bench_pcap_ingest.py --packets 2000000 --workers 8
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import random
+import struct
+import tempfile
+import time
+
+from flow_sniffer.flow_table import update_flow
+from flow_sniffer.flow_utils import extract_features
+from flow_sniffer.pcap_reader import ingest_pcaps
+
+
+def make_packet(rng, hosts):
+    src = rng.choice(hosts)
+    dst = rng.choice(hosts)
+    if rng.random() < 0.7:
+        proto = 6
+        l4 = struct.pack(">HHIIBBHHH", rng.randint(1024, 65535), rng.choice([80, 443, 22]),
+                         rng.getrandbits(32), 0, 5 << 4, rng.choice([0x02, 0x10, 0x18, 0x12, 0x11]), 65535, 0, 0)
+    else:
+        proto = 17
+        l4 = struct.pack(">HHHH", rng.randint(1024, 65535), rng.choice([53, 3478, 123]), 8, 0)
+    payload = bytes(rng.choice([0, 32, 120, 600, 1400]))
+    ip = struct.pack(">BBHHHBBH4s4s", 0x45, 0, 20 + len(l4) + len(payload), 0, 0x4000, 64, proto, 0, src, dst)
+    return b"\x00\x11\x22\x33\x44\x55\x66\x77\x88\x99\xaa\xbb\x08\x00" + ip + l4 + payload
+
+
+def generate_pcap(path, packets, seed=1):
+    rng = random.Random(seed)
+    hosts = [struct.pack(">I", 0x0A000000 + rng.getrandbits(16)) for _ in range(500)]
+    # Cycle through a pool of distinct frames; building millions of fresh
+    # packets would dominate the setup time.
+    pool = [make_packet(rng, hosts) for _ in range(20000)]
+    with open(path, "wb") as f:
+        f.write(struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, 65535, 1))
+        ts = 1752670000.0
+        for i in range(packets):
+            frame = pool[i % len(pool)]
+            ts += 0.0001
+            f.write(struct.pack("<IIII", int(ts), int(ts % 1 * 1e6), len(frame), len(frame)))
+            f.write(frame)
+
+
+def pyshark_ingest(path, limit):
+    import pyshark
+    table = {}
+    capture = pyshark.FileCapture(path, keep_packets=False)
+    count = 0
+    try:
+        for pkt in capture:
+            flow_key, features = extract_features(pkt)
+            if flow_key:
+                update_flow(table, flow_key, *features)
+            count += 1
+            if count >= limit:
+                break
+    finally:
+        capture.close()
+    return count
+
+
+def count_packets(flow_data):
+    return sum(stats.packets for stats in flow_data.values())
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    count = fn()
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed else float("inf")
+    print(f"{label:<28} {elapsed:8.2f}s  {rate:12,.0f} pkts/s  {count:,} packets")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="offline pcap ingestion throughput")
+    parser.add_argument("--packets", type=int, default=2000000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--shard-mb", type=int, default=32)
+    parser.add_argument("--pcap", help="use an existing capture instead of a synthetic one")
+    parser.add_argument("--pyshark-packets", type=int, default=20000,
+                        help="packets to time through pyshark (it is far too slow for the full file)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pcap_path = args.pcap or os.path.join(tmp, "bench.pcap")
+        if not args.pcap:
+            print(f"[*] Generating {args.packets:,} packet synthetic capture...")
+            generate_pcap(pcap_path, args.packets)
+        print(f"[*] {os.path.getsize(pcap_path) / 1e6:,.0f} MB\n")
+
+        shard_bytes = args.shard_mb * 1024 * 1024
+        single = timed("pcap_reader (1 process)", lambda: count_packets(ingest_pcaps(pcap_path, 1, shard_bytes)))
+        pooled = timed(f"pcap_reader ({args.workers} workers)",
+                       lambda: count_packets(ingest_pcaps(pcap_path, args.workers, shard_bytes)))
+
+        try:
+            import pyshark  # noqa: F401
+        except ImportError:
+            print("\n[!] pyshark not installed, skipping the tshark comparison")
+            return
+        baseline = timed("pyshark + extract_features", lambda: pyshark_ingest(pcap_path, args.pyshark_packets))
+        print(f"\n[+] Speedup: {single / baseline:.0f}x single process, {pooled / baseline:.0f}x pooled")
+
+
+if __name__ == "__main__":
+    main()
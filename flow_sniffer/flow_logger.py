@@ -1,25 +1,48 @@
 import csv
+import fcntl
+import glob
+import mmap
 import os
+import re
+import socket
+import struct
+import time
 from datetime import datetime
+from .flow_table import FlowStats, format_flow_id
+
+FLOW_FIELDS = ["flow_id", "first_seen", "last_seen", "packets", "bytes", "min_size", "max_size",
+               "mean_size", "syn", "ack", "fin", "rst"]
 
 def save_flows_to_csv(flow_data, out_file="flow_log.csv"):
+    # flow_data: a dict or any iterable of (flow_key, stats), written as it
+    # is consumed so a long flow log never has to fit in memory
     os.makedirs("logs", exist_ok=True)
     full_path = os.path.join("logs", out_file)
+    items = flow_data.items() if isinstance(flow_data, dict) else flow_data
 
+    count = 0
     with open(full_path, mode="w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(["flow_id", "timestamp", "length", "flags"])
+        writer = csv.DictWriter(f, fieldnames=FLOW_FIELDS)
+        writer.writeheader()
 
-        for flow_id, packets in flow_data.items():
-            for pkt in packets:
-                writer.writerow([
-                    flow_id,
-                    pkt.get("timestamp", ""),
-                    pkt.get("length", ""),
-                    pkt.get("flags", ""),
-                ])
+        for flow_key, stats in items:
+            writer.writerow({"flow_id": format_flow_id(flow_key), **stats.as_dict()})
+            count += 1
 
     print(f"[+] All flows saved to: {full_path}")
+    return count
+
+def append_anomalies_to_csv(anomalies, out_file="alerts.csv"):
+    os.makedirs("logs", exist_ok=True)
+    full_path = os.path.join("logs", out_file)
+    new_file = not os.path.exists(full_path) or os.path.getsize(full_path) == 0
+
+    with open(full_path, mode="a", newline="") as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(["flow_id", "reason", "timestamp"])
+        for flow_id, reason in anomalies:
+            writer.writerow([flow_id, reason, datetime.now().isoformat()])
 
 def save_anomalies_to_csv(anomalies, out_file="alerts.csv"):
     os.makedirs("logs", exist_ok=True)
@@ -33,3 +56,261 @@ def save_anomalies_to_csv(anomalies, out_file="alerts.csv"):
             writer.writerow([flow_id, reason, datetime.now().isoformat()])
 
     print(f"[!] Anomalies saved to: {full_path}")
+
+
+# Binary flow log: append-only segments under logs/flows/ holding one
+# length-prefixed record per flow. A segment is rotated by size or age and,
+# once closed, renamed to carry the range of last_seen times it holds so
+# readers can skip it without opening it. A writer holds an flock on its
+# open segment, so another writer only recovers segments nobody is using.
+
+FLOW_LOG_DIR = "logs/flows"
+SEGMENT_MAGIC = b"AFFL"
+SEGMENT_HEADER = struct.Struct("<4sH")
+SEGMENT_VERSION = 1
+PREFIX = struct.Struct("<H")
+# first_seen, last_seen, packets, bytes, min/max size, syn, ack, fin, rst,
+# sport, dport, then kind and length of src, dst and proto
+RECORD = struct.Struct("<ddQQIIIIIIHHBBBBB")
+TIMES = struct.Struct("<dd")
+ADDR_TEXT, ADDR_V4, ADDR_V6 = 0, 4, 6
+OPEN_SEGMENT_RE = re.compile(r"^flows-(\d{8}-\d{6})-(\d{4})\.open$")
+# A new segment is created and locked under this suffix before it is
+# renamed to .open, so it is never visible unlocked
+OPENING_SUFFIX = ".opening"
+OPENING_SEGMENT_RE = re.compile(r"^flows-(\d{8}-\d{6})-(\d{4})\.opening$")
+CLOSED_SEGMENT_RE = re.compile(r"^flows-(\d{8}-\d{6})-(\d{4})_(-?\d+)_(-?\d+)\.bin$")
+
+
+def _pack_addr(addr):
+    for kind, family in ((ADDR_V4, socket.AF_INET), (ADDR_V6, socket.AF_INET6)):
+        try:
+            return kind, socket.inet_pton(family, addr)
+        except (OSError, TypeError):
+            continue
+    return ADDR_TEXT, str(addr).encode("utf-8")
+
+
+_addr_cache = {}
+
+
+def _unpack_addr(kind, raw):
+    text = _addr_cache.get(raw)
+    if text is None:
+        if kind == ADDR_V4:
+            text = socket.inet_ntop(socket.AF_INET, raw)
+        elif kind == ADDR_V6:
+            text = socket.inet_ntop(socket.AF_INET6, raw)
+        else:
+            return raw.decode("utf-8")
+        if len(_addr_cache) < 65536:
+            _addr_cache[raw] = text
+    return text
+
+
+def encode_flow(flow_key, stats):
+    src, sport, dst, dport, proto = flow_key
+    src_kind, src_raw = _pack_addr(src)
+    dst_kind, dst_raw = _pack_addr(dst)
+    proto_raw = str(proto).encode("utf-8")
+    body = RECORD.pack(stats.first_seen, stats.last_seen, stats.packets, stats.bytes, stats.min_size,
+                       stats.max_size, stats.syn, stats.ack, stats.fin, stats.rst, int(sport), int(dport),
+                       src_kind, len(src_raw), dst_kind, len(dst_raw), len(proto_raw))
+    body += src_raw + dst_raw + proto_raw
+    return PREFIX.pack(len(body)) + body
+
+
+def decode_flow(buf, pos):
+    (first_seen, last_seen, packets, nbytes, min_size, max_size, syn, ack, fin, rst, sport, dport,
+     src_kind, src_len, dst_kind, dst_len, proto_len) = RECORD.unpack_from(buf, pos)
+    stats = FlowStats(first_seen)
+    stats.last_seen = last_seen
+    stats.packets = packets
+    stats.bytes = nbytes
+    stats.min_size = min_size
+    stats.max_size = max_size
+    stats.syn = syn
+    stats.ack = ack
+    stats.fin = fin
+    stats.rst = rst
+    pos += RECORD.size
+    src = _unpack_addr(src_kind, buf[pos:pos + src_len])
+    pos += src_len
+    dst = _unpack_addr(dst_kind, buf[pos:pos + dst_len])
+    pos += dst_len
+    proto = buf[pos:pos + proto_len].decode("utf-8")
+    return (src, sport, dst, dport, proto), stats
+
+
+class FlowLogWriter:
+    # Records are collected in memory and written in one go once buffer_bytes
+    # is reached or flush_interval seconds have passed since the last write.
+
+    def __init__(self, directory=FLOW_LOG_DIR, max_bytes=64 * 1024 * 1024, max_age=3600,
+                 buffer_bytes=256 * 1024, flush_interval=5):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.buffer_bytes = buffer_bytes
+        self.flush_interval = flush_interval
+        self.buffer = bytearray()
+        self.file = None
+        self.path = None
+        self.written = 0
+        os.makedirs(directory, exist_ok=True)
+        # Segments left open by a run that didn't shut down cleanly; ones
+        # still locked belong to a live writer and are left alone
+        for name in os.listdir(directory):
+            if OPEN_SEGMENT_RE.match(name) or OPENING_SEGMENT_RE.match(name):
+                self._recover(os.path.join(directory, name))
+
+    def _recover(self, path):
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            # Recovered by someone else between listing and locking
+            if os.path.exists(path) and os.path.samestat(os.fstat(f.fileno()), os.stat(path)):
+                if path.endswith(OPENING_SUFFIX):
+                    # The writer died before renaming it, so nothing was written
+                    os.remove(path)
+                else:
+                    self._finalize(path)
+
+    def _open(self):
+        created = datetime.now().strftime("%Y%m%d-%H%M%S")
+        seq = 0
+        while True:
+            base = os.path.join(self.directory, f"flows-{created}-{seq:04d}")
+            path, opening = base + ".open", base + OPENING_SUFFIX
+            seq += 1
+            if glob.glob(base + "[._]*"):
+                continue
+            try:
+                f = open(opening, "xb")
+            except FileExistsError:
+                continue
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            # Removed as stale by another writer before we got the lock
+            if os.path.exists(opening) and os.path.samestat(os.fstat(f.fileno()), os.stat(opening)):
+                break
+            f.close()
+        self.file = f
+        os.replace(opening, path)
+        self.file.write(SEGMENT_HEADER.pack(SEGMENT_MAGIC, SEGMENT_VERSION))
+        self.path = path
+        self.opened = time.monotonic()
+        self.last_flush = self.opened
+        self.written = SEGMENT_HEADER.size
+        self.min_ts = self.max_ts = None
+
+    def write(self, flow_key, stats):
+        if self.file is None:
+            self._open()
+        self.buffer += encode_flow(flow_key, stats)
+        ts = stats.last_seen
+        self.min_ts = ts if self.min_ts is None or ts < self.min_ts else self.min_ts
+        self.max_ts = ts if self.max_ts is None or ts > self.max_ts else self.max_ts
+        if len(self.buffer) >= self.buffer_bytes or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def write_many(self, flow_records):
+        items = flow_records.items() if isinstance(flow_records, dict) else flow_records
+        for flow_key, stats in items:
+            if not isinstance(flow_key, str):
+                self.write(flow_key, stats)
+
+    def flush(self):
+        if self.file is None:
+            return
+        if self.buffer:
+            self.file.write(self.buffer)
+            self.file.flush()
+            self.written += len(self.buffer)
+            self.buffer.clear()
+        self.last_flush = time.monotonic()
+        if self.written >= self.max_bytes or time.monotonic() - self.opened >= self.max_age:
+            self.rotate()
+
+    def rotate(self):
+        if self.file is None:
+            return
+        if self.buffer:
+            self.file.write(self.buffer)
+            self.buffer.clear()
+        self.file.flush()
+        # Renamed while the lock is still held, then closed
+        self._finalize(self.path, self.min_ts, self.max_ts)
+        self.file.close()
+        self.file = None
+
+    def _finalize(self, path, min_ts=None, max_ts=None):
+        if min_ts is None:
+            # Recovering a stale segment: find its time range by reading it
+            times = [stats.last_seen for _, stats in _read_segment(path)]
+            if not times:
+                os.remove(path)
+                return
+            min_ts, max_ts = min(times), max(times)
+        name = os.path.basename(path)[:-len(".open")]
+        os.replace(path, os.path.join(os.path.dirname(path), f"{name}_{int(min_ts)}_{int(max_ts) + 1}.bin"))
+
+    def close(self):
+        self.rotate()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _read_segment(path, since=None, until=None):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size <= SEGMENT_HEADER.size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            magic, version = SEGMENT_HEADER.unpack_from(buf, 0)
+            if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION:
+                print(f"[!] Skipping {path}: not a version {SEGMENT_VERSION} flow log segment")
+                return
+            pos = SEGMENT_HEADER.size
+            end = len(buf)
+            while pos + PREFIX.size <= end:
+                (length,) = PREFIX.unpack_from(buf, pos)
+                pos += PREFIX.size
+                if pos + length > end:
+                    # Partially written record at the tail of an open segment
+                    break
+                # Check the time range before decoding the rest of the record
+                _, last_seen = TIMES.unpack_from(buf, pos)
+                if (since is None or last_seen >= since) and (until is None or last_seen <= until):
+                    yield decode_flow(buf, pos)
+                pos += length
+
+
+def list_segments(directory=FLOW_LOG_DIR, since=None, until=None):
+    # Oldest first; closed segments outside [since, until] are left out
+    segments = []
+    for name in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+        closed = CLOSED_SEGMENT_RE.match(name)
+        if closed:
+            lo, hi = int(closed.group(3)), int(closed.group(4))
+            if (since is not None and hi < since) or (until is not None and lo > until):
+                continue
+        elif not OPEN_SEGMENT_RE.match(name):
+            continue
+        segments.append(os.path.join(directory, name))
+    return segments
+
+
+def read_flow_log(directory=FLOW_LOG_DIR, since=None, until=None):
+    # Streams (flow_key, FlowStats) whose last_seen is within [since, until]
+    # (epoch seconds; either bound may be None)
+    for path in list_segments(directory, since, until):
+        yield from _read_segment(path, since, until)
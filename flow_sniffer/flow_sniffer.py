@@ -1,31 +1,99 @@
+import asyncio
+import queue
+import threading
+import time
 import pyshark
-from datetime import datetime
-from collections import defaultdict
 from .flow_utils import extract_features
+from .flow_table import update_flow, expire_flows, format_flow_id
 
 def capture_live(interface="en0", timeout=60):
     print(f"[*] Starting capture on {interface} for {timeout}s...")
     cap = pyshark.LiveCapture(interface=interface)
 
-    flow_data = defaultdict(list)
-    start_time = datetime.now()
+    flow_data = {}
+    packet_count = 0
+    deadline = time.monotonic() + timeout
 
     for pkt in cap.sniff_continuously(packet_count=0):
-        if (datetime.now() - start_time).seconds > timeout:
+        if time.monotonic() > deadline:
             break
 
         try:
-            flow_id, features = extract_features(pkt)
-            if flow_id:
-                flow_data[flow_id].append(features)
+            flow_key, features = extract_features(pkt)
+            if flow_key:
+                update_flow(flow_data, flow_key, *features)
+                packet_count += 1
         except Exception as e:
             print(f"[!] Packet parse error: {e}")
 
     cap.close()
-    print(f"[+] {len(flow_data)} flows captured.")
+    print(f"[+] {len(flow_data)} flows captured ({packet_count} packets).")
     return flow_data
 
+def _capture_worker(interface, packets, stop):
+    # pyshark drives tshark through asyncio, which needs a loop in this thread
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    cap = pyshark.LiveCapture(interface=interface)
+    try:
+        for pkt in cap.sniff_continuously(packet_count=0):
+            if stop.is_set():
+                break
+            try:
+                flow_key, features = extract_features(pkt)
+            except Exception as e:
+                print(f"[!] Packet parse error: {e}")
+                continue
+            if flow_key:
+                try:
+                    packets.put((flow_key, features), timeout=1)
+                except queue.Full:
+                    print("[!] Flow queue full, dropping packet")
+    finally:
+        cap.close()
+        packets.put(None)
+
+def stream_flows(interface="en0", idle_timeout=15, active_timeout=120, sweep_interval=1.0, duration=None,
+                 max_queue=100000):
+    # Long-running capture that yields lists of finished (flow_key, FlowStats)
+    # records as they expire, so consumers see a flow at most idle_timeout /
+    # active_timeout seconds after it ends instead of after a fixed window.
+    print(f"[*] Streaming flows on {interface} (idle {idle_timeout}s, active {active_timeout}s)...")
+    packets = queue.Queue(maxsize=max_queue)
+    stop = threading.Event()
+    worker = threading.Thread(target=_capture_worker, args=(interface, packets, stop), daemon=True)
+    worker.start()
+
+    flow_data = {}
+    deadline = time.monotonic() + duration if duration else None
+    next_sweep = time.monotonic() + sweep_interval
+    capture_done = False
+
+    try:
+        while not capture_done and (deadline is None or time.monotonic() < deadline):
+            try:
+                item = packets.get(timeout=max(0.0, next_sweep - time.monotonic()))
+                if item is None:
+                    capture_done = True
+                else:
+                    update_flow(flow_data, item[0], *item[1])
+            except queue.Empty:
+                pass
+
+            if time.monotonic() >= next_sweep:
+                next_sweep = time.monotonic() + sweep_interval
+                expired = expire_flows(flow_data, time.time(), idle_timeout, active_timeout)
+                if expired:
+                    yield expired
+    finally:
+        stop.set()
+
+    # Export whatever is still open when the stream ends
+    if flow_data:
+        remaining = list(flow_data.items())
+        flow_data.clear()
+        yield remaining
+
 if __name__ == "__main__":
     flows = capture_live()
-    for fid, packets in flows.items():
-        print(f"{fid}: {len(packets)} packets")
+    for key, stats in flows.items():
+        print(f"{format_flow_id(key)}: {stats.packets} packets, {stats.bytes} bytes")
@@ -0,0 +1,163 @@
+from datetime import datetime
+
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_RST = 0x04
+TCP_PSH = 0x08
+TCP_ACK = 0x10
+TCP_URG = 0x20
+
+FLAG_NAMES = {"F": TCP_FIN, "S": TCP_SYN, "R": TCP_RST, "P": TCP_PSH, "A": TCP_ACK, "U": TCP_URG,
+              "FIN": TCP_FIN, "SYN": TCP_SYN, "RST": TCP_RST, "PSH": TCP_PSH, "ACK": TCP_ACK, "URG": TCP_URG}
+
+
+def parse_tcp_flags(flags):
+    # pyshark reports tcp.flags as a hex string ("0x0012"); also accept ints
+    # and symbolic forms such as "SYN,ACK" or "SA".
+    if not flags:
+        return 0
+    if isinstance(flags, int):
+        return flags
+    flags = str(flags).strip()
+    try:
+        return int(flags, 16) if flags.lower().startswith("0x") else int(flags)
+    except ValueError:
+        pass
+    upper = flags.upper()
+    tokens = [t for t in upper.replace(",", " ").replace("|", " ").split() if t]
+    if all(t in FLAG_NAMES for t in tokens) and any(len(t) > 1 for t in tokens):
+        return sum(FLAG_NAMES[t] for t in set(tokens))
+    return sum(FLAG_NAMES.get(c, 0) for c in set(upper))
+
+
+class FlowStats:
+    # Running counters for one flow, updated in place per packet so memory
+    # depends on the number of flows rather than the number of packets.
+    __slots__ = ("packets", "bytes", "min_size", "max_size", "syn", "ack", "fin", "rst",
+                 "first_seen", "last_seen")
+
+    def __init__(self, ts=0.0):
+        self.packets = 0
+        self.bytes = 0
+        self.min_size = 0
+        self.max_size = 0
+        self.syn = 0
+        self.ack = 0
+        self.fin = 0
+        self.rst = 0
+        self.first_seen = ts
+        self.last_seen = ts
+
+    def update(self, length, flags, ts):
+        if self.packets == 0:
+            self.min_size = self.max_size = length
+            self.first_seen = ts
+        elif length < self.min_size:
+            self.min_size = length
+        elif length > self.max_size:
+            self.max_size = length
+        self.packets += 1
+        self.bytes += length
+        if flags:
+            if flags & TCP_SYN:
+                self.syn += 1
+            if flags & TCP_ACK:
+                self.ack += 1
+            if flags & TCP_FIN:
+                self.fin += 1
+            if flags & TCP_RST:
+                self.rst += 1
+        if ts > self.last_seen:
+            self.last_seen = ts
+
+    def merge(self, other):
+        if other.packets == 0:
+            return self
+        if self.packets == 0:
+            self.min_size, self.max_size = other.min_size, other.max_size
+            self.first_seen, self.last_seen = other.first_seen, other.last_seen
+        else:
+            self.min_size = min(self.min_size, other.min_size)
+            self.max_size = max(self.max_size, other.max_size)
+            self.first_seen = min(self.first_seen, other.first_seen)
+            self.last_seen = max(self.last_seen, other.last_seen)
+        self.packets += other.packets
+        self.bytes += other.bytes
+        self.syn += other.syn
+        self.ack += other.ack
+        self.fin += other.fin
+        self.rst += other.rst
+        return self
+
+    @property
+    def mean_size(self):
+        return self.bytes / self.packets if self.packets else 0.0
+
+    @property
+    def duration(self):
+        return self.last_seen - self.first_seen
+
+    def as_dict(self):
+        return {
+            "packets": self.packets,
+            "bytes": self.bytes,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "mean_size": round(self.mean_size, 2),
+            "syn": self.syn,
+            "ack": self.ack,
+            "fin": self.fin,
+            "rst": self.rst,
+            "first_seen": datetime.fromtimestamp(self.first_seen).isoformat(),
+            "last_seen": datetime.fromtimestamp(self.last_seen).isoformat(),
+        }
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return f"FlowStats(packets={self.packets}, bytes={self.bytes}, syn={self.syn})"
+
+
+def update_flow(table, key, length, flags, ts):
+    stats = table.get(key)
+    if stats is None:
+        stats = table[key] = FlowStats(ts)
+    stats.update(length, flags, ts)
+    return stats
+
+
+def expire_flows(table, now, idle_timeout=15, active_timeout=120):
+    # NetFlow-style expiry: a flow is exported once it has been quiet for
+    # idle_timeout seconds, or has been open for active_timeout seconds even
+    # if still busy (the next packet then starts a fresh record).
+    expired = []
+    for key, stats in table.items():
+        if now - stats.last_seen >= idle_timeout or now - stats.first_seen >= active_timeout:
+            expired.append((key, stats))
+    for key, _ in expired:
+        del table[key]
+    return expired
+
+
+def merge_tables(tables):
+    merged = {}
+    for table in tables:
+        for key, stats in table.items():
+            existing = merged.get(key)
+            if existing is None:
+                merged[key] = stats
+            else:
+                existing.merge(stats)
+    return merged
+
+
+def format_flow_id(key):
+    if isinstance(key, str):
+        return key
+    src, sport, dst, dport, proto = key
+    return f"{src}:{sport} -> {dst}:{dport} ({proto})"
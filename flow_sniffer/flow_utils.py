@@ -1,3 +1,6 @@
+from .flow_table import parse_tcp_flags
+
+
 def extract_features(pkt):
     try:
         ip = pkt.ip
@@ -7,14 +10,14 @@ def extract_features(pkt):
         sport = pkt[pkt.transport_layer].srcport
         dport = pkt[pkt.transport_layer].dstport
 
-        flow_id = f"{src}:{sport} -> {dst}:{dport} ({proto})"
+        flow_key = (src, int(sport), dst, int(dport), proto)
 
-        features = {
-            "timestamp": pkt.sniff_time.isoformat(),
-            "length": int(pkt.length),
-            "flags": getattr(pkt.tcp, "flags", "") if proto == "TCP" else "",
-        }
+        features = (
+            int(pkt.length),
+            parse_tcp_flags(getattr(pkt.tcp, "flags", "")) if proto == "TCP" else 0,
+            float(pkt.sniff_timestamp),
+        )
 
-        return flow_id, features
+        return flow_key, features
     except AttributeError:
         return None, None
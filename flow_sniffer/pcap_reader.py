@@ -0,0 +1,332 @@
+import mmap
+import os
+import socket
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+from .flow_table import update_flow, merge_tables
+
+# Minimal libpcap / pcapng reader with just enough Ethernet/IPv4/IPv6/TCP/UDP
+# decoding to build the flow table, so offline captures don't have to go
+# through tshark one packet at a time like pyshark does.
+
+PCAP_MAGIC = {
+    b"\xd4\xc3\xb2\xa1": ("<", 1e-6),
+    b"\xa1\xb2\xc3\xd4": (">", 1e-6),
+    b"\x4d\x3c\xb2\xa1": ("<", 1e-9),
+    b"\xa1\xb2\x3c\x4d": (">", 1e-9),
+}
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_IDB = 1
+PCAPNG_SPB = 3
+PCAPNG_EPB = 6
+
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LOOP = 108
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+LINKTYPE_LINUX_SLL2 = 276
+
+ETH_IPV4 = 0x0800
+ETH_IPV6 = 0x86DD
+ETH_VLAN = (0x8100, 0x88A8, 0x9100)
+
+IPPROTO_TCP = 6
+IPPROTO_UDP = 17
+IPV6_EXT_HEADERS = (0, 43, 60)
+IPV6_FRAGMENT = 44
+
+SHARD_BYTES = 64 * 1024 * 1024
+# Enough for link + IPv6 with extension headers + TCP
+HEADER_BYTES = 256
+
+_addr_cache = {}
+
+
+def _addr(raw):
+    text = _addr_cache.get(raw)
+    if text is None:
+        family = socket.AF_INET if len(raw) == 4 else socket.AF_INET6
+        text = socket.inet_ntop(family, raw)
+        if len(_addr_cache) < 65536:
+            _addr_cache[raw] = text
+    return text
+
+
+def network_offset(linktype, data):
+    # Returns (offset of the IP header, IP version) or (None, None)
+    if linktype == LINKTYPE_ETHERNET:
+        offset = 12
+        ethertype = (data[12] << 8) | data[13] if len(data) >= 14 else 0
+        while ethertype in ETH_VLAN and len(data) >= offset + 8:
+            offset += 4
+            ethertype = (data[offset] << 8) | data[offset + 1]
+        offset += 2
+        if ethertype == ETH_IPV4:
+            return offset, 4
+        if ethertype == ETH_IPV6:
+            return offset, 6
+        return None, None
+    if linktype in (LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6, 12, 14):
+        if not data:
+            return None, None
+        return 0, data[0] >> 4
+    if linktype in (LINKTYPE_NULL, LINKTYPE_LOOP):
+        if len(data) < 4:
+            return None, None
+        # DLT_NULL stores the address family in host order, DLT_LOOP in network order
+        family = struct.unpack("<I" if linktype == LINKTYPE_NULL and data[0] else ">I", data[:4])[0]
+        if family == 2:
+            return 4, 4
+        if family in (10, 24, 28, 30):
+            return 4, 6
+        return None, None
+    if linktype == LINKTYPE_LINUX_SLL:
+        proto = (data[14] << 8) | data[15] if len(data) >= 16 else 0
+        return (16, 4) if proto == ETH_IPV4 else (16, 6) if proto == ETH_IPV6 else (None, None)
+    if linktype == LINKTYPE_LINUX_SLL2:
+        proto = (data[0] << 8) | data[1] if len(data) >= 20 else 0
+        return (20, 4) if proto == ETH_IPV4 else (20, 6) if proto == ETH_IPV6 else (None, None)
+    return None, None
+
+
+def decode_packet(linktype, data, ts, orig_len):
+    # Same output as flow_utils.extract_features: (flow_key, (length, flags, ts))
+    offset, version = network_offset(linktype, data)
+    if offset is None:
+        return None, None
+
+    if version == 4:
+        if len(data) < offset + 20:
+            return None, None
+        ihl = (data[offset] & 0x0F) * 4
+        proto = data[offset + 9]
+        src = _addr(data[offset + 12:offset + 16])
+        dst = _addr(data[offset + 16:offset + 20])
+        fragment_offset = ((data[offset + 6] & 0x1F) << 8) | data[offset + 7]
+        if fragment_offset:
+            # Non-first fragments carry no transport header
+            return None, None
+        l4 = offset + ihl
+    elif version == 6:
+        if len(data) < offset + 40:
+            return None, None
+        proto = data[offset + 6]
+        src = _addr(data[offset + 8:offset + 24])
+        dst = _addr(data[offset + 24:offset + 40])
+        l4 = offset + 40
+        while proto in IPV6_EXT_HEADERS or proto == IPV6_FRAGMENT:
+            if len(data) < l4 + 8:
+                return None, None
+            next_proto = data[l4]
+            if proto == IPV6_FRAGMENT:
+                if ((data[l4 + 2] << 8) | data[l4 + 3]) & 0xFFF8:
+                    return None, None
+                l4 += 8
+            else:
+                l4 += (data[l4 + 1] + 1) * 8
+            proto = next_proto
+    else:
+        return None, None
+
+    if proto == IPPROTO_TCP:
+        if len(data) < l4 + 14:
+            return None, None
+        flags = data[l4 + 13]
+        name = "TCP"
+    elif proto == IPPROTO_UDP:
+        if len(data) < l4 + 4:
+            return None, None
+        flags = 0
+        name = "UDP"
+    else:
+        return None, None
+
+    sport = (data[l4] << 8) | data[l4 + 1]
+    dport = (data[l4 + 2] << 8) | data[l4 + 3]
+    return (src, sport, dst, dport, name), (orig_len, flags, ts)
+
+
+def read_pcap_header(f):
+    head = f.read(24)
+    if len(head) < 24:
+        raise ValueError("file too short for a pcap header")
+    if struct.unpack("<I", head[:4])[0] == PCAPNG_SHB:
+        return {"format": "pcapng"}
+    if head[:4] not in PCAP_MAGIC:
+        raise ValueError("not a pcap or pcapng file")
+    endian, resolution = PCAP_MAGIC[head[:4]]
+    linktype = struct.unpack(endian + "I", head[20:24])[0] & 0x0FFFFFFF
+    return {"format": "pcap", "endian": endian, "resolution": resolution, "linktype": linktype}
+
+
+def iter_pcap(f, info, start, end):
+    linktype = info["linktype"]
+    resolution = info["resolution"]
+    record = struct.Struct(info["endian"] + "IIII")
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        end = min(end, len(buf))
+        pos = start
+        while pos + 16 <= end:
+            ts_sec, ts_frac, incl_len, orig_len = record.unpack_from(buf, pos)
+            pos += 16
+            if pos + incl_len > len(buf):
+                break
+            # Only the headers are decoded, so don't copy the payload
+            yield linktype, buf[pos:pos + min(incl_len, HEADER_BYTES)], ts_sec + ts_frac * resolution, orig_len
+            pos += incl_len
+
+
+def _pcapng_ticks_per_second(options, endian):
+    pos = 0
+    while pos + 4 <= len(options):
+        code, length = struct.unpack(endian + "HH", options[pos:pos + 4])
+        if code == 0:
+            break
+        if code == 9 and length >= 1:
+            value = options[pos + 4]
+            return 2 ** (value & 0x7F) if value & 0x80 else 10 ** value
+        pos += 4 + ((length + 3) & ~3)
+    return 10 ** 6
+
+
+def iter_pcapng_blocks(f, start=0, end=None, interfaces=None, endian="<"):
+    # Yields (offset, block_type, body) and keeps track of the section byte
+    # order and the interface table, which packet blocks refer to.
+    interfaces = interfaces if interfaces is not None else []
+    f.seek(start)
+    pos = start
+    while end is None or pos < end:
+        head = f.read(8)
+        if len(head) < 8:
+            break
+        block_type = struct.unpack(endian + "I", head[:4])[0]
+        if struct.unpack("<I", head[:4])[0] == PCAPNG_SHB:
+            magic = f.read(4)
+            endian = "<" if magic == b"\x4d\x3c\x2b\x1a" else ">"
+            block_len = struct.unpack(endian + "I", head[4:8])[0]
+            body = f.read(block_len - 12)
+            interfaces.clear()
+            block_type = PCAPNG_SHB
+        else:
+            block_len = struct.unpack(endian + "I", head[4:8])[0]
+            if block_len < 12:
+                break
+            body = f.read(block_len - 8)
+        if block_type == PCAPNG_IDB and len(body) >= 8:
+            linktype = struct.unpack(endian + "H", body[:2])[0]
+            interfaces.append((linktype, _pcapng_ticks_per_second(body[8:-4], endian)))
+        yield pos, block_type, body, endian, interfaces
+        pos += block_len
+
+
+def iter_pcapng(f, start, end, interfaces, endian):
+    for _, block_type, body, endian, interfaces in iter_pcapng_blocks(f, start, end, list(interfaces), endian):
+        if block_type == PCAPNG_EPB and len(body) >= 20:
+            if_id, ts_high, ts_low, cap_len, orig_len = struct.unpack(endian + "IIIII", body[:20])
+            if if_id >= len(interfaces):
+                continue
+            linktype, ticks = interfaces[if_id]
+            yield linktype, body[20:20 + min(cap_len, HEADER_BYTES)], ((ts_high << 32) | ts_low) / ticks, orig_len
+        elif block_type == PCAPNG_SPB and len(body) >= 4 and interfaces:
+            orig_len = struct.unpack(endian + "I", body[:4])[0]
+            linktype, _ = interfaces[0]
+            yield linktype, body[4:4 + orig_len], 0.0, orig_len
+
+
+def plan_shards(path, shard_bytes=SHARD_BYTES):
+    # Splits one capture into byte ranges that start on record boundaries.
+    # Only the record headers are walked here; packet data is never touched.
+    size = os.path.getsize(path)
+    shards = []
+    with open(path, "rb") as f:
+        info = read_pcap_header(f)
+        if info["format"] == "pcap":
+            record = struct.Struct(info["endian"] + "IIII")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                shard_start = pos = 24
+                while pos + 16 <= size:
+                    pos += 16 + record.unpack_from(buf, pos)[2]
+                    if pos - shard_start >= shard_bytes:
+                        shards.append((path, info, shard_start, pos))
+                        shard_start = pos
+            if shard_start < size:
+                shards.append((path, info, shard_start, size))
+        else:
+            # Each shard carries the byte order and interface table in effect
+            # where it starts, since packet blocks only refer to interface ids.
+            shard_start = 0
+            start_state = state = {"interfaces": [], "endian": "<"}
+            for offset, block_type, _, endian, interfaces in iter_pcapng_blocks(f):
+                if offset - shard_start >= shard_bytes and block_type != PCAPNG_SHB:
+                    shards.append((path, dict(info, **start_state), shard_start, offset))
+                    shard_start, start_state = offset, state
+                state = {"interfaces": list(interfaces), "endian": endian}
+            shards.append((path, dict(info, **start_state), shard_start, size))
+    return shards
+
+
+def ingest_shards(shards):
+    # One table per worker rather than per shard keeps the pickled results
+    # (and the merge in the parent) proportional to workers x flows.
+    table = {}
+    packets = 0
+    skipped = 0
+    for path, info, start, end in shards:
+        with open(path, "rb") as f:
+            if info["format"] == "pcap":
+                records = iter_pcap(f, info, start, end)
+            else:
+                records = iter_pcapng(f, start, end, info["interfaces"], info["endian"])
+            for linktype, data, ts, orig_len in records:
+                flow_key, features = decode_packet(linktype, data, ts, orig_len)
+                if flow_key is None:
+                    skipped += 1
+                    continue
+                update_flow(table, flow_key, *features)
+                packets += 1
+    return table, packets, skipped
+
+
+def group_shards(shards, groups):
+    # Contiguous runs of roughly equal byte size, one per worker
+    total = sum(end - start for _, _, start, end in shards)
+    target = total / groups if groups else total
+    grouped = [[]]
+    size = 0
+    for shard in shards:
+        if size >= target and len(grouped) < groups:
+            grouped.append([])
+            size = 0
+        grouped[-1].append(shard)
+        size += shard[3] - shard[2]
+    return [g for g in grouped if g]
+
+
+def ingest_pcaps(paths, workers=None, shard_bytes=SHARD_BYTES):
+    if isinstance(paths, str):
+        paths = [paths]
+
+    shards = []
+    for path in paths:
+        try:
+            shards.extend(plan_shards(path, shard_bytes))
+        except (OSError, ValueError) as e:
+            print(f"[!] Skipping {path}: {e}")
+    workers = max(1, min(workers or os.cpu_count() or 1, len(shards)))
+    print(f"[*] Ingesting {len(paths)} capture(s) as {len(shards)} shard(s) with {workers} worker(s)")
+
+    if workers == 1:
+        results = [ingest_shards(shards)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(ingest_shards, group_shards(shards, workers)))
+
+    flow_data = merge_tables(table for table, _, _ in results)
+    packets = sum(r[1] for r in results)
+    skipped = sum(r[2] for r in results)
+    print(f"[+] {packets} packets in {len(flow_data)} flows ({skipped} non-TCP/UDP or truncated packets skipped)")
+    return flow_data
@@ -5,15 +5,18 @@ import pandas as pd
 import os
 import json
 import re
+import sys
 import matplotlib.pyplot as plt
 from datetime import datetime
 import pytz
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 # File Paths
 LOG_DIR = "../logs"
 SUMMARY_FILE = os.path.join(LOG_DIR, "summary_report.txt")
 RULES_FILE = os.path.join(LOG_DIR, "rule_suggestions.txt")
 ALERTS_FILE = os.path.join(LOG_DIR, "suricata_alerts.csv")
+ALERT_DB = os.path.join(LOG_DIR, "alerts.db")
 
 # Loaders
 
@@ -27,7 +30,13 @@ def load_text_sections(filepath, max_sections=10):
         cleaned = [block.strip() for block in blocks if block.strip()]
         return cleaned[:max_sections] if cleaned else [content.strip()]
 
-def load_alerts(filepath):
+def load_alerts(filepath, db_path=ALERT_DB, last=None, max_severity=None):
+    if os.path.exists(db_path):
+        from suricata_alerts.alert_store import query_alerts
+        try:
+            return pd.DataFrame(query_alerts(db_path, last=last, max_severity=max_severity))
+        except Exception as e:
+            return pd.DataFrame({"error": [str(e)]})
     if not os.path.exists(filepath):
         return pd.DataFrame()
     try:
@@ -155,7 +164,9 @@ with tab2:
 # Alerts Tab
 with tab3:
     st.title("🚨 Threat Alerts Dashboard")
-    df = load_alerts(ALERTS_FILE)
+    windows = {"All": None, "Last hour": 3600, "Last 24 hours": 86400, "Last 7 days": 7 * 86400}
+    window = st.selectbox("Time window", list(windows.keys()))
+    df = load_alerts(ALERTS_FILE, last=windows[window])
 
     if not df.empty and "timestamp" in df.columns:
         st.metric("Total Threats", len(df))
@@ -182,7 +193,7 @@ with tab3:
             ax.axis('equal')
             st.pyplot(fig)
 
-        show_cols = [c for c in ["timestamp", "src_ip", "dest_ip", "Category", "Severity"] if c in df.columns]
+        show_cols = [c for c in ["timestamp", "src_ip", "dest_ip", "signature", "severity", "Category", "Severity"] if c in df.columns]
         st.subheader("📄 Alert Summary Table")
         st.dataframe(df[show_cols], use_container_width=True)
     else:
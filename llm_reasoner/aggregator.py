@@ -0,0 +1,65 @@
+# llm_reasoner/aggregator.py
+
+from datetime import datetime
+
+GROUP_KEY = ("src_ip", "dest_ip", "proto", "signature")
+
+
+def parse_timestamp(value):
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def severity_rank(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 99
+
+
+# Collapses alerts sharing (src_ip, dest_ip, proto, signature) into one group per
+# `window` seconds, counted from the group's first alert. A group keeps the alert
+# fields (timestamp = first seen, severity = most severe seen) and adds count,
+# first_seen and last_seen.
+def aggregate_alerts(alerts, window=300):
+    if not window or window <= 0:
+        return list(alerts)
+
+    indexed = [(parse_timestamp(a.get("timestamp")), i, a) for i, a in enumerate(alerts)]
+    # Alerts without a parseable timestamp go last, in their original order
+    indexed.sort(key=lambda item: (item[0] is None, item[0] or 0, item[1]))
+
+    open_groups = {}
+    groups = []
+    for ts, _, alert in indexed:
+        key = tuple(alert.get(field, "") for field in GROUP_KEY)
+        group = open_groups.get(key)
+
+        if group is not None and ts is not None and group["_start"] is not None \
+                and ts - group["_start"] <= window:
+            group["count"] += 1
+            group["last_seen"] = alert.get("timestamp", "")
+            if severity_rank(alert.get("severity")) < severity_rank(group["severity"]):
+                group["severity"] = alert.get("severity")
+            continue
+
+        group = dict(alert)
+        group["count"] = 1
+        group["first_seen"] = alert.get("timestamp", "")
+        group["last_seen"] = alert.get("timestamp", "")
+        group["_start"] = ts
+        open_groups[key] = group
+        groups.append(group)
+
+    for group in groups:
+        del group["_start"]
+    return groups
+
+
+def aggregation_stats(alerts, groups):
+    total = len(alerts)
+    collapsed = len(groups)
+    ratio = total / collapsed if collapsed else 0
+    return f"{total} alerts -> {collapsed} groups ({ratio:.1f}x reduction)"
@@ -0,0 +1,173 @@
+# llm_reasoner/batching.py
+
+import json
+import re
+
+from .prompt_templates import alert_header, batch_summary_prompt, batch_rulegen_prompt, batch_combined_prompt
+
+# Context windows (tokens) of the models we run locally; unknown models get the
+# conservative default. Ollama itself defaults to a 2048-4096 token num_ctx.
+MODEL_CONTEXT = {
+    "mistral": 8192,
+    "llama3": 8192,
+    "llama3:8b": 8192,
+    "llama3.1": 8192,
+    "phi3": 4096,
+    "gemma": 8192,
+}
+DEFAULT_CONTEXT = 4096
+
+# Tokens of answer to reserve per alert
+OUTPUT_RESERVE = {"summary": 220, "rulegen": 40, "combined": 260}
+MAX_BATCH = 32
+
+BATCH_PROMPTS = {
+    "summary": batch_summary_prompt,
+    "rulegen": batch_rulegen_prompt,
+    "combined": batch_combined_prompt,
+}
+
+TABLE_RULE_RE = re.compile(r"^(ADD|REMOVE)\s+[\d\.:a-fA-F/]+\s+(TO|FROM)\s+TABLE\s+\S+$", re.IGNORECASE)
+
+
+def context_window(model):
+    if model in MODEL_CONTEXT:
+        return MODEL_CONTEXT[model]
+    return MODEL_CONTEXT.get(model.split(":")[0], DEFAULT_CONTEXT)
+
+
+def estimate_tokens(text):
+    # ~4 characters per token is close enough for English prompts and IPs
+    return len(text) // 4 + 1
+
+
+def adaptive_batch_size(alerts, model, mode, max_batch=MAX_BATCH):
+    if not alerts:
+        return 1
+    build = BATCH_PROMPTS[mode]
+    sample = alerts[:min(len(alerts), 16)]
+    instructions = estimate_tokens(build([]))
+    per_alert = sum(estimate_tokens(alert_header(a)) + 12 for a in sample) / len(sample)
+    per_alert += OUTPUT_RESERVE.get(mode, 200)
+
+    # Leave a safety margin because the token estimate is rough
+    budget = int(context_window(model) * 0.8) - instructions
+    return max(1, min(max_batch, int(budget // per_alert)))
+
+
+def extract_json_array(text):
+    text = text.strip()
+    # Models like to wrap JSON in ``` fences or add a sentence before it
+    fenced = re.search(r"```(?:json)?\s*(.+?)```", text, re.DOTALL)
+    if fenced:
+        text = fenced.group(1).strip()
+
+    start = text.find("[")
+    end = text.rfind("]")
+    if start != -1 and end > start:
+        try:
+            data = json.loads(text[start:end + 1])
+            if isinstance(data, list):
+                return data
+        except json.JSONDecodeError:
+            pass
+
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    if isinstance(data, dict):
+        for value in data.values():
+            if isinstance(value, list):
+                return value
+    return None
+
+
+def as_text(value):
+    if isinstance(value, list):
+        return "\n".join(f"- {str(v).strip()}" for v in value if str(v).strip())
+    return str(value or "").strip()
+
+
+def format_summary(item):
+    summary = as_text(item.get("summary"))
+    if not summary:
+        return None
+    parts = [f"Summary: {summary}"]
+    explanation = as_text(item.get("explanation"))
+    if explanation:
+        parts.append(f"Explanation: {explanation}")
+    actions = as_text(item.get("recommended_actions"))
+    if actions:
+        parts.append(f"Recommended Actions:\n{actions}")
+    return "\n\n".join(parts)
+
+
+def format_rules(item):
+    rules = item.get("rules")
+    if isinstance(rules, str):
+        rules = [rules]
+    if not isinstance(rules, list):
+        return None
+    rules = [re.sub(r"^[^a-zA-Z]+", "", str(r)).strip() for r in rules]
+    if not all(TABLE_RULE_RE.match(r) for r in rules):
+        return None
+    return "\n".join(rules) if rules else "No action required."
+
+
+def format_item(item, mode):
+    if mode == "summary":
+        return format_summary(item)
+    if mode == "rulegen":
+        return format_rules(item)
+
+    summary = format_summary(item)
+    rules = format_rules(item)
+    if summary is None or rules is None:
+        return None
+    return f"{summary}\n\nRules:\n{rules}"
+
+
+def split_combined_output(text):
+    # A combined answer is the summary followed by a "Rules:" section; table
+    # commands anywhere in the text are treated as rules.
+    summary_lines = []
+    rules = []
+    in_rules = False
+    for line in text.strip().splitlines():
+        stripped = re.sub(r"^[^a-zA-Z0-9]+", "", line).strip()
+        if re.match(r"^rules\s*:", stripped, re.IGNORECASE):
+            in_rules = True
+            stripped = stripped.split(":", 1)[1].strip()
+            if not stripped:
+                continue
+        if TABLE_RULE_RE.match(stripped.split("#")[0].strip()):
+            rules.append(stripped)
+        elif not in_rules:
+            summary_lines.append(line)
+
+    summary = "\n".join(summary_lines).strip()
+    return summary, "\n".join(rules) if rules else "No action required."
+
+
+def parse_batch_response(text, count, mode):
+    # Returns {index: formatted output} for the items that parsed and validated;
+    # anything missing is left for the caller to retry.
+    items = extract_json_array(text or "")
+    if items is None:
+        return {}
+
+    results = {}
+    for position, item in enumerate(items):
+        if not isinstance(item, dict):
+            continue
+        try:
+            index = int(item.get("id", position + 1)) - 1
+        except (TypeError, ValueError):
+            continue
+        if not 0 <= index < count or index in results:
+            continue
+        output = format_item(item, mode)
+        if output is not None:
+            results[index] = output
+    return results
@@ -1,14 +1,25 @@
 # llm_reasoner/llm_client.py
 import subprocess
 
-def query_model(user_input, model="llama3:8b", system_prompt=None):
+from .response_cache import CACHE_DB_PATH, get_cached, store_response, cacheable
+
+def query_model(user_input, model="llama3:8b", system_prompt=None, mode="admin", use_cache=True,
+                cache_path=CACHE_DB_PATH):
     import ollama
 
+    if use_cache:
+        cached = get_cached(model, mode, user_input, system_prompt, db_path=cache_path)
+        if cached is not None:
+            return cached
+
     messages = []
     if system_prompt:
         messages.append({"role": "system", "content": system_prompt})
     messages.append({"role": "user", "content": user_input})
 
     response = ollama.chat(model=model, messages=messages)
-    return response['message']['content'].strip()
+    content = response['message']['content'].strip()
+    if use_cache and cacheable(content):
+        store_response(model, mode, user_input, content, system_prompt, db_path=cache_path)
+    return content
 
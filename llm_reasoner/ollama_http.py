@@ -0,0 +1,124 @@
+# llm_reasoner/ollama_http.py
+
+import http.client
+import json
+import os
+import queue
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+DEFAULT_OLLAMA_HOST = "http://127.0.0.1:11434"
+
+
+class OllamaError(Exception):
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def resolve_host(host=None):
+    host = host or os.environ.get("OLLAMA_HOST") or DEFAULT_OLLAMA_HOST
+    if "://" not in host:
+        host = "http://" + host
+    parts = urlsplit(host)
+    port = parts.port or (443 if parts.scheme == "https" else 11434)
+    return parts.scheme, parts.hostname or "127.0.0.1", port
+
+
+class OllamaClient:
+    # One client is shared by all worker threads. Keep-alive connections are
+    # checked out of a pool so concurrent requests never share a socket, and
+    # at most pool_size requests are open at once; further callers wait for
+    # a free slot.
+
+    def __init__(self, host=None, pool_size=8, timeout=60, retries=2, backoff=1.0):
+        self.scheme, self.hostname, self.port = resolve_host(host)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    def _new_connection(self, timeout):
+        conn_cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return conn_cls(self.hostname, self.port, timeout=timeout)
+
+    def _checkout(self, timeout):
+        try:
+            conn = self._pool.get_nowait()
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            return conn
+        except queue.Empty:
+            return self._new_connection(timeout)
+
+    def _checkin(self, conn):
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def _post(self, path, payload, timeout):
+        body = json.dumps(payload).encode("utf-8")
+        with self._slots:
+            conn = self._checkout(timeout)
+            try:
+                conn.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+                response = conn.getresponse()
+                data = response.read()
+            except (OSError, http.client.HTTPException, socket.timeout) as e:
+                conn.close()
+                raise OllamaError(f"{type(e).__name__}: {e}")
+
+            if response.will_close:
+                conn.close()
+            else:
+                self._checkin(conn)
+
+        if response.status >= 500:
+            raise OllamaError(f"HTTP {response.status}: {data[:200].decode(errors='replace')}")
+        if response.status >= 400:
+            raise OllamaError(f"HTTP {response.status}: {data[:200].decode(errors='replace')}", retryable=False)
+        try:
+            return json.loads(data)
+        except json.JSONDecodeError as e:
+            raise OllamaError(f"invalid JSON from Ollama: {e}")
+
+    def generate(self, model, prompt, timeout=None, retries=None, options=None):
+        timeout = self.timeout if timeout is None else timeout
+        retries = self.retries if retries is None else retries
+        payload = {"model": model, "prompt": prompt, "stream": False}
+        if options:
+            payload["options"] = options
+
+        attempt = 0
+        while True:
+            try:
+                return self._post("/api/generate", payload, timeout).get("response", "")
+            except OllamaError as e:
+                if not e.retryable or attempt >= retries:
+                    raise
+                attempt += 1
+                time.sleep(self.backoff * (2 ** (attempt - 1)))
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client(**kwargs):
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OllamaClient(**kwargs)
+        return _client
@@ -1,16 +1,25 @@
 # llm_reasoner/prompt_templates.py
 
+def occurrence_line(alert):
+    count = int(alert.get("count", 1) or 1)
+    if count <= 1:
+        return ""
+    return f"Occurrences: {count} (first seen {alert['first_seen']}, last seen {alert['last_seen']})\n"
+
+def alert_header(alert):
+    return f"[{alert['timestamp']}] {alert['src_ip']} → {alert['dest_ip']} | {alert['proto']} | {alert['signature']} (Severity: {alert['severity']})"
+
 def summary_prompt(alert):
     return f"""
-[{alert['timestamp']}] {alert['src_ip']} → {alert['dest_ip']} | {alert['proto']} | {alert['signature']} (Severity: {alert['severity']})
-
+{alert_header(alert)}
+{occurrence_line(alert)}
 Summarize this network alert and explain the potential impact in simple terms. Also recommend any actions the administrator should take.
 """
 
 def rulegen_prompt(alert):
     return f"""
-[{alert['timestamp']}] {alert['src_ip']} → {alert['dest_ip']} | {alert['proto']} | {alert['signature']} (Severity: {alert['severity']})
-
+{alert_header(alert)}
+{occurrence_line(alert)}
 Generate a PF table-based firewall rule to mitigate the threat.
 Respond with only:
 → ADD <IP> TO TABLE suspicious_ips
@@ -18,6 +27,66 @@ Respond with only:
 Only suggest blocking known malicious source or destination IPs.
 """
 
+def combined_prompt(alert):
+    return f"""
+{alert_header(alert)}
+{occurrence_line(alert)}
+Summarize this network alert and explain the potential impact in simple terms. Also recommend any actions the administrator should take.
+Then generate PF table-based firewall rules to mitigate the threat. Only suggest blocking known malicious source or destination IPs.
+
+Respond in exactly this format:
+Summary: <one or two sentences>
+Explanation: <potential impact>
+Recommended Actions:
+- <action>
+Rules:
+ADD <IP> TO TABLE suspicious_ips
+(or REMOVE <IP> FROM TABLE suspicious_ips, or "None" if no rule is needed)
+"""
+
+def batch_alert_list(alerts):
+    lines = []
+    for i, alert in enumerate(alerts, 1):
+        lines.append(f"{i}. {alert_header(alert)}")
+        occurrences = occurrence_line(alert).strip()
+        if occurrences:
+            lines.append(f"   {occurrences}")
+    return "\n".join(lines)
+
+def batch_summary_prompt(alerts):
+    return f"""
+Summarize each of the following {len(alerts)} network alerts and explain the potential impact in simple terms. Also recommend any actions the administrator should take.
+
+{batch_alert_list(alerts)}
+
+Respond with only a JSON array containing exactly one object per alert, in the same order, and nothing else:
+[{{"id": 1, "summary": "...", "explanation": "...", "recommended_actions": ["..."]}}]
+"""
+
+def batch_rulegen_prompt(alerts):
+    return f"""
+Generate PF table-based firewall rules to mitigate the threat in each of the following {len(alerts)} network alerts.
+Only suggest blocking known malicious source or destination IPs.
+
+{batch_alert_list(alerts)}
+
+Respond with only a JSON array containing exactly one object per alert, in the same order, and nothing else.
+Each rule must be "ADD <IP> TO TABLE suspicious_ips" or "REMOVE <IP> FROM TABLE suspicious_ips"; use an empty list when no rule is needed:
+[{{"id": 1, "rules": ["ADD <IP> TO TABLE suspicious_ips"]}}]
+"""
+
+def batch_combined_prompt(alerts):
+    return f"""
+For each of the following {len(alerts)} network alerts, summarize the alert and explain the potential impact in simple terms, recommend any actions the administrator should take, and generate PF table-based firewall rules to mitigate the threat.
+Only suggest blocking known malicious source or destination IPs.
+
+{batch_alert_list(alerts)}
+
+Respond with only a JSON array containing exactly one object per alert, in the same order, and nothing else.
+Each rule must be "ADD <IP> TO TABLE suspicious_ips" or "REMOVE <IP> FROM TABLE suspicious_ips"; use an empty list when no rule is needed:
+[{{"id": 1, "summary": "...", "explanation": "...", "recommended_actions": ["..."], "rules": ["ADD <IP> TO TABLE suspicious_ips"]}}]
+"""
+
 def admin_command_prompt(instruction):
     return f"""
 You are a firewall command translator. Convert the following natural language instruction into an appropriate PF firewall command.
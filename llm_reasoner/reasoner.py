@@ -1,8 +1,17 @@
 # llm_reasoner/reasoner.py
 
 import csv
-import subprocess
-from .prompt_templates import summary_prompt, rulegen_prompt
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from .ollama_http import OllamaClient, get_client
+from .prompt_templates import summary_prompt, rulegen_prompt, combined_prompt
+from .response_cache import cached_call, cache_stats, cacheable, get_cached, store_response
+from .batching import (BATCH_PROMPTS, MAX_BATCH, adaptive_batch_size, context_window, parse_batch_response,
+                       split_combined_output)
+
+SUMMARY_FILE = "logs/summary_report.txt"
+RULES_FILE = "logs/rule_suggestions.txt"
 
 def load_alerts(csv_path):
     alerts = []
@@ -12,42 +21,175 @@ def load_alerts(csv_path):
             alerts.append(row)
     return alerts
 
-def call_ollama(model, prompt):
+def load_alerts_from_store(db_path="logs/alerts.db", **filters):
+    from suricata_alerts.alert_store import query_alerts
+    return query_alerts(db_path, **filters)
+
+def call_ollama(model, prompt, client=None, timeout=None, retries=None, options=None):
+    # timeout/retries left as None use the client's own settings
     try:
-        result = subprocess.run(
-            ["ollama", "run", model],
-            input=prompt.encode(),
-            capture_output=True,
-            timeout=60
-        )
-        return result.stdout.decode()
+        client = client or get_client()
+        return client.generate(model, prompt, timeout=timeout, retries=retries, options=options)
     except Exception as e:
         return f"[!] Error calling {model}: {e}"
 
-# llm_reasoner/reasoner.py
+def ordered_map(fn, items, concurrency=4, can_submit=None):
+    # Runs fn over items on a thread pool but yields results in input order.
+    # At most 2 * concurrency calls are queued so a huge alert list never turns
+    # into thousands of pending futures. Once can_submit() returns False no new
+    # items are taken from the iterator; the caller can collect what is left.
+    items = iter(items)
+    if concurrency <= 1:
+        for item in items:
+            yield item, fn(item)
+            if can_submit and not can_submit():
+                return
+        return
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = deque()
+        while not can_submit or can_submit():
+            item = next(items, None)
+            if item is None:
+                break
+            pending.append((item, executor.submit(fn, item)))
+            if len(pending) >= 2 * concurrency:
+                item, future = pending.popleft()
+                yield item, future.result()
+        while pending:
+            item, future = pending.popleft()
+            yield item, future.result()
+
+def run_batch(batch, model, mode, ask, build_prompt, batch_retries=1):
+    # Alerts already answered (by a single or batched call) come from the cache;
+    # the rest go out as one prompt, and only items that fail to parse are
+    # retried, first as a smaller batch and finally one by one.
+    prompts = [build_prompt(alert) for alert in batch]
+    outputs = [get_cached(model, mode, prompt) for prompt in prompts]
+    todo = [i for i, output in enumerate(outputs) if output is None]
+    options = {"num_ctx": context_window(model)}
 
-def summarize_alerts(alerts, model="mistral", mode="summary"):
+    attempts = 0
+    while len(todo) > 1 and attempts <= batch_retries:
+        attempts += 1
+        response = ask(BATCH_PROMPTS[mode]([batch[i] for i in todo]), options=options)
+        parsed = parse_batch_response(response, len(todo), mode)
+        for position, output in parsed.items():
+            index = todo[position]
+            outputs[index] = output
+            store_response(model, mode, prompts[index], output)
+        todo = [index for position, index in enumerate(todo) if position not in parsed]
+
+    for index in todo:
+        outputs[index] = ask(prompts[index])
+        if cacheable(outputs[index]):
+            store_response(model, mode, prompts[index], outputs[index])
+    return prompts, outputs
+
+def write_report(out_file, prompts, outputs):
     report_lines = []
+    for prompt, output in zip(prompts, outputs):
+        report_lines += ["===", prompt.strip(), "---", output.strip(), ""]
+    with open(out_file, "a") as f:
+        f.write("\n".join(report_lines) + "\n")
+
+def write_combined_report(alerts, outputs):
+    # One generation answers both questions; each half goes to the file the
+    # single-purpose mode would have written, under that mode's usual header.
+    summaries = []
+    rules = []
+    for output in outputs:
+        summary, rule_lines = split_combined_output(output)
+        summaries.append(summary or output)
+        rules.append(rule_lines)
+    write_report(SUMMARY_FILE, [summary_prompt(a) for a in alerts], summaries)
+    write_report(RULES_FILE, [rulegen_prompt(a) for a in alerts], rules)
+
+def chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
 
-    for alert in alerts:
-        if mode == "summary":
-            prompt = summary_prompt(alert)
-            out_file = "logs/summary_report.txt"
-        else:
-            prompt = rulegen_prompt(alert)
-            out_file = "logs/rule_suggestions.txt"
+def write_outputs(mode, out_file, alerts, prompts, outputs):
+    if mode == "combined":
+        write_combined_report(alerts, outputs)
+    else:
+        write_report(out_file, prompts, outputs)
 
-        output = call_ollama(model, prompt)
+def summarize_alerts(alerts, model="mistral", mode="summary", concurrency=4, timeout=60, retries=2,
+                     batch_size=None, budget=None, policy=None):
+    if mode == "summary":
+        build_prompt = summary_prompt
+        out_file = SUMMARY_FILE
+    elif mode == "combined":
+        build_prompt = combined_prompt
+        out_file = f"{SUMMARY_FILE} and {RULES_FILE}"
+    else:
+        build_prompt = rulegen_prompt
+        out_file = RULES_FILE
 
-        report_lines.append("===")
-        report_lines.append(prompt.strip())
-        report_lines.append("---")
-        report_lines.append(output.strip())
-        report_lines.append("")
+    if policy is not None:
+        # Signatures with a fixed decision are answered straight from the
+        # policy; only unknown signatures go on to the model.
+        unknown = []
+        decided_alerts, decided_prompts, decided_outputs = [], [], []
+        for alert in alerts:
+            decision = policy.match(alert)
+            if decision is None:
+                unknown.append(alert)
+                continue
+            decided_alerts.append(alert)
+            decided_prompts.append(build_prompt(alert))
+            decided_outputs.append(policy.render(alert, decision[0], decision[1], mode))
+        if decided_alerts:
+            write_outputs(mode, out_file, decided_alerts, decided_prompts, decided_outputs)
+        print(f"[+] Fast path: {policy.report()}")
+        alerts = unknown
+
+    client = OllamaClient(pool_size=concurrency, timeout=timeout, retries=retries)
+
+    def ask(prompt, options=None):
+        output = call_ollama(model, prompt, client=client, options=options)
+        if budget is not None:
+            budget.charge(prompt, output)
+        return output
+
+    if batch_size:
+        # "auto" fits as many alerts as the model's context allows; a number is
+        # used as an upper bound so a large value can't overflow the context.
+        limit = MAX_BATCH if batch_size == "auto" else int(batch_size)
+        size = adaptive_batch_size(alerts, model, mode, max_batch=limit)
+        print(f"[*] Batching {size} alerts per prompt (context window {context_window(model)} tokens)")
+        units = chunked(list(alerts), size)
+
+        def run(batch):
+            return run_batch(batch, model, mode, ask, build_prompt)
+    else:
+        units = ([alert] for alert in alerts)
+
+        def run(batch):
+            prompt = build_prompt(batch[0])
+            return [prompt], [cached_call(model, mode, prompt, lambda: ask(prompt))]
+
+    can_submit = (lambda: not budget.exhausted()) if budget is not None else None
+
+    started = time.monotonic()
+    done = 0
+
+    try:
+        for batch, (prompts, outputs) in ordered_map(run, units, concurrency=concurrency, can_submit=can_submit):
+            # Append immediately after each prompt+output, in alert order
+            write_outputs(mode, out_file, batch, prompts, outputs)
+            done += len(prompts)
+    finally:
+        client.close()
 
-        # Append immediately after each prompt+output
-        with open(out_file, "a") as f:
-            f.write("\n".join(report_lines) + "\n")
-        report_lines.clear()
+    remaining = [alert for batch in units for alert in batch]
 
-    print(f"[+] {mode.title()} complete. Output appended to {out_file}")
+    print(f"[+] {mode.title()} complete: {done} alerts in {time.monotonic() - started:.1f}s "
+          f"(concurrency {concurrency}). Output appended to {out_file}")
+    stats = cache_stats().get(mode)
+    if stats:
+        print(f"[+] LLM cache: {stats['hits']} hits / {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
+    if remaining:
+        print(f"[!] Budget exhausted ({budget.describe()}): {len(remaining)} alerts not processed")
+    return remaining
@@ -0,0 +1,189 @@
+# llm_reasoner/response_cache.py
+
+import hashlib
+import os
+import re
+import sqlite3
+import time
+
+CACHE_DB_PATH = "logs/llm_cache.db"
+MAX_ENTRIES = 20000
+MAX_BYTES = 64 * 1024 * 1024
+
+# Seconds a cached answer stays valid per mode; 0 disables caching for that mode
+DEFAULT_TTLS = {
+    "summary": 24 * 3600,
+    "rulegen": 6 * 3600,
+    "combined": 6 * 3600,
+    "admin": 3600,
+}
+DEFAULT_TTL = 6 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+CREATE TABLE IF NOT EXISTS stats (
+    mode TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0,
+    evictions INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+TIMESTAMP_RE = re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:?\d{2})?")
+OCCURRENCES_RE = re.compile(r"Occurrences: \d+")
+
+
+def normalize_prompt(prompt):
+    # Alert timestamps and occurrence counts change every cycle without changing
+    # what the model is asked, so they are masked out of the cache key.
+    prompt = TIMESTAMP_RE.sub("<ts>", prompt)
+    prompt = OCCURRENCES_RE.sub("Occurrences: <n>", prompt)
+    return re.sub(r"\s+", " ", prompt).strip()
+
+
+def cache_key(model, mode, prompt, system_prompt=None):
+    h = hashlib.sha256()
+    for part in (model, mode, normalize_prompt(system_prompt or ""), normalize_prompt(prompt)):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def mode_ttl(mode, ttls=None):
+    return (ttls or DEFAULT_TTLS).get(mode, DEFAULT_TTL)
+
+
+def connect(db_path=CACHE_DB_PATH):
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _bump(conn, mode, column, amount=1):
+    conn.execute("INSERT OR IGNORE INTO stats (mode) VALUES (?)", (mode,))
+    conn.execute(f"UPDATE stats SET {column} = {column} + ? WHERE mode = ?", (amount, mode))
+
+
+def get_cached(model, mode, prompt, system_prompt=None, db_path=CACHE_DB_PATH, ttls=None):
+    ttl = mode_ttl(mode, ttls)
+    if ttl <= 0:
+        return None
+
+    key = cache_key(model, mode, prompt, system_prompt)
+    now = time.time()
+    conn = connect(db_path)
+    try:
+        with conn:
+            row = conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and now - row[1] <= ttl:
+                conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                _bump(conn, mode, "hits")
+                return row[0]
+            if row:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            _bump(conn, mode, "misses")
+            return None
+    finally:
+        conn.close()
+
+
+def store_response(model, mode, prompt, response, system_prompt=None, db_path=CACHE_DB_PATH,
+                   max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES, ttls=None):
+    if mode_ttl(mode, ttls) <= 0:
+        return
+
+    key = cache_key(model, mode, prompt, system_prompt)
+    now = time.time()
+    conn = connect(db_path)
+    try:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, mode, response, created, accessed, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, mode, response, now, now, len(response.encode("utf-8"))),
+            )
+            evict(conn, max_entries, max_bytes)
+    finally:
+        conn.close()
+
+
+def evict(conn, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+    count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+    if count <= max_entries and total <= max_bytes:
+        return 0
+
+    # Walk least recently used entries until both limits are satisfied
+    victims = []
+    for key, mode, size in conn.execute("SELECT key, mode, size FROM responses ORDER BY accessed"):
+        if count <= max_entries and total <= max_bytes:
+            break
+        victims.append((key, mode))
+        count -= 1
+        total -= size
+
+    conn.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key, _ in victims])
+    for _, mode in victims:
+        _bump(conn, mode, "evictions")
+    return len(victims)
+
+
+def cacheable(response):
+    return bool(response and response.strip()) and not response.startswith("[!] Error")
+
+
+def cached_call(model, mode, prompt, fn, system_prompt=None, db_path=CACHE_DB_PATH):
+    cached = get_cached(model, mode, prompt, system_prompt, db_path=db_path)
+    if cached is not None:
+        return cached
+
+    response = fn()
+    if cacheable(response):
+        store_response(model, mode, prompt, response, system_prompt, db_path=db_path)
+    return response
+
+
+def cache_stats(db_path=CACHE_DB_PATH):
+    if not os.path.exists(db_path):
+        return {}
+    conn = connect(db_path)
+    try:
+        stats = {}
+        for mode, hits, misses, evictions in conn.execute("SELECT mode, hits, misses, evictions FROM stats"):
+            lookups = hits + misses
+            stats[mode] = {
+                "hits": hits,
+                "misses": misses,
+                "evictions": evictions,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
+        for mode, entries, size in conn.execute(
+                "SELECT mode, COUNT(*), COALESCE(SUM(size), 0) FROM responses GROUP BY mode"):
+            stats.setdefault(mode, {"hits": 0, "misses": 0, "evictions": 0, "hit_rate": 0.0})
+            stats[mode]["entries"] = entries
+            stats[mode]["bytes"] = size
+        return stats
+    finally:
+        conn.close()
+
+
+def clear_cache(db_path=CACHE_DB_PATH):
+    if os.path.exists(db_path):
+        conn = connect(db_path)
+        try:
+            with conn:
+                conn.execute("DELETE FROM responses")
+                conn.execute("DELETE FROM stats")
+        finally:
+            conn.close()
@@ -0,0 +1,123 @@
+# llm_reasoner/signature_policy.py
+
+import json
+import os
+
+POLICY_PATH = "config/signature_policy.json"
+ACTIONS = ("ignore", "block_src", "block_dst")
+DEFAULT_TABLE = "suspicious_ips"
+
+
+class SignaturePolicy:
+    # Deterministic decisions for signatures whose outcome never changes. SIDs
+    # and exact signature texts are plain dict lookups; prefixes are grouped by
+    # length so the longest matching prefix is found with one lookup per
+    # distinct prefix length instead of a scan over every entry.
+
+    def __init__(self, sids=None, signatures=None, prefixes=None, table=DEFAULT_TABLE, path=None):
+        self.table = table
+        self.path = path
+        self.sids = {str(k): self._check(v) for k, v in (sids or {}).items()}
+        self.signatures = {k.casefold(): self._check(v) for k, v in (signatures or {}).items()}
+        self.prefixes = {}
+        for prefix, action in (prefixes or {}).items():
+            self.prefixes.setdefault(len(prefix), {})[prefix.casefold()] = (prefix, self._check(action))
+        self.prefix_lengths = sorted(self.prefixes, reverse=True)
+        self.hits = {}
+        self.misses = 0
+
+    @staticmethod
+    def _check(action):
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown policy action {action!r}, expected one of {', '.join(ACTIONS)}")
+        return action
+
+    @classmethod
+    def load(cls, path=POLICY_PATH):
+        with open(path, "r") as f:
+            if path.endswith((".yaml", ".yml")):
+                import yaml
+                data = yaml.safe_load(f) or {}
+            else:
+                data = json.load(f)
+        return cls(data.get("sids"), data.get("signatures"), data.get("prefixes"),
+                   data.get("table", DEFAULT_TABLE), path)
+
+    def lookup(self, alert):
+        sid = str(alert.get("sid", "") or "")
+        if sid and sid in self.sids:
+            return self.sids[sid], f"sid {sid}"
+
+        signature = (alert.get("signature") or "").casefold()
+        if signature in self.signatures:
+            return self.signatures[signature], "signature"
+
+        for length in self.prefix_lengths:
+            if length <= len(signature):
+                entry = self.prefixes[length].get(signature[:length])
+                if entry:
+                    return entry[1], f"prefix '{entry[0]}'"
+        return None
+
+    def match(self, alert):
+        decision = self.lookup(alert)
+        if decision is None:
+            self.misses += 1
+        else:
+            self.hits[decision[0]] = self.hits.get(decision[0], 0) + 1
+        return decision
+
+    def target_for(self, alert, action):
+        if action == "block_src":
+            return alert["src_ip"]
+        if action == "block_dst":
+            return alert["dest_ip"]
+        return None
+
+    def rule_for(self, alert, action):
+        target = self.target_for(alert, action)
+        return f"ADD {target} TO TABLE {self.table}" if target else None
+
+    def render(self, alert, action, matched_by, mode):
+        # The table command appears only under "Rules:"; the summary describes
+        # the block in words so splitting a combined answer yields it once
+        rule = self.rule_for(alert, action)
+        source = self.path or "the signature policy"
+        if action == "ignore":
+            summary = (f"Summary: Known signature, handled by policy ({matched_by}): no action required.\n\n"
+                       f"Explanation: This signature is marked as benign in {source}.")
+        else:
+            target = "source" if action == "block_src" else "destination"
+            summary = (f"Summary: Known malicious signature, handled by policy ({matched_by}): "
+                       f"blocking the {target} address.\n\n"
+                       f"Recommended Actions:\n- Block {self.target_for(alert, action)} in the <{self.table}> table.")
+
+        rules = f"{rule}  # policy: {matched_by}" if rule else f"No action required.  # policy: {matched_by}"
+        if mode == "summary":
+            return summary
+        if mode == "rulegen":
+            return rules
+        return f"{summary}\n\nRules:\n{rules}"
+
+    def report(self):
+        hits = sum(self.hits.values())
+        total = hits + self.misses
+        rate = hits / total if total else 0.0
+        detail = ", ".join(f"{action}={count}" for action, count in sorted(self.hits.items())) or "none"
+        return f"{hits}/{total} alerts decided by signature policy ({rate:.0%}; {detail}), {self.misses} sent to the LLM"
+
+
+_loaded = {}
+
+
+def load_policy(path=POLICY_PATH):
+    # Parsed once per process (and again only if the file changes)
+    if not path or not os.path.exists(path):
+        return None
+    mtime = os.path.getmtime(path)
+    cached = _loaded.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    policy = SignaturePolicy.load(path)
+    _loaded[path] = (mtime, policy)
+    return policy
@@ -0,0 +1,171 @@
+# llm_reasoner/work_queue.py
+
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime
+
+from .aggregator import GROUP_KEY, parse_timestamp, severity_rank
+from .batching import estimate_tokens
+
+DEFERRED_PATH = "logs/deferred_{mode}.jsonl"
+SKIP_REPORT_PATH = "logs/deferred_report.txt"
+MAX_DEFERRED = 5000
+
+
+def priority_key(alert):
+    # Most severe first (Suricata severity 1 is the highest), then most recent,
+    # then the noisiest group.
+    seen = parse_timestamp(alert.get("last_seen") or alert.get("timestamp")) or 0
+    try:
+        count = int(alert.get("count", 1) or 1)
+    except (TypeError, ValueError):
+        count = 1
+    return severity_rank(alert.get("severity")), -seen, -count
+
+
+def prioritize(alerts):
+    return sorted(alerts, key=priority_key)
+
+
+class Budget:
+    # Wall-clock and token budget for one reasoner cycle. Tokens are charged
+    # only for real model calls (cache hits are free); calls already in flight
+    # when the budget runs out are allowed to finish.
+
+    def __init__(self, seconds=None, tokens=None):
+        self.seconds = float(seconds) if seconds else None
+        self.tokens = int(tokens) if tokens else None
+        self.started = time.monotonic()
+        self.used_tokens = 0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def charge(self, prompt, output):
+        with self._lock:
+            self.used_tokens += estimate_tokens(prompt) + estimate_tokens(output or "")
+            self.calls += 1
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def exhausted(self):
+        if self.seconds is not None and self.elapsed() >= self.seconds:
+            return True
+        with self._lock:
+            return self.tokens is not None and self.used_tokens >= self.tokens
+
+    def describe(self):
+        limits = []
+        if self.seconds is not None:
+            limits.append(f"{self.elapsed():.0f}/{self.seconds:.0f}s")
+        if self.tokens is not None:
+            limits.append(f"{self.used_tokens}/{self.tokens} tokens")
+        return ", ".join(limits) or "unlimited"
+
+
+def load_deferred(mode, path=DEFERRED_PATH):
+    path = path.format(mode=mode)
+    if not os.path.exists(path):
+        return []
+    deferred = []
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                deferred.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return deferred
+
+
+def save_deferred(alerts, mode, path=DEFERRED_PATH, max_deferred=MAX_DEFERRED, seed=None):
+    # Everything that missed the budget is carried over to the next cycle. If
+    # the backlog is larger than max_deferred, the highest-priority items are
+    # kept and the rest of the slots go to a random sample of the remainder so
+    # low-severity traffic is still represented.
+    alerts = prioritize(alerts)
+    dropped = []
+    if len(alerts) > max_deferred:
+        keep = max_deferred // 2
+        head, tail = alerts[:keep], alerts[keep:]
+        rng = random.Random(seed)
+        sampled = set(rng.sample(range(len(tail)), max_deferred - keep))
+        dropped = [a for i, a in enumerate(tail) if i not in sampled]
+        alerts = head + [a for i, a in enumerate(tail) if i in sampled]
+
+    path = path.format(mode=mode)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        for alert in alerts:
+            f.write(json.dumps(alert) + "\n")
+    os.replace(tmp_path, path)
+    return alerts, dropped
+
+
+def drop_reloaded(alerts, deferred):
+    # Raw alerts (before aggregation) that fall within the time span of a
+    # deferred group for the same flow and signature were loaded last cycle
+    # and are already in that group's count. Returns the rest.
+    spans = {}
+    for group in deferred:
+        start = parse_timestamp(group.get("first_seen") or group.get("timestamp"))
+        end = parse_timestamp(group.get("last_seen") or group.get("timestamp"))
+        if start is not None and end is not None:
+            spans.setdefault(tuple(group.get(field) for field in GROUP_KEY), []).append((start, end))
+
+    fresh = []
+    for alert in alerts:
+        ts = parse_timestamp(alert.get("timestamp"))
+        key = tuple(alert.get(field) for field in GROUP_KEY)
+        if ts is not None and any(start <= ts <= end for start, end in spans.get(key, ())):
+            continue
+        fresh.append(alert)
+    return fresh
+
+
+def merge_deferred(alerts, deferred):
+    # A deferred group and a fresh one for the same flow and signature are
+    # merged so the model is not asked about the same thing twice. Alerts
+    # loaded again are removed beforehand with drop_reloaded, so the counts
+    # can simply be added.
+    merged = {}
+    order = []
+    for alert in list(deferred) + list(alerts):
+        key = tuple(alert.get(field) for field in GROUP_KEY)
+        if key not in merged:
+            merged[key] = dict(alert)
+            order.append(key)
+            continue
+        group = merged[key]
+        group["count"] = int(group.get("count", 1) or 1) + int(alert.get("count", 1) or 1)
+        group.setdefault("first_seen", group.get("timestamp", ""))
+        group["last_seen"] = alert.get("last_seen") or alert.get("timestamp", "")
+        if severity_rank(alert.get("severity")) < severity_rank(group.get("severity")):
+            group["severity"] = alert.get("severity")
+    return [merged[key] for key in order]
+
+
+def write_skip_report(deferred, dropped, budget, processed, mode, path=SKIP_REPORT_PATH):
+    by_severity = {}
+    for alert in deferred:
+        sev = str(alert.get("severity", "?"))
+        by_severity[sev] = by_severity.get(sev, 0) + 1
+
+    lines = [
+        f"[{datetime.now().isoformat()}] {mode} cycle budget: {budget.describe()}",
+        f"Processed: {processed} | Deferred to next cycle: {len(deferred)} | Dropped by sampling: {len(dropped)}",
+        "Deferred by severity: " + (", ".join(f"{k}={v}" for k, v in sorted(by_severity.items())) or "none"),
+    ]
+    for alert in deferred[:20]:
+        lines.append(f"  - sev {alert.get('severity')} x{alert.get('count', 1)} "
+                     f"{alert.get('src_ip')} → {alert.get('dest_ip')} | {alert.get('signature')}")
+    if len(deferred) > 20:
+        lines.append(f"  ... and {len(deferred) - 20} more")
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as f:
+        f.write("\n".join(lines) + "\n\n")
+    return lines
@@ -1,6 +1,9 @@
 # main.py
 import fire
 
+ENFORCE_CHECKPOINT = "logs/enforce_checkpoint.json"
+EXPLAIN_CHECKPOINT = "logs/explain_checkpoint.json"
+
 class AdaptiveFirewall:
     def sniff(self):
         print("[*] Capturing traffic...")
@@ -8,16 +11,31 @@ class AdaptiveFirewall:
         flow_data = capture_live(timeout=30)
         print("[+] Flow capture complete.")
 
-    def detect(self):
+    def detect(self, stream=False, interface="en0", idle_timeout=15, active_timeout=120, duration=None,
+               baseline=True, trained=True):
         print("[*] Running anomaly detection...")
         from flow_sniffer.flow_sniffer import capture_live
         from anomaly_detection.detector import analyze_flows
-        from flow_sniffer.flow_logger import save_flows_to_csv, save_anomalies_to_csv
+        from anomaly_detection.model import load_baseline, load_flow_model
+        from anomaly_detection.scan_detector import ScanDetector, detect_scans
+        from flow_sniffer.flow_logger import FlowLogWriter, save_anomalies_to_csv
+
+        model = load_baseline() if baseline else None
+        forest = load_flow_model() if trained else None
+        if stream:
+            return self._detect_stream(interface, idle_timeout, active_timeout, duration, model, forest,
+                                       ScanDetector())
 
         flow_data = capture_live(timeout=30)
-        save_flows_to_csv(flow_data)
+        with FlowLogWriter() as writer:
+            writer.write_many(flow_data)
 
-        anomalies = analyze_flows(flow_data)
+        anomalies = analyze_flows(flow_data) + detect_scans(flow_data)
+        if model:
+            anomalies += model.score_flows(flow_data)
+            model.save()
+        if forest:
+            anomalies += forest.detect(flow_data)
 
         if anomalies:
             print(f"[!] {len(anomalies)} suspicious flows detected:")
@@ -27,48 +45,378 @@ class AdaptiveFirewall:
         else:
             print("[+] No anomalies detected.")
 
-    def alerts(self):
+    def _detect_stream(self, interface, idle_timeout, active_timeout, duration, model=None, forest=None,
+                       scans=None):
+        import time
+        from flow_sniffer.flow_sniffer import stream_flows
+        from anomaly_detection.detector import analyze_flows
+        from flow_sniffer.flow_logger import FlowLogWriter, append_anomalies_to_csv
+
+        total = 0
+        saved = time.monotonic()
+        writer = FlowLogWriter()
+        try:
+            for expired in stream_flows(interface, idle_timeout=idle_timeout, active_timeout=active_timeout,
+                                        duration=duration):
+                total += len(expired)
+                writer.write_many(expired)
+                anomalies = analyze_flows(dict(expired))
+                if scans:
+                    anomalies += scans.update(expired)
+                if model:
+                    anomalies += model.score_flows(expired)
+                    if time.monotonic() - saved >= 60:
+                        model.save()
+                        saved = time.monotonic()
+                if forest:
+                    anomalies += forest.detect(dict(expired))
+                for fid, reason in anomalies:
+                    print(f"[!] {fid}: {reason}")
+                if anomalies:
+                    append_anomalies_to_csv(anomalies)
+        except KeyboardInterrupt:
+            pass
+        writer.close()
+        if model:
+            model.save()
+        print(f"[+] Stream stopped after {total} flows.")
+
+    def ingest_pcap(self, *paths, workers=None):
+        print("[*] Replaying captured traffic...")
+        from flow_sniffer.pcap_reader import ingest_pcaps
+        from anomaly_detection.detector import analyze_flows
+        from anomaly_detection.scan_detector import detect_scans
+        from flow_sniffer.flow_logger import save_flows_to_csv, save_anomalies_to_csv
+
+        if not paths:
+            print("[!] No pcap files given.")
+            return
+
+        flow_data = ingest_pcaps(paths, workers=workers)
+        save_flows_to_csv(flow_data, out_file="pcap_flow_log.csv")
+
+        anomalies = analyze_flows(flow_data) + detect_scans(flow_data)
+        if anomalies:
+            print(f"[!] {len(anomalies)} suspicious flows detected:")
+            for fid, reason in anomalies:
+                print(f" -> {fid}: {reason}")
+            save_anomalies_to_csv(anomalies, out_file="pcap_alerts.csv")
+        else:
+            print("[+] No anomalies detected.")
+
+    def flows(self, since=None, until=None, last=None, out=None):
+        # Reads the binary flow log; --out exports the selection as CSV
+        import time
+        from flow_sniffer.flow_logger import read_flow_log, save_flows_to_csv
+        from flow_sniffer.flow_table import format_flow_id
+
+        if last is not None:
+            since = time.time() - float(last)
+        records = read_flow_log(since=since, until=until)
+        if out:
+            save_flows_to_csv(records, out_file=out)
+            return
+        count = 0
+        for flow_key, stats in records:
+            count += 1
+            print(f"{format_flow_id(flow_key)}  {stats.packets} pkts  {stats.bytes} bytes  "
+                  f"syn={stats.syn}  last_seen={stats.as_dict()['last_seen']}")
+        print(f"[+] {count} flows.")
+
+    def train(self, logs=None, since=None, until=None, trees=100, sample_size=256, seed=42, contamination=0.01):
+        print("[*] Training flow model on historical flow logs...")
+        from anomaly_detection.model import train_flow_model
+
+        try:
+            model, path = train_flow_model(logs, since=since, until=until, n_trees=trees, sample_size=sample_size,
+                                           seed=seed, contamination=contamination)
+        except (ImportError, OSError, ValueError) as e:
+            print(f"[❌] Training failed: {e}")
+            return
+        print(f"[✅] Model {model.version()} saved to {path} (threshold {model.threshold:.3f})")
+
+    def alerts(self, follow=False, bulk=False, workers=None):
         print("[*] Parsing Suricata alerts...")
-        from suricata_alerts.alert_parser import parse_suricata_alerts
-        alerts = parse_suricata_alerts()
+        if bulk:
+            from suricata_alerts.bulk_parser import parse_suricata_alerts_bulk
+            alerts = parse_suricata_alerts_bulk(workers=workers)
+        else:
+            from suricata_alerts.alert_parser import parse_suricata_alerts
+            alerts = parse_suricata_alerts(follow=follow)
         if not alerts:
             print("[+] No alerts found.")
 
-    def explain(self, model="mistral", mode="summary"):
+    def explain(self, model="mistral", mode="summary", last=None, since=None, max_severity=None, limit=None,
+                window=300, concurrency=4, timeout=60, retries=2, batch_size=None,
+                time_budget=None, token_budget=None, policy="config/signature_policy.json", full=False):
         print(f"[*] Using model: {model} | Mode: {mode}")
-        from llm_reasoner.reasoner import load_alerts, summarize_alerts
+        import os
+        from llm_reasoner.reasoner import load_alerts, load_alerts_from_store, summarize_alerts
+        from llm_reasoner.aggregator import aggregate_alerts, aggregation_stats
+        from llm_reasoner.signature_policy import load_policy
+        from llm_reasoner.work_queue import (Budget, drop_reloaded, load_deferred, merge_deferred, prioritize,
+                                             save_deferred, write_skip_report)
 
-        alerts = load_alerts("logs/suricata_alerts.csv")
-        if not alerts:
-            print("[!] No alerts to summarize.")
+        checkpoint = None
+        if os.path.exists("logs/alerts.db"):
+            # Without --last/--since only alerts stored since the previous run
+            # in this mode are explained; --full starts from the beginning
+            after_id = None
+            if last is None and since is None:
+                checkpoint = self._explain_checkpoint(mode, full)
+                after_id = checkpoint[mode]
+            alerts = load_alerts_from_store(last=last, since=since, max_severity=max_severity, limit=limit,
+                                            after_id=after_id, include_id=True)
+            ids = [alert.pop("id") for alert in alerts]
+            if checkpoint is not None and ids:
+                checkpoint[mode] = max(ids)
+        else:
+            alerts = load_alerts("logs/suricata_alerts.csv")
+        deferred = load_deferred(mode)
+        if not alerts and not deferred:
+            print("[!] No alerts to summarize." if checkpoint is None else "[+] No new alerts since the last run.")
             return
 
-        summarize_alerts(alerts, model=model, mode=mode)
+        if deferred:
+            # Alerts the deferred groups already account for
+            fresh = drop_reloaded(alerts, deferred)
+            if len(fresh) < len(alerts):
+                print(f"[*] {len(alerts) - len(fresh)} alerts already counted in deferred groups")
+            alerts = fresh
+
+        # window=0 disables aggregation and sends one prompt per alert
+        groups = aggregate_alerts(alerts, window=window)
+        print(f"[*] Aggregated {aggregation_stats(alerts, groups)}")
+        if deferred:
+            print(f"[*] Picking up {len(deferred)} alert groups deferred by the previous cycle")
+            groups = merge_deferred(groups, deferred)
 
-    def enforce(self, file="logs/rule_suggestions.txt"):
+        # Most severe and most recent first, so a flood of informational alerts
+        # can't starve the ones that matter when the budget runs out
+        groups = prioritize(groups)
+        budget = Budget(seconds=time_budget, tokens=token_budget)
+
+        remaining = summarize_alerts(groups, model=model, mode=mode, concurrency=concurrency, timeout=timeout,
+                                     retries=retries, batch_size=batch_size, budget=budget,
+                                     policy=load_policy(policy) if policy else None)
+
+        kept, dropped = save_deferred(remaining, mode)
+        if remaining:
+            for line in write_skip_report(kept, dropped, budget, len(groups) - len(remaining), mode):
+                print(f"    {line}")
+        # Alerts that missed the budget are in the deferred file, so the
+        # checkpoint can move past everything that was loaded
+        if checkpoint is not None:
+            from suricata_alerts.alert_parser import save_checkpoint
+            save_checkpoint(checkpoint, EXPLAIN_CHECKPOINT)
+
+    def _explain_checkpoint(self, mode, full=False):
+        # Highest alert id already explained, per mode
+        from suricata_alerts.alert_parser import load_checkpoint
+        from suricata_alerts.alert_store import max_alert_id
+
+        checkpoint = load_checkpoint(EXPLAIN_CHECKPOINT)
+        last_id = checkpoint.get(mode, 0)
+        if full or last_id > max_alert_id("logs/alerts.db"):
+            # A store that was recreated numbers its alerts from 1 again
+            last_id = 0
+        checkpoint[mode] = last_id
+        return checkpoint
+
+    def enforce(self, file="logs/rule_suggestions.txt", sync=True, density=None, full=False):
         print("[*] Enforcing firewall rules from LLM output...")
-        from rule_engine.pf_rule_enforcer import apply_rule, is_valid_pf_rule, is_table_command, parse_table_command, modify_table
+        import os
+        from rule_engine.pf_rule_enforcer import (apply_rules, is_valid_pf_rule, is_table_command, parse_table_command,
+                                                  canonical_address, collect_table_changes, report_table_results)
+        from rule_engine.table_mirror import apply_mirrored_changes, mirror_lock
+        from rule_engine.block_expiry import drop_stale_adds, parse_alert_time, parse_severity, record_table_results
+        from suricata_alerts.alert_parser import save_checkpoint
 
-        try:
-            with open(file, "r") as f:
-                lines = f.readlines()
-
-            for line in lines:
-                rule = line.strip()
-
-                if is_table_command(rule):
-                    parsed = parse_table_command(rule)
-                    if parsed:
-                        action, ip, table = parsed
-                        modify_table(action, ip, table)
-                    else:
-                        print(f"[❌] Invalid table command format:\n    → {rule}")
-                elif is_valid_pf_rule(rule):
-                    apply_rule(rule)
-
-        except FileNotFoundError:
+        if not os.path.exists(file):
             print(f"[!] File not found: {file}")
+            return
+
+        # Only suggestions appended since the last run are enforced, otherwise
+        # every run would block expired addresses again. --full re-reads it all.
+        lines, state = self._new_suggestions(file, full)
+
+        # Table commands are collected and applied with one pfctl call per
+        # table and operation instead of one per line; pf rules are merged
+        # into the conf together and loaded with a single reload
+        table_commands = []
+        pf_rules = []
+        severities = {}
+        alert_times = {}
+        severity = alert_time = None
+        for line in lines:
+            rule = line.strip()
+
+            # Each suggestion block starts with "===" and the alert header,
+            # which carries the severity the block duration is based on and
+            # the alert time that tells a new offense from a repeated one
+            if rule == "===":
+                severity = alert_time = None
+            elif parse_severity(rule) is not None:
+                severity = parse_severity(rule)
+                alert_time = parse_alert_time(rule)
+            elif rule.startswith("Occurrences:"):
+                alert_time = parse_alert_time(rule) or alert_time
+            elif is_table_command(rule):
+                parsed = parse_table_command(rule)
+                if parsed:
+                    table_commands.append(parsed)
+                    key = (parsed[2], canonical_address(parsed[1]))
+                    if severity is not None:
+                        severities[key] = min(severity, severities.get(key, severity))
+                    if alert_time is not None:
+                        alert_times[key] = max(alert_time, alert_times.get(key, alert_time))
+                else:
+                    print(f"[❌] Invalid table command format:\n    → {rule}")
+            elif is_valid_pf_rule(rule):
+                pf_rules.append(rule)
+
+        if pf_rules:
+            apply_rules(pf_rules)
+        if table_commands:
+            changes, invalid = collect_table_changes(table_commands)
+            # Checked against the local table mirror first: addresses pf
+            # already holds are skipped and dense ranges go in as CIDRs
+            with mirror_lock():
+                for table, address in drop_stale_adds(changes, alert_times):
+                    print(f"[ℹ️] Skipping {address} <{table}>: the alert predates its last block")
+                results = apply_mirrored_changes(changes, sync=sync, density=density)
+                record_table_results(results, severities, alert_times)
+            report_table_results(results, invalid)
+        if not lines:
+            print("[+] No new rule suggestions.")
+
+        save_checkpoint(state, ENFORCE_CHECKPOINT)
+
+    def _new_suggestions(self, file, full=False):
+        # Lines after the enforce checkpoint, and the checkpoint to save once
+        # they have been applied
+        import os
+        from datetime import datetime
+        from suricata_alerts.alert_parser import load_checkpoint, resolve_start_offset, read_new_lines
+
+        offset, _ = (0, "full") if full else resolve_start_offset(file, load_checkpoint(ENFORCE_CHECKPOINT))
+        st = os.stat(file)
+        lines = []
+        new_offset = offset
+        for raw, new_offset in read_new_lines(file, offset):
+            lines.append(raw.decode("utf-8", errors="ignore"))
+        return lines, {
+            "path": os.path.abspath(file),
+            "inode": st.st_ino,
+            "device": st.st_dev,
+            "offset": new_offset,
+            "updated": datetime.now().isoformat(),
+        }
 
+    def expire(self, watch=False, interval=60, sync=False):
+        # Lifts blocks whose TTL has passed; --watch keeps sweeping
+        import time
+        from rule_engine.table_mirror import mirror_lock
+        from rule_engine.block_expiry import sweep_expired
+
+        while True:
+            with mirror_lock():
+                due, results, next_expiry = sweep_expired(sync=sync)
+            if due or not watch:
+                when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(next_expiry)) if next_expiry else "none"
+                print(f"[+] {len(due)} block(s) expired, next expiry: {when}")
+            if not watch:
+                return
+            time.sleep(interval)
+
+    def tables(self, sync=False):
+        from rule_engine.table_mirror import load_mirrors, save_mirrors, sync_mirror
+
+        mirrors = load_mirrors()
+        if not mirrors:
+            print("[+] No pf tables mirrored yet.")
+            return
+        for name, mirror in mirrors.items():
+            if sync:
+                sync_mirror(mirror)
+            to_add, to_delete = mirror.diff()
+            print(f"[+] <{name}>: {len(mirror.members())} members, {len(mirror.kernel)} kernel entries, "
+                  f"{len(to_add)} to add, {len(to_delete)} to delete")
+        if sync:
+            save_mirrors(mirrors)
+
+
+    def simulate(self, last=3600, since=None, until=None, alerts=False, pending=True,
+                 file="logs/rule_suggestions.txt", conf="logs/test_pf.conf", direction="in", interface=None, top=10):
+        # What would the current conf plus not yet enforced suggestions do to
+        # recent flows (or alerts with --alerts)? Nothing is sent to pf.
+        import os
+        import time
+        from rule_engine.pf_rule_enforcer import is_table_command, parse_table_command, canonical_address
+        from rule_engine.table_mirror import TableMirror, load_mirrors
+        from rule_engine.policy_sim import load_policy, packet_from_alert, packet_from_flow, simulate
+
+        lines = self._new_suggestions(file)[0] if pending and os.path.exists(file) else []
+        tables = load_mirrors()
+        for line in lines:
+            parsed = parse_table_command(line.strip()) if is_table_command(line.strip()) else None
+            address = canonical_address(parsed[1]) if parsed else None
+            if address:
+                mirror = tables.setdefault(parsed[2], TableMirror(parsed[2]))
+                mirror.add(address) if parsed[0] == "ADD" else mirror.remove(address)
+
+        policy, errors = load_policy(conf, lines, tables)
+        pending_count = sum(rule.source == "pending" for rule in policy.rules)
+        print(f"[*] Policy: {len(policy.rules)} rules ({pending_count} pending), {len(tables)} tables")
+        for text, reason in errors:
+            print(f"[❌] Could not parse rule ({reason}):\n    → {text}")
+        wording = {"duplicate": "a duplicate of", "shadowed": "shadowed by", "redundant": "made redundant by"}
+        for kind, rule, other in policy.conflicts():
+            print(f"[!] Rule #{rule.index} is {wording[kind]} rule #{other.index}:\n    → {rule.text}\n    → {other.text}")
+
+        cache = {}
+        if alerts:
+            from suricata_alerts.alert_store import query_alerts
+            records = query_alerts(last=last if since is None else None, since=since, until=until)
+            packets = [packet_from_alert(a, direction, interface, cache) for a in records]
+        else:
+            from flow_sniffer.flow_logger import read_flow_log
+            if since is None and last is not None:
+                since = time.time() - float(last)
+            packets = [packet_from_flow(key, direction, interface, cache) for key, _ in read_flow_log(since=since,
+                                                                                                   until=until)]
+        if not packets:
+            print("[+] Nothing to evaluate.")
+            return
+
+        start = time.perf_counter()
+        decided, first_hits = simulate(policy, packets)
+        elapsed = time.perf_counter() - start
+        print(f"[+] Evaluated {len(packets)} {'alerts' if alerts else 'flows'} in {elapsed:.2f}s "
+              f"({len(packets) / elapsed if elapsed else 0:,.0f}/s)")
+        print(f"    default pass: {decided.get(None, 0)}")
+        ranked = sorted((k for k in decided if k is not None), key=lambda k: -decided[k])
+        for index in ranked[:top]:
+            rule = policy.rules[index]
+            tag = " [pending]" if rule.source == "pending" else ""
+            print(f"    {rule.action:<5} {decided[index]:>8} (first match {first_hits.get(index, 0)}) "
+                  f"#{index}{tag}: {rule.text}")
+        unused = [rule for rule in policy.rules if rule.index not in decided and rule.index in first_hits]
+        for rule in unused:
+            print(f"[ℹ️] Rule #{rule.index} matched {first_hits[rule.index]} but never decided: {rule.text}")
+
+    def cache(self, clear=False):
+        from llm_reasoner.response_cache import cache_stats, clear_cache
+        if clear:
+            clear_cache()
+            print("[+] LLM response cache cleared.")
+            return
+        stats = cache_stats()
+        if not stats:
+            print("[+] LLM response cache is empty.")
+        for mode, s in stats.items():
+            print(f"[+] {mode}: {s['hits']} hits, {s['misses']} misses ({s['hit_rate']:.0%}), "
+                  f"{s.get('entries', 0)} entries, {s.get('bytes', 0)} bytes, {s['evictions']} evicted")
 
     def clean_logs(self):
         import os
@@ -1,15 +1,26 @@
 # report/report_generator.py
 import os
+import sys
 import csv
 import subprocess
 from datetime import datetime
 from fpdf import FPDF
 
-def get_suspicious_ips(table_file="logs/suspicious_ips.txt"):
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from rule_engine.table_mirror import load_mirrors
+
+
+def get_suspicious_ips(table_file="logs/suspicious_ips.txt", table="suspicious_ips"):
+    # The table mirror kept by `main.py enforce` already knows the members;
+    # pfctl is only asked when there is no mirror yet
+    mirror = load_mirrors().get(table)
+    if mirror is not None:
+        return mirror.members()
     try:
         os.makedirs("logs", exist_ok=True)
         with open(table_file, "w") as f:
-            subprocess.run(["sudo", "pfctl", "-t", "suspicious_ips", "-Tshow"], stdout=f, check=True)
+            subprocess.run(["sudo", "pfctl", "-t", table, "-Tshow"], stdout=f, check=True)
         with open(table_file, "r") as f:
             return [line.strip() for line in f if line.strip()]
     except Exception as e:
@@ -0,0 +1,187 @@
+import heapq
+import json
+import os
+import re
+import time
+
+from .table_mirror import apply_mirrored_changes
+
+EXPIRY_PATH = "logs/block_expiry.json"
+# Block duration by Suricata severity (1 is the most severe)
+SEVERITY_TTLS = {1: 24 * 3600, 2: 6 * 3600, 3: 3600}
+DEFAULT_TTL = 3600
+# Each repeat offense within OFFENSE_MEMORY multiplies the duration by
+# BACKOFF, up to MAX_TTL
+BACKOFF = 2
+MAX_TTL = 30 * 24 * 3600
+OFFENSE_MEMORY = 30 * 24 * 3600
+
+SEVERITY_RE = re.compile(r"\(Severity:\s*(\d+)\)")
+# Alert header "[<timestamp>] src → dst | ..." and the aggregated
+# "Occurrences: N (first seen X, last seen Y)" line
+ALERT_TIME_RE = re.compile(r"^\[([^\]]+)\]")
+LAST_SEEN_RE = re.compile(r"last seen ([^)]+)\)")
+
+
+def parse_severity(line):
+    match = SEVERITY_RE.search(line)
+    return int(match.group(1)) if match else None
+
+
+def parse_alert_time(line):
+    # Epoch of the (latest) alert a suggestion block is about, or None
+    from suricata_alerts.alert_store import to_epoch
+    match = LAST_SEEN_RE.search(line) or ALERT_TIME_RE.search(line)
+    return to_epoch(match.group(1).strip()) if match else None
+
+
+def block_ttl(severity, offenses):
+    base = SEVERITY_TTLS.get(severity, DEFAULT_TTL)
+    return min(base * BACKOFF ** max(offenses - 1, 0), MAX_TTL)
+
+
+class ExpiryIndex:
+    # Per (table, address): when the block ends and how often the address was
+    # blocked. A min-heap on the expiry time makes finding due entries cheap;
+    # superseded heap items are skipped lazily instead of being removed.
+    # History outlives the block itself so repeat offenders can be recognized.
+
+    def __init__(self, entries=None):
+        self.entries = entries or {}
+        self.heap = [(e["expires"], table, address) for (table, address), e in self.entries.items()
+                     if e.get("expires") is not None]
+        heapq.heapify(self.heap)
+
+    def record_block(self, table, address, severity=None, now=None):
+        now = time.time() if now is None else now
+        entry = self.entries.get((table, address))
+        if entry is None or now - entry["last_blocked"] > OFFENSE_MEMORY:
+            entry = self.entries[(table, address)] = {"offenses": 0}
+        entry["offenses"] += 1
+        entry["last_blocked"] = now
+        entry["severity"] = severity
+        ttl = block_ttl(severity, entry["offenses"])
+        entry["expires"] = now + ttl
+        heapq.heappush(self.heap, (entry["expires"], table, address))
+        return ttl, entry["offenses"]
+
+    def cancel(self, table, address):
+        # Removed by hand: no expiry pending, but the offense count stays
+        entry = self.entries.get((table, address))
+        if entry is not None:
+            entry["expires"] = None
+
+    def is_tracked(self, table, address):
+        entry = self.entries.get((table, address))
+        return entry is not None and entry.get("expires") is not None
+
+    def is_new_offense(self, table, address, alert_time):
+        # Only an alert raised after the address was last blocked counts;
+        # the same alert suggested again is not a new offense
+        entry = self.entries.get((table, address))
+        return entry is None or (alert_time is not None and alert_time > entry["last_blocked"])
+
+    def next_expiry(self):
+        while self.heap:
+            expires, table, address = self.heap[0]
+            if self.entries.get((table, address), {}).get("expires") == expires:
+                return expires
+            heapq.heappop(self.heap)
+        return None
+
+    def pop_due(self, now=None):
+        now = time.time() if now is None else now
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            expires, table, address = heapq.heappop(self.heap)
+            entry = self.entries.get((table, address))
+            if entry is None or entry.get("expires") != expires:
+                continue
+            entry["expires"] = None
+            due.append((table, address))
+        return due
+
+    def prune(self, now=None):
+        # Forget addresses that are no longer blocked and have been quiet for
+        # longer than OFFENSE_MEMORY
+        now = time.time() if now is None else now
+        stale = [key for key, e in self.entries.items()
+                 if e.get("expires") is None and now - e["last_blocked"] > OFFENSE_MEMORY]
+        for key in stale:
+            del self.entries[key]
+        return len(stale)
+
+    def save(self, path=EXPIRY_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump([dict(e, table=table, address=address) for (table, address), e in self.entries.items()], f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=EXPIRY_PATH):
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return cls()
+        entries = {}
+        for e in data:
+            entries[(e.pop("table"), e.pop("address"))] = e
+        return cls(entries)
+
+
+def drop_stale_adds(changes, alert_times, path=EXPIRY_PATH):
+    # An ADD whose alert predates the address's last block has already been
+    # acted on; applying it again would put an expired block straight back.
+    # ADDs without an alert time (written by hand) always go through.
+    index = ExpiryIndex.load(path)
+    stale = []
+    for table, ops in changes.items():
+        for address, action in list(ops.items()):
+            alert_time = alert_times.get((table, address))
+            if action == "ADD" and alert_time is not None and not index.is_new_offense(table, address, alert_time):
+                del ops[address]
+                stale.append((table, address))
+    return stale
+
+
+def record_table_results(results, severities=None, alert_times=None, path=EXPIRY_PATH, now=None):
+    # results: apply_mirrored_changes output. New blocks start a TTL; a new
+    # alert for an address that is still blocked counts as a repeat offense.
+    # Re-applying a block that is already tracked leaves its TTL alone, and
+    # entries that were in the table without a TTL (added by hand) are left
+    # permanent.
+    severities = severities or {}
+    alert_times = alert_times or {}
+    index = ExpiryIndex.load(path)
+    for (table, address), (action, status, detail) in results.items():
+        reoffended = status == "unchanged" and index.is_tracked(table, address) \
+            and index.is_new_offense(table, address, alert_times.get((table, address)))
+        if action == "ADD" and (status == "added" or reoffended):
+            ttl, offenses = index.record_block(table, address, severities.get((table, address)), now)
+            repeat = f", offense #{offenses}" if offenses > 1 else ""
+            print(f"[ℹ️] {address} <{table}> blocked for {ttl // 3600}h{ttl % 3600 // 60:02d}m{repeat}")
+        elif action == "REMOVE" and status != "failed":
+            index.cancel(table, address)
+    index.save(path)
+    return index
+
+
+def sweep_expired(path=EXPIRY_PATH, now=None, sync=False):
+    # Removes every due entry; all removals for a table go out together
+    index = ExpiryIndex.load(path)
+    due = index.pop_due(now)
+    index.prune(now)
+    changes = {}
+    for table, address in due:
+        changes.setdefault(table, {})[address] = "REMOVE"
+    # Also run with nothing due: that retries removals pf rejected last time
+    results = apply_mirrored_changes(changes, sync=sync)
+    for (table, address), (action, status, detail) in results.items():
+        if status == "failed":
+            print(f"[❌] Failed to {action.lower()} {address} <{table}>, will retry: {detail}")
+        elif address in changes.get(table, ()):
+            print(f"[✅] Block expired: {address} <{table}>")
+    index.save(path)
+    return due, results, index.next_expiry()
@@ -1,7 +1,16 @@
+import ipaddress
+import os
 import subprocess
 import re
+import tempfile
 
 PF_CONF_PATH = "logs/test_pf.conf"
+# Set PFCTL to point at a different binary (e.g. a stand-in script for testing)
+PFCTL = os.environ.get("PFCTL", "pfctl")
+
+# Per-address feedback characters printed by `pfctl -vv -T add/delete`
+PFCTL_FEEDBACK = {" ": "unchanged", "M": "matched", "A": "added", "D": "deleted", "C": "changed",
+                  "Z": "cleared", "X": "duplicate", "Y": "conflict"}
 
 def is_valid_pf_rule(rule: str) -> bool:
     rule = rule.strip().lower()
@@ -21,42 +30,135 @@ def normalize_rule(rule):
     return rule
 
 def is_table_command(line):
-    return re.match(r"^\s*(ADD|REMOVE)\s+\S+\s+TO\s+TABLE\s+\S+", line, re.IGNORECASE)
+    return re.match(r"^\s*(ADD|REMOVE)\s+\S+\s+(TO|FROM)\s+TABLE\s+\S+", line, re.IGNORECASE)
 
 def parse_table_command(line):
     # Strip trailing comments
     line = line.split('#')[0].strip()
 
-    match = re.match(r"^(ADD|REMOVE)\s+([\d\.:a-fA-F/]+)\s+TO\s+TABLE\s+(\S+)", line, re.IGNORECASE)
+    match = re.match(r"^(ADD|REMOVE)\s+([\d\.:a-fA-F/]+)\s+(?:TO|FROM)\s+TABLE\s+(\S+)", line, re.IGNORECASE)
     if not match:
         return None
     action, ip, table = match.groups()
     return action.upper(), ip, table
 
-def modify_table(action, ip, table):
-    cmd = ["sudo", "pfctl", "-t", table, "-T" + ("add" if action == "ADD" else "delete"), ip]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode == 0:
-        print(f"[✅] {action.title()}ed {ip} to table <{table}>")
-    else:
-        print(f"[❌] Failed to {action.lower()} {ip} to table <{table}>\n    Reason: {result.stderr.strip()}")
+def pfctl_command(*args):
+    # No sudo when already running as root (`sudo python main.py enforce`)
+    prefix = [] if os.geteuid() == 0 else ["sudo"]
+    return prefix + [PFCTL, *args]
 
-def apply_rule(rule):
+def canonical_address(ip):
+    # pfctl echoes hosts without a prefix length and networks in their
+    # normalised form, so results can be matched back to the input
+    try:
+        if "/" in ip:
+            net = ipaddress.ip_network(ip, strict=False)
+            return str(net.network_address) if net.prefixlen == net.max_prefixlen else str(net)
+        return str(ipaddress.ip_address(ip))
+    except ValueError:
+        return None
+
+def collect_table_changes(commands):
+    # commands: (action, ip, table) tuples in file order. The last operation
+    # on an address wins, so ADD x then REMOVE x leaves only the REMOVE.
+    changes = {}
+    invalid = []
+    for action, ip, table in commands:
+        address = canonical_address(ip)
+        if address is None:
+            invalid.append((action, ip, table))
+            continue
+        ops = changes.setdefault(table, {})
+        ops.pop(address, None)
+        ops[address] = action
+    return changes, invalid
+
+def run_table_op(table, op, addresses):
+    # One pfctl invocation for a whole list of addresses, fed from a file
+    with tempfile.NamedTemporaryFile("w", prefix=f"pf_{table}_", suffix=".txt", delete=False) as f:
+        f.write("\n".join(addresses) + "\n")
+        path = f.name
     try:
-        rule = normalize_rule(rule)
+        result = subprocess.run(pfctl_command("-t", table, "-T", op, "-f", path, "-vv"),
+                                capture_output=True, text=True)
+    finally:
+        os.remove(path)
 
-        with open(PF_CONF_PATH, "r") as f:
-            rules = f.read()
-        if rule in rules:
-            print(f"[ℹ️] Rule already exists, skipping:\n    → {rule}")
-            return
-        if 'port any' in rule or 'port = any' in rule:
-            rule = rule.replace('port any', '').replace('port = any', '').strip()
+    statuses = {}
+    if result.returncode == 0:
+        for line in result.stdout.splitlines():
+            if len(line) > 2 and line[1] == " " and line[0] in PFCTL_FEEDBACK:
+                statuses[line[2:].strip()] = PFCTL_FEEDBACK[line[0]]
+    return result, statuses
 
-        with open(PF_CONF_PATH, "a") as f:
-            f.write("\n" + rule + "\n")
+def apply_table_changes(changes):
+    # Returns {(table, address): (action, status, detail)}; status is one of
+    # the PFCTL_FEEDBACK values, or "failed"
+    results = {}
+    for table, ops in changes.items():
+        for action, op in (("ADD", "add"), ("REMOVE", "delete")):
+            addresses = [address for address, a in ops.items() if a == action]
+            if not addresses:
+                continue
+            result, statuses = run_table_op(table, op, addresses)
+            if result.returncode != 0:
+                reason = result.stderr.strip() or f"pfctl exited with {result.returncode}"
+                for address in addresses:
+                    results[(table, address)] = (action, "failed", reason)
+                print(f"[❌] Failed to {op} {len(addresses)} address(es) in table <{table}>\n    Reason: {reason}")
+                continue
+            for address in addresses:
+                # Without per-address feedback, pfctl accepted it without change
+                results[(table, address)] = (action, statuses.get(address, "unchanged"), "")
+            summary = result.stderr.strip().splitlines()
+            print(f"[✅] <{table}> {op}: {summary[-1] if summary else f'{len(addresses)} address(es)'}")
+    return results
 
-        subprocess.run(["sudo", "pfctl", "-f", PF_CONF_PATH], check=True)
-        print(f"[✅] Rule applied successfully:\n    → {rule}")
+def report_table_results(results, invalid=()):
+    counts = {}
+    for (table, address), (action, status, detail) in results.items():
+        counts[status] = counts.get(status, 0) + 1
+        if status == "failed":
+            print(f"[❌] {action} {address} <{table}>: {detail}")
+        elif status in ("added", "deleted", "changed"):
+            print(f"[✅] {action} {address} <{table}>: {status}")
+        else:
+            print(f"[ℹ️] {action} {address} <{table}>: {status}")
+    for action, ip, table in invalid:
+        counts["invalid"] = counts.get("invalid", 0) + 1
+        print(f"[❌] {action} {ip} <{table}>: not a valid address")
+    print("[+] Table changes: " + (", ".join(f"{k}={v}" for k, v in sorted(counts.items())) or "none"))
+    return counts
+
+def modify_table(action, ip, table):
+    changes, invalid = collect_table_changes([(action, ip, table)])
+    results = apply_table_changes(changes)
+    report_table_results(results, invalid)
+    return results
+
+def apply_rules(rules, path=PF_CONF_PATH):
+    # The whole batch is merged into the conf in memory, written once and
+    # loaded with a single `pfctl -f`
+    from .ruleset import RuleSet
+
+    try:
+        ruleset = RuleSet(path)
+        for status, rule in ruleset.add_many(rules):
+            if status == "duplicate":
+                print(f"[ℹ️] Rule already exists, skipping:\n    → {rule}")
+        applied, result = ruleset.commit()
     except Exception as e:
-        print(f"[❌] Failed to apply rule:\n    → {rule}\n    Reason: {e}")
+        print(f"[❌] Failed to apply {len(rules)} rule(s)\n    Reason: {e}")
+        return []
+
+    if result is not None and result.returncode != 0:
+        reason = result.stderr.strip() or f"pfctl exited with {result.returncode}"
+        for rule in applied:
+            print(f"[❌] Failed to apply rule:\n    → {rule}\n    Reason: {reason}")
+        return []
+    for rule in applied:
+        print(f"[✅] Rule applied successfully:\n    → {rule}")
+    return applied
+
+def apply_rule(rule):
+    return apply_rules([rule])
@@ -0,0 +1,456 @@
+import ipaddress
+import re
+import socket
+
+from .pf_rule_enforcer import PF_CONF_PATH, is_valid_pf_rule, normalize_rule
+from .ruleset import canonical_rule
+
+TOKEN_RE = re.compile(r"<[^>\s]+>|[{},]|!=|<=|>=|><|<>|[<>=!]|[^\s{},!<>=]+")
+# Options after the addresses don't change which packets a rule matches here
+OPTION_WORDS = {"flags", "keep", "modulate", "synproxy", "no", "label", "tag", "tagged", "queue", "rtable", "probability",
+                "max-mss", "allow-opts", "user", "group", "icmp-type", "icmp6-type", "tos", "os", "set", "prio"}
+PORT_OPS = {"=", "!=", "<", ">", "<=", ">="}
+# Port lists up to this size are indexed port by port; anything wider is
+# checked against every lookup on that protocol
+MAX_INDEXED_PORTS = 64
+FULL_PORTS = [(0, 65535)]
+BITS = {4: 32, 6: 128}
+
+
+class PolicyRule:
+    __slots__ = ("index", "text", "source", "action", "direction", "quick", "interface", "af", "protos", "src",
+                 "sport", "dst", "dport")
+
+    def __init__(self, index, text, source):
+        self.index = index
+        self.text = text
+        self.source = source
+        self.direction = self.interface = self.af = self.protos = None
+        self.src = self.sport = self.dst = self.dport = None
+        self.quick = False
+
+    def matches(self, packet, tables):
+        direction, interface, proto, src, sport, dst, dport = packet
+        if self.direction and direction and self.direction != direction:
+            return False
+        if self.interface and interface and self.interface != interface:
+            return False
+        if self.af and src and self.af != src[0]:
+            return False
+        if self.protos and proto not in self.protos:
+            return False
+        return (match_ports(self.sport, sport) and match_ports(self.dport, dport)
+                and match_address(self.src, src, tables) and match_address(self.dst, dst, tables))
+
+
+def parse_address_item(token):
+    # (kind, value): "any", ("net", (version, value, prefixlen)), ("table", name)
+    if token == "any":
+        return "any", None
+    if token.startswith("<") and token.endswith(">"):
+        return "table", token[1:-1]
+    try:
+        net = ipaddress.ip_network(token, strict=False)
+    except ValueError:
+        # self, interface names, hostnames, no-route: not resolvable offline
+        return "unknown", token
+    return "net", (net.version, int(net.network_address) >> (net.max_prefixlen - net.prefixlen), net.prefixlen)
+
+
+def parse_port_item(tokens, i):
+    # Returns ([(lo, hi)], next index); pf ranges are inclusive for ":" and
+    # exclusive for "><" / "<>"
+    def number(token):
+        return int(token) if token.isdigit() else socket.getservbyname(token)
+
+    token = tokens[i]
+    if token == "any":
+        return list(FULL_PORTS), i + 1
+    if token in PORT_OPS:
+        n = number(tokens[i + 1])
+        ranges = {"=": [(n, n)], "!=": [(0, n - 1), (n + 1, 65535)], "<": [(0, n - 1)], "<=": [(0, n)],
+                  ">": [(n + 1, 65535)], ">=": [(n, 65535)]}[token]
+        return [(lo, hi) for lo, hi in ranges if lo <= hi], i + 2
+    if ":" in token:
+        lo, hi = token.split(":", 1)
+        return [(number(lo), number(hi))], i + 1
+    if i + 2 < len(tokens) and tokens[i + 1] in ("><", "<>"):
+        lo, hi = number(token), number(tokens[i + 2])
+        if tokens[i + 1] == "><":
+            return [(lo + 1, hi - 1)], i + 3
+        return [(0, lo - 1), (hi + 1, 65535)], i + 3
+    n = number(token)
+    return [(n, n)], i + 1
+
+
+def parse_list(tokens, i, parse_item):
+    # A { list } or a single item; each item may be negated with "!"
+    items = []
+    if tokens[i] == "{":
+        i += 1
+        while tokens[i] != "}":
+            if tokens[i] == ",":
+                i += 1
+                continue
+            negated = tokens[i] == "!"
+            item, i = parse_item(tokens, i + negated)
+            items.append((negated, item))
+        return items, i + 1
+    negated = tokens[i] == "!"
+    item, i = parse_item(tokens, i + negated)
+    return [(negated, item)], i
+
+
+def parse_address(tokens, i):
+    items, i = parse_list(tokens, i, lambda t, j: (parse_address_item(t[j]), j + 1))
+    if all(kind == "any" and not negated for negated, (kind, _) in items):
+        items = None
+    return items, i
+
+
+def parse_ports(tokens, i):
+    items, i = parse_list(tokens, i, parse_port_item)
+    ranges = []
+    for negated, item in items:
+        ranges += invert_ranges(item) if negated else item
+    return merge_ranges(ranges), i
+
+
+def merge_ranges(ranges):
+    merged = []
+    for lo, hi in sorted(ranges):
+        if merged and lo <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(hi, merged[-1][1]))
+        else:
+            merged.append((lo, hi))
+    return merged
+
+
+def invert_ranges(ranges):
+    out, start = [], 0
+    for lo, hi in merge_ranges(ranges):
+        if lo > start:
+            out.append((start, lo - 1))
+        start = hi + 1
+    if start <= 65535:
+        out.append((start, 65535))
+    return out
+
+
+def parse_rule(text, index=0, source="conf"):
+    tokens = TOKEN_RE.findall(text.split("#")[0])
+    if not tokens or tokens[0] not in ("block", "pass"):
+        raise ValueError("not a block/pass rule")
+    rule = PolicyRule(index, text.strip(), source)
+    rule.action = tokens[0]
+    i = 1
+    while i < len(tokens):
+        token = tokens[i]
+        if token in ("in", "out"):
+            rule.direction = token
+        elif token == "quick":
+            rule.quick = True
+        elif token in ("inet", "inet6"):
+            rule.af = 4 if token == "inet" else 6
+        elif token == "on":
+            i += 1
+            rule.interface = tokens[i]
+        elif token == "proto":
+            items, i = parse_list(tokens, i + 1, lambda t, j: (t[j].lower(), j + 1))
+            rule.protos = frozenset(p for _, p in items)
+            continue
+        elif token == "all":
+            pass
+        elif token in ("from", "to"):
+            address, i = parse_address(tokens, i + 1)
+            ports = None
+            if i < len(tokens) and tokens[i] == "port":
+                ports, i = parse_ports(tokens, i + 1)
+                if ports == FULL_PORTS:
+                    ports = None
+            if token == "from":
+                rule.src, rule.sport = address, ports
+            else:
+                rule.dst, rule.dport = address, ports
+            continue
+        elif token in OPTION_WORDS:
+            break
+        # block drop/return, log and anything unrecognised before the
+        # addresses are skipped
+        i += 1
+    return rule
+
+
+def match_ports(ranges, port):
+    if ranges is None:
+        return True
+    if port is None:
+        # Alerts carry no ports, so a port-specific rule can't be shown to match
+        return False
+    for lo, hi in ranges:
+        if lo <= port <= hi:
+            return True
+    return False
+
+
+def match_address(items, address, tables):
+    if items is None:
+        return True
+    if address is None:
+        return False
+    version, value = address
+    for negated, (kind, item) in items:
+        if kind == "any":
+            hit = True
+        elif kind == "net":
+            v, net, length = item
+            hit = v == version and value >> (BITS[version] - length) == net
+        elif kind == "table":
+            hit = table_covers(tables, item, version, value)
+        else:
+            continue
+        if hit != negated:
+            return True
+    return False
+
+
+def table_covers(tables, name, version, value):
+    mirror = tables.get(name)
+    return mirror is not None and mirror.tries[version].covers(value, BITS[version])
+
+
+class PrefixIndex:
+    # Rules keyed by the source prefixes they name. A lookup masks the
+    # address once per prefix length in use instead of visiting every rule.
+
+    def __init__(self):
+        self.wild = []
+        self.nets = {}
+
+    def add(self, rule_id, items):
+        if items is None or any(negated or kind != "net" for negated, (kind, _) in items):
+            self.wild.append(rule_id)
+            return
+        for _, (_, (version, net, length)) in items:
+            self.nets.setdefault((version, length), {}).setdefault(net, []).append(rule_id)
+
+    def ids(self):
+        yield from self.wild
+        for nets in self.nets.values():
+            for rule_ids in nets.values():
+                yield from rule_ids
+
+    def lookup(self, address, out):
+        out += self.wild
+        if address is None:
+            return
+        version, value = address
+        bits = BITS[version]
+        for (v, length), nets in self.nets.items():
+            if v == version:
+                ids = nets.get(value >> (bits - length))
+                if ids:
+                    out += ids
+
+
+def exact_ports(ranges):
+    if ranges is None or sum(hi - lo + 1 for lo, hi in ranges) > MAX_INDEXED_PORTS:
+        return None
+    return [port for lo, hi in ranges for port in range(lo, hi + 1)]
+
+
+class Policy:
+    # Rules in file order, indexed by (protocol, destination port) and then by
+    # source prefix. Evaluation follows pf: the last matching rule decides
+    # unless an earlier matching rule is `quick`; nothing matching means pass.
+
+    def __init__(self, rules, tables=None):
+        self.rules = rules
+        self.tables = tables or {}
+        self.buckets = {}
+        for rule in rules:
+            for key in self.bucket_keys(rule):
+                self.buckets.setdefault(key, PrefixIndex()).add(rule.index, rule.src)
+
+    def bucket_keys(self, rule):
+        ports = exact_ports(rule.dport)
+        return [(proto, port) for proto in (rule.protos or [None]) for port in (ports or [None])]
+
+    def candidates(self, proto, dport, src):
+        keys = [(proto, None), (None, None)]
+        if dport is not None:
+            keys += [(proto, dport), (None, dport)]
+        ids = []
+        for key in keys:
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                bucket.lookup(src, ids)
+        return sorted(set(ids))
+
+    def evaluate(self, packet):
+        # packet: (direction, interface, proto, (version, src), sport, (version, dst), dport).
+        # Returns (first matching rule, deciding rule, action).
+        first = last = None
+        for rule_id in self.candidates(packet[2], packet[6], packet[3]):
+            rule = self.rules[rule_id]
+            if not rule.matches(packet, self.tables):
+                continue
+            if first is None:
+                first = rule
+            last = rule
+            if rule.quick:
+                break
+        return first, last, last.action if last else "pass"
+
+    def conflicts(self):
+        # (kind, rule, other): "duplicate" of an earlier identical rule,
+        # "shadowed" when an earlier quick rule or a later rule always decides
+        # instead, "redundant" when that rule has the same action anyway
+        found = []
+        seen = {}
+        for rule in self.rules:
+            key = canonical_rule(rule.text)
+            if key in seen:
+                found.append(("duplicate", rule, seen[key]))
+            else:
+                seen[key] = rule
+        duplicates = {id(rule) for _, rule, _ in found}
+        for rule in self.rules:
+            if id(rule) in duplicates:
+                continue
+            for other in self.covering(rule):
+                if other is rule or id(other) in duplicates:
+                    continue
+                if other.index < rule.index and other.quick:
+                    found.append(("shadowed" if other.action != rule.action else "redundant", rule, other))
+                    break
+                if other.index > rule.index and not rule.quick:
+                    found.append(("shadowed" if other.action != rule.action else "redundant", rule, other))
+                    break
+        return found
+
+    def covering(self, rule):
+        # Rules whose match set contains this rule's, from the same buckets a
+        # packet matching this rule would be looked up in
+        # A covering rule allows all of this rule's protocols and ports, so it
+        # sits in the buckets of any one of them
+        proto = min(rule.protos) if rule.protos else None
+        ports = exact_ports(rule.dport)
+        port = ports[0] if ports else None
+        ids = set()
+        for key in {(proto, port), (None, port), (proto, None), (None, None)}:
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                ids.update(bucket.ids())
+        return [self.rules[i] for i in sorted(ids) if covers(self.rules[i], rule)]
+
+
+def covers(a, b):
+    # True if every packet b matches is matched by a
+    if a.direction and a.direction != b.direction:
+        return False
+    if a.interface and a.interface != b.interface:
+        return False
+    if a.af and a.af != b.af:
+        return False
+    if a.protos and not (b.protos and b.protos <= a.protos):
+        return False
+    return (ports_cover(a.sport, b.sport) and ports_cover(a.dport, b.dport)
+            and address_covers(a.src, b.src) and address_covers(a.dst, b.dst))
+
+
+def ports_cover(a, b):
+    if a is None:
+        return True
+    if b is None:
+        return False
+    return all(any(alo <= lo and hi <= ahi for alo, ahi in a) for lo, hi in b)
+
+
+def address_covers(a, b):
+    if a is None or a == b:
+        return True
+    if b is None:
+        return False
+    if any(negated for negated, _ in a) or any(negated for negated, _ in b):
+        return False
+
+    def item_covered(kind, item):
+        for _, (akind, aitem) in a:
+            if akind == "any":
+                return True
+            if kind == akind == "table" and item == aitem:
+                return True
+            if kind == akind == "net":
+                v, net, length = item
+                av, anet, alength = aitem
+                if v == av and alength <= length and net >> (length - alength) == anet:
+                    return True
+        return False
+
+    return all(item_covered(kind, item) for _, (kind, item) in b)
+
+
+def packet_from_flow(flow_key, direction="in", interface=None, cache=None):
+    src, sport, dst, dport, proto = flow_key
+    return (direction, interface, proto.lower(), parse_ip(src, cache), sport, parse_ip(dst, cache), dport)
+
+
+def packet_from_alert(alert, direction="in", interface=None, cache=None):
+    return (direction, interface, str(alert.get("proto", "")).lower(), parse_ip(alert.get("src_ip"), cache), None,
+            parse_ip(alert.get("dest_ip"), cache), None)
+
+
+def parse_ip(text, cache=None):
+    if cache is not None and text in cache:
+        return cache[text]
+    try:
+        address = ipaddress.ip_address(text)
+        parsed = (address.version, int(address))
+    except (TypeError, ValueError):
+        parsed = None
+    if cache is not None:
+        cache[text] = parsed
+    return parsed
+
+
+def load_policy(conf=PF_CONF_PATH, pending=(), tables=None):
+    # The conf as it is, followed by pending suggestions that aren't in it
+    # yet, in the form enforce would append them
+    rules, errors = [], []
+    seen = set()
+    try:
+        with open(conf, "r") as f:
+            conf_lines = f.read().splitlines()
+    except FileNotFoundError:
+        conf_lines = []
+    lines = [(line, "conf") for line in conf_lines if is_valid_pf_rule(line)]
+    for line in conf_lines:
+        if is_valid_pf_rule(line):
+            seen.add(canonical_rule(line))
+    for line in pending:
+        if is_valid_pf_rule(line):
+            text = canonical_rule(normalize_rule(line))
+            if text not in seen:
+                seen.add(text)
+                lines.append((text, "pending"))
+    for text, source in lines:
+        try:
+            rules.append(parse_rule(text, len(rules), source))
+        except (ValueError, IndexError, OSError) as e:
+            errors.append((text, str(e) or "unparseable"))
+    return Policy(rules, tables), errors
+
+
+def simulate(policy, packets):
+    # Returns per-rule decision counts: {rule index or None (default pass): count}
+    # plus first-match counts, so rules that match but never decide stand out
+    decided, first_hits = {}, {}
+    evaluate = policy.evaluate
+    for packet in packets:
+        first, last, action = evaluate(packet)
+        key = last.index if last else None
+        decided[key] = decided.get(key, 0) + 1
+        if first is not None:
+            first_hits[first.index] = first_hits.get(first.index, 0) + 1
+    return decided, first_hits
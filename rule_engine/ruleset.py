@@ -0,0 +1,126 @@
+import ipaddress
+import os
+import re
+import subprocess
+
+from .pf_rule_enforcer import PF_CONF_PATH, is_valid_pf_rule, normalize_rule, pfctl_command
+
+
+def canonical_token(token):
+    # Addresses compare by value: 10.0.0.1/32 == 10.0.0.1, 2001:DB8::1 == 2001:db8::1
+    try:
+        if "/" in token:
+            net = ipaddress.ip_network(token, strict=False)
+            return str(net.network_address) if net.prefixlen == net.max_prefixlen else str(net)
+        return str(ipaddress.ip_address(token))
+    except ValueError:
+        return token
+
+
+def canonical_rule(rule):
+    # Whitespace, "port = N" vs "port N", address spelling and the order of
+    # { list } members don't change what a rule matches, so they don't change
+    # its key either. Everything else is compared token for token.
+    rule = rule.split("#")[0]
+    rule = re.sub(r"([{}])", r" \1 ", rule).replace(",", " ")
+    tokens = []
+    members = None
+    for token in rule.split():
+        if token == "{":
+            members = []
+        elif token == "}" and members is not None:
+            tokens.append("{ " + " ".join(sorted(set(members))) + " }")
+            members = None
+        elif members is not None:
+            members.append(canonical_token(token))
+        else:
+            tokens.append(canonical_token(token))
+    text = " ".join(tokens)
+    text = re.sub(r"\bport = ", "port ", text)
+    text = re.sub(r"\s*\bport any\b", "", text)
+    return text
+
+
+class RuleSet:
+    # In-memory copy of the pf conf. The file is parsed once; every rule line
+    # is indexed by its canonical form so duplicate checks are exact lookups
+    # rather than substring matches. A batch of rules is applied to the copy,
+    # written back with one atomic replace and loaded with one `pfctl -f`.
+
+    def __init__(self, path=PF_CONF_PATH):
+        self.path = path
+        self.lines = []
+        self.index = {}
+        self.pending = []
+        self.stamp = None
+        self.load()
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def load(self):
+        self.lines = []
+        self.index = {}
+        self.stamp = self._file_stamp()
+        if self.stamp is None:
+            return
+        with open(self.path, "r") as f:
+            self.lines = f.read().splitlines()
+        for i, line in enumerate(self.lines):
+            if is_valid_pf_rule(line):
+                self.index.setdefault(canonical_rule(line), i)
+
+    def __contains__(self, rule):
+        return canonical_rule(normalize_rule(rule)) in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def add(self, rule):
+        # Returns (status, rule as written); status is "added" or "duplicate"
+        rule = canonical_rule(normalize_rule(rule))
+        if rule in self.index:
+            return "duplicate", rule
+        self.index[rule] = len(self.lines)
+        self.lines.append(rule)
+        self.pending.append(rule)
+        return "added", rule
+
+    def add_many(self, rules):
+        return [self.add(rule) for rule in rules]
+
+    def write(self):
+        # Someone else (admin_interface) may have appended since we loaded;
+        # pick their lines up instead of overwriting them
+        if self._file_stamp() != self.stamp:
+            pending = self.pending
+            self.load()
+            self.pending = []
+            self.add_many(pending)
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(self.lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.stamp = self._file_stamp()
+
+    def reload(self):
+        return subprocess.run(pfctl_command("-f", self.path), capture_output=True, text=True)
+
+    def commit(self):
+        # One write and one ruleset reload for everything added since the
+        # last commit. Returns (applied rules, pfctl result or None).
+        if not self.pending:
+            return [], None
+        self.write()
+        applied, self.pending = self.pending, []
+        if not applied:
+            return [], None
+        return applied, self.reload()
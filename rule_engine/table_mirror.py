@@ -0,0 +1,320 @@
+import fcntl
+import ipaddress
+import json
+import os
+import subprocess
+import time
+
+from contextlib import contextmanager
+
+from .pf_rule_enforcer import apply_table_changes, canonical_address, pfctl_command
+
+MIRROR_PATH = "logs/pf_tables.json"
+# Share of a block's addresses that must be listed before the block is sent
+# to pf as one CIDR. 1.0 only merges blocks that are fully covered, so the
+# kernel table matches exactly the same addresses, just in fewer entries.
+DENSITY = 1.0
+# Largest block a partial (density < 1) collapse may produce, in host bits:
+# 8 means at most a /24 (IPv4) or /120 (IPv6)
+MAX_SPAN = 8
+
+
+class Node:
+    __slots__ = ("children", "terminal")
+
+    def __init__(self):
+        self.children = [None, None]
+        self.terminal = False
+
+
+class PrefixTrie:
+    # Binary trie over address bits. A terminal node stores a prefix and
+    # covers everything below it, so lookups stop at the first terminal and
+    # cost at most one step per prefix bit.
+
+    def __init__(self, bits):
+        self.bits = bits
+        self.root = Node()
+
+    def _bit(self, value, depth):
+        return (value >> (self.bits - 1 - depth)) & 1
+
+    def covers(self, value, length):
+        node = self.root
+        for depth in range(length):
+            if node.terminal:
+                return True
+            node = node.children[self._bit(value, depth)]
+            if node is None:
+                return False
+        return node.terminal
+
+    def insert(self, value, length):
+        # False if the prefix was already covered
+        node = self.root
+        for depth in range(length):
+            if node.terminal:
+                return False
+            bit = self._bit(value, depth)
+            if node.children[bit] is None:
+                node.children[bit] = Node()
+            node = node.children[bit]
+        if node.terminal:
+            return False
+        # Anything more specific is now redundant; if it already covered the
+        # whole block nothing changes
+        full = self._count(node, self.bits - length) == 1 << (self.bits - length)
+        node.terminal = True
+        node.children = [None, None]
+        return not full
+
+    def _count(self, node, span):
+        if node is None:
+            return 0
+        if node.terminal:
+            return 1 << span
+        return self._count(node.children[0], span - 1) + self._count(node.children[1], span - 1)
+
+    def delete(self, value, length):
+        # Removes the prefix and everything inside it. Removing part of a
+        # stored prefix splits it into the siblings along the path, e.g.
+        # deleting 10.0.0.1 from 10.0.0.0/30 leaves 10.0.0.0 and 10.0.0.2/31.
+        path = []
+        node = self.root
+        for depth in range(length):
+            bit = self._bit(value, depth)
+            if node.terminal:
+                node.terminal = False
+                for d in range(depth, length):
+                    b = self._bit(value, d)
+                    sibling = node.children[1 - b] = Node()
+                    sibling.terminal = True
+                    if d < length - 1:
+                        node.children[b] = Node()
+                        node = node.children[b]
+                return True
+            path.append((node, bit))
+            node = node.children[bit]
+            if node is None:
+                return False
+        if not node.terminal and node.children == [None, None]:
+            return False
+        node.terminal = False
+        node.children = [None, None]
+        # Drop the now empty branch
+        for parent, bit in reversed(path):
+            child = parent.children[bit]
+            if child.terminal or child.children != [None, None]:
+                break
+            parent.children[bit] = None
+        return True
+
+    def entries(self):
+        stack = [(self.root, 0, 0)]
+        while stack:
+            node, value, depth = stack.pop()
+            if node.terminal:
+                yield value, depth
+                continue
+            for bit in (1, 0):
+                child = node.children[bit]
+                if child is not None:
+                    stack.append((child, value | (bit << (self.bits - 1 - depth)), depth + 1))
+
+    def collapse(self, density=DENSITY, max_span=MAX_SPAN):
+        # Prefixes to program into pf: full blocks always merge into their
+        # parent CIDR, partial blocks only up to max_span host bits and once
+        # at least `density` of the block is listed.
+        def visit(node, value, depth):
+            span = self.bits - depth
+            if node.terminal:
+                return 1 << span, [(value, depth)]
+            count, entries, branches = 0, [], 0
+            for bit in (0, 1):
+                child = node.children[bit]
+                if child is not None:
+                    c, e = visit(child, value | (bit << (span - 1)), depth + 1)
+                    count += c
+                    entries += e
+                    branches += 1
+            if count == 1 << span:
+                return count, [(value, depth)]
+            if branches == 2 and span <= max_span and count >= density * (1 << span):
+                return count, [(value, depth)]
+            return count, entries
+
+        return visit(self.root, 0, 0)[1]
+
+
+def parse_prefix(address):
+    net = ipaddress.ip_network(address, strict=False)
+    return net.version, int(net.network_address), net.prefixlen
+
+
+def format_prefix(version, value, length):
+    address = ipaddress.IPv4Address(value) if version == 4 else ipaddress.IPv6Address(value)
+    return str(address) if length == address.max_prefixlen else f"{address}/{length}"
+
+
+class TableMirror:
+    # Local copy of one pf table. `members` is what was asked to be blocked;
+    # `kernel` is what pf holds as of the last apply or sync, which may be
+    # the collapsed form of the members. `managed` is the part of `kernel`
+    # the mirror pushed or took over; nothing else is ever deleted.
+
+    def __init__(self, name, members=(), kernel=(), synced=None, density=DENSITY, managed=None):
+        self.name = name
+        self.tries = {4: PrefixTrie(32), 6: PrefixTrie(128)}
+        self.kernel = set(kernel)
+        self.managed = set(self.kernel if managed is None else managed)
+        self.synced = synced
+        self.density = density
+        for address in members:
+            self.add(address)
+
+    def __contains__(self, address):
+        address = canonical_address(address)
+        if address is None:
+            return False
+        version, value, length = parse_prefix(address)
+        return self.tries[version].covers(value, length)
+
+    def add(self, address):
+        version, value, length = parse_prefix(address)
+        return self.tries[version].insert(value, length)
+
+    def remove(self, address):
+        version, value, length = parse_prefix(address)
+        return self.tries[version].delete(value, length)
+
+    def members(self):
+        return [format_prefix(version, value, length)
+                for version, trie in self.tries.items() for value, length in trie.entries()]
+
+    def desired(self, max_span=MAX_SPAN):
+        return {format_prefix(version, value, length)
+                for version, trie in self.tries.items() for value, length in trie.collapse(self.density, max_span)}
+
+    def diff(self, max_span=MAX_SPAN):
+        desired = self.desired(max_span)
+        return sorted(desired - self.kernel), sorted((self.kernel - desired) & self.managed)
+
+    def as_dict(self):
+        return {"members": self.members(), "kernel": sorted(self.kernel), "managed": sorted(self.managed),
+                "synced": self.synced, "density": self.density}
+
+
+def load_mirrors(path=MIRROR_PATH):
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    return {name: TableMirror(name, t.get("members", ()), t.get("kernel", ()), t.get("synced"),
+                              t.get("density", DENSITY), t.get("managed"))
+            for name, t in data.items()}
+
+
+def save_mirrors(mirrors, path=MIRROR_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({name: mirror.as_dict() for name, mirror in mirrors.items()}, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def mirror_lock(path=MIRROR_PATH):
+    # enforce and the expiry sweep both load, change and save the mirror;
+    # holding this around the whole cycle keeps one from losing the other's
+    # update
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".lock", "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def show_table(table):
+    # Entries pf currently holds, or None if pfctl could not be queried
+    result = subprocess.run(pfctl_command("-t", table, "-T", "show"), capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"[!] Failed to read table <{table}>: {result.stderr.strip() or result.returncode}")
+        return None
+    entries = set()
+    for line in result.stdout.splitlines():
+        # Negated entries ("!10.0.0.1") are not managed by the mirror
+        address = canonical_address(line.strip())
+        if address:
+            entries.add(address)
+    return entries
+
+
+def sync_mirror(mirror):
+    kernel = show_table(mirror.name)
+    if kernel is None:
+        return False
+    # Entries that appeared in pf since the last look (everything, on first
+    # contact) were added by hand or by another tool. They are adopted as
+    # members so the next push doesn't delete them.
+    adopted = kernel - mirror.kernel
+    for address in adopted:
+        mirror.add(address)
+    mirror.managed = (mirror.managed & kernel) | adopted
+    if adopted and mirror.synced is not None:
+        print(f"[ℹ️] <{mirror.name}>: adopted {len(adopted)} entr{'y' if len(adopted) == 1 else 'ies'} "
+              f"added outside enforce")
+    mirror.kernel = kernel
+    mirror.synced = time.time()
+    return True
+
+
+def push_mirror(mirrors, tables=None, max_span=MAX_SPAN):
+    # Brings pf in line with the mirrors using one pfctl call per table and
+    # operation; only prefixes that differ are sent. Returns the failures.
+    changes = {}
+    for name in tables or mirrors:
+        to_add, to_delete = mirrors[name].diff(max_span)
+        ops = {address: "ADD" for address in to_add}
+        ops.update({address: "REMOVE" for address in to_delete})
+        if ops:
+            changes[name] = ops
+    failed = {}
+    for (table, address), (action, status, detail) in apply_table_changes(changes).items():
+        if status == "failed":
+            failed[(table, address)] = (action, status, detail)
+        elif action == "ADD":
+            mirrors[table].kernel.add(address)
+            mirrors[table].managed.add(address)
+        else:
+            mirrors[table].kernel.discard(address)
+            mirrors[table].managed.discard(address)
+    return failed
+
+
+def apply_mirrored_changes(changes, sync=True, density=None, max_span=MAX_SPAN, path=MIRROR_PATH):
+    # changes: {table: {address: action}} from collect_table_changes.
+    # Addresses already covered (or already absent) never reach pfctl.
+    # density, when given, becomes the table's setting for later runs too.
+    mirrors = load_mirrors(path)
+    results = {}
+    for table, ops in changes.items():
+        mirror = mirrors.setdefault(table, TableMirror(table))
+        if density is not None:
+            mirror.density = density
+        if sync:
+            sync_mirror(mirror)
+        for address, action in ops.items():
+            changed = mirror.add(address) if action == "ADD" else mirror.remove(address)
+            if changed:
+                results[(table, address)] = (action, "added" if action == "ADD" else "deleted", "")
+            else:
+                results[(table, address)] = (action, "unchanged",
+                                             "already in table" if action == "ADD" else "not in table")
+    # Every table is pushed, so entries a previous run failed to send are
+    # retried here
+    results.update(push_mirror(mirrors, max_span=max_span))
+    save_mirrors(mirrors, path)
+    return results
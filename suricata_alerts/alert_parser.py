@@ -1,15 +1,109 @@
 import json
 import os
 import csv
+import glob
 from datetime import datetime
+from .alert_store import append_alerts
 
 DEFAULT_EVE_PATH = "/usr/local/var/log/suricata/eve.json"
+CHECKPOINT_PATH = "logs/eve_checkpoint.json"
 
-def parse_suricata_alerts(eve_path=DEFAULT_EVE_PATH, out_csv="suricata_alerts.csv"):
+
+def event_to_alert(event):
+    return {
+        "timestamp": event.get("timestamp", ""),
+        "src_ip": event.get("src_ip", ""),
+        "dest_ip": event.get("dest_ip", ""),
+        "proto": event.get("proto", ""),
+        "signature": event["alert"]["signature"],
+        "severity": event["alert"]["severity"],
+        "sid": event["alert"].get("signature_id", ""),
+    }
+
+
+def write_alerts_csv(alerts, csv_path, append=False):
+    os.makedirs(os.path.dirname(csv_path) or ".", exist_ok=True)
+    fieldnames = list(alerts[0].keys())
+
+    # Keep the column order of an existing file so appended rows stay aligned
+    if append and os.path.exists(csv_path) and os.path.getsize(csv_path) > 0:
+        with open(csv_path, "r", newline="") as f:
+            header = next(csv.reader(f), None)
+        if header:
+            with open(csv_path, "a", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=header, extrasaction="ignore")
+                writer.writerows(alerts)
+            return
+
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(alerts)
+
+
+def load_checkpoint(checkpoint_path=CHECKPOINT_PATH):
+    try:
+        with open(checkpoint_path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_checkpoint(state, checkpoint_path=CHECKPOINT_PATH):
+    os.makedirs(os.path.dirname(checkpoint_path) or ".", exist_ok=True)
+    tmp_path = checkpoint_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def resolve_start_offset(eve_path, checkpoint):
+    st = os.stat(eve_path)
+    offset = checkpoint.get("offset", 0)
+
+    if checkpoint.get("path") != os.path.abspath(eve_path):
+        return 0, "new file"
+    if checkpoint.get("inode") != st.st_ino or checkpoint.get("device") != st.st_dev:
+        return 0, "rotated"
+    if st.st_size < offset:
+        return 0, "truncated"
+    return offset, None
+
+
+def find_rotated_file(eve_path, checkpoint):
+    # logrotate usually renames eve.json to eve.json.1 (or similar); follow the
+    # old inode so lines written just before rotation are not lost.
+    for candidate in sorted(glob.glob(eve_path + ".*")):
+        try:
+            st = os.stat(candidate)
+        except OSError:
+            continue
+        if st.st_ino == checkpoint.get("inode") and st.st_dev == checkpoint.get("device"):
+            return candidate
+    return None
+
+
+def read_new_lines(eve_path, offset):
+    # Only complete lines are consumed; a partially written last line is
+    # picked up on the next run once Suricata has finished it.
+    with open(eve_path, "rb") as f:
+        f.seek(offset)
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            offset += len(raw)
+            yield raw, offset
+
+
+def parse_suricata_alerts(eve_path=DEFAULT_EVE_PATH, out_csv="suricata_alerts.csv",
+                          follow=False, checkpoint_path=CHECKPOINT_PATH):
     if not os.path.exists(eve_path):
         print(f"[!] Suricata eve.json not found at: {eve_path}")
         return []
 
+    if follow:
+        return follow_suricata_alerts(eve_path, out_csv, checkpoint_path)
+
     alerts = []
     total_lines = 0
     alert_lines = 0
@@ -22,28 +116,76 @@ def parse_suricata_alerts(eve_path=DEFAULT_EVE_PATH, out_csv="suricata_alerts.cs
                 event = json.loads(line)
                 if event.get("event_type") == "alert":
                     alert_lines += 1
-                    alerts.append({
-                        "timestamp": event.get("timestamp", ""),
-                        "src_ip": event.get("src_ip", ""),
-                        "dest_ip": event.get("dest_ip", ""),
-                        "proto": event.get("proto", ""),
-                        "signature": event["alert"]["signature"],
-                        "severity": event["alert"]["severity"],
-                    })
+                    alerts.append(event_to_alert(event))
             except json.JSONDecodeError:
                 skipped_lines += 1
 
+    stored = 0
     if alerts:
-        os.makedirs("logs", exist_ok=True)
-        csv_path = os.path.join("logs", out_csv)
-        with open(csv_path, "w", newline="") as f:
-            writer = csv.DictWriter(f, fieldnames=alerts[0].keys())
-            writer.writeheader()
-            writer.writerows(alerts)
+        write_alerts_csv(alerts, os.path.join("logs", out_csv))
+        stored = append_alerts(alerts)
 
     print(f"[+] Total lines read: {total_lines}")
     print(f"[+] Alerts parsed:    {len(alerts)} / {alert_lines} potential alert lines")
     print(f"[!] Malformed lines skipped: {skipped_lines}")
-    print(f"[+] Alerts saved to: logs/{out_csv}")
+    print(f"[+] Alerts saved to: logs/{out_csv} ({stored} new in alert store)")
+
+    return alerts
+
+
+def follow_suricata_alerts(eve_path=DEFAULT_EVE_PATH, out_csv="suricata_alerts.csv",
+                           checkpoint_path=CHECKPOINT_PATH):
+    checkpoint = load_checkpoint(checkpoint_path)
+    offset, reset_reason = resolve_start_offset(eve_path, checkpoint)
+    if reset_reason:
+        print(f"[*] eve.json {reset_reason}, reading from the beginning")
+    else:
+        print(f"[*] Resuming eve.json at byte {offset}")
+
+    st = os.stat(eve_path)
+    sources = []
+    if reset_reason == "rotated":
+        rotated = find_rotated_file(eve_path, checkpoint)
+        if rotated:
+            print(f"[*] Draining rotated log: {rotated}")
+            sources.append((rotated, checkpoint.get("offset", 0)))
+    sources.append((eve_path, offset))
+
+    alerts = []
+    total_lines = 0
+    skipped_lines = 0
+    bytes_read = 0
+
+    for path, start in sources:
+        new_offset = start
+        for raw, new_offset in read_new_lines(path, start):
+            total_lines += 1
+            try:
+                event = json.loads(raw)
+                if event.get("event_type") == "alert":
+                    alerts.append(event_to_alert(event))
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                skipped_lines += 1
+        bytes_read += new_offset - start
+
+    # Without a checkpoint the whole file was read, so start the CSV afresh
+    csv_path = os.path.join("logs", out_csv)
+    stored = 0
+    if alerts:
+        write_alerts_csv(alerts, csv_path, append=reset_reason != "new file")
+        stored = append_alerts(alerts)
+
+    save_checkpoint({
+        "path": os.path.abspath(eve_path),
+        "inode": st.st_ino,
+        "device": st.st_dev,
+        "offset": new_offset,
+        "updated": datetime.now().isoformat(),
+    }, checkpoint_path)
+
+    print(f"[+] New lines read: {total_lines} ({bytes_read} bytes)")
+    print(f"[+] New alerts:     {len(alerts)}")
+    print(f"[!] Malformed lines skipped: {skipped_lines}")
+    print(f"[+] Alerts appended to: {csv_path} ({stored} new in alert store)")
 
     return alerts
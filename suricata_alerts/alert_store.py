@@ -0,0 +1,218 @@
+import os
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+ALERT_DB_PATH = "logs/alerts.db"
+ALERT_FIELDS = ["timestamp", "src_ip", "dest_ip", "proto", "signature", "severity", "sid"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY,
+    ts_epoch REAL NOT NULL,
+    timestamp TEXT NOT NULL,
+    src_ip TEXT,
+    dest_ip TEXT,
+    proto TEXT,
+    signature TEXT,
+    severity INTEGER,
+    sid INTEGER
+);
+CREATE UNIQUE INDEX IF NOT EXISTS alerts_dedup ON alerts (timestamp, src_ip, dest_ip, proto, signature);
+CREATE INDEX IF NOT EXISTS alerts_ts ON alerts (ts_epoch);
+CREATE INDEX IF NOT EXISTS alerts_sev_ts ON alerts (severity, ts_epoch);
+CREATE INDEX IF NOT EXISTS alerts_src_ts ON alerts (src_ip, ts_epoch);
+CREATE INDEX IF NOT EXISTS alerts_dest_ts ON alerts (dest_ip, ts_epoch);
+CREATE INDEX IF NOT EXISTS alerts_sig_ts ON alerts (signature, ts_epoch);
+"""
+
+
+def to_epoch(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        try:
+            dt = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if dt.tzinfo is None:
+        dt = dt.astimezone()
+    return dt.timestamp()
+
+
+def connect(db_path=ALERT_DB_PATH):
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    # WAL lets the dashboard and API read while the parser is appending
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    migrate(conn)
+    return conn
+
+
+def migrate(conn):
+    # Stores created before signature ids were parsed lack the sid column
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(alerts)")}
+    if "sid" not in columns:
+        conn.execute("ALTER TABLE alerts ADD COLUMN sid INTEGER")
+    conn.execute("CREATE INDEX IF NOT EXISTS alerts_sid_ts ON alerts (sid, ts_epoch)")
+
+
+def append_alerts(alerts, db_path=ALERT_DB_PATH):
+    if not alerts:
+        return 0
+    rows = []
+    for alert in alerts:
+        ts_epoch = to_epoch(alert.get("timestamp"))
+        rows.append((
+            ts_epoch if ts_epoch is not None else 0.0,
+            alert.get("timestamp", ""),
+            alert.get("src_ip", ""),
+            alert.get("dest_ip", ""),
+            alert.get("proto", ""),
+            alert.get("signature", ""),
+            int(alert["severity"]) if str(alert.get("severity", "")).isdigit() else None,
+            int(alert["sid"]) if str(alert.get("sid", "")).isdigit() else None,
+        ))
+
+    conn = connect(db_path)
+    try:
+        with conn:
+            before = conn.total_changes
+            # Re-parsing the same eve.json is idempotent thanks to the dedup index
+            conn.executemany(
+                "INSERT OR IGNORE INTO alerts (ts_epoch, timestamp, src_ip, dest_ip, proto, signature, severity, sid) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            inserted = conn.total_changes - before
+    finally:
+        conn.close()
+    return inserted
+
+
+def alert_filters(since=None, until=None, last=None, src_ip=None, dest_ip=None, signature=None,
+                  signature_prefix=None, severity=None, max_severity=None, sid=None, after_id=None):
+    clauses = []
+    params = []
+    if last is not None:
+        since = datetime.now(timezone.utc) - timedelta(seconds=float(last))
+    if since is not None:
+        clauses.append("ts_epoch >= ?")
+        params.append(to_epoch(since))
+    if until is not None:
+        clauses.append("ts_epoch < ?")
+        params.append(to_epoch(until))
+    if src_ip:
+        clauses.append("src_ip = ?")
+        params.append(src_ip)
+    if dest_ip:
+        clauses.append("dest_ip = ?")
+        params.append(dest_ip)
+    if signature:
+        clauses.append("signature = ?")
+        params.append(signature)
+    if signature_prefix:
+        # A range on the indexed column rather than LIKE, which SQLite won't index
+        clauses.append("signature >= ? AND signature < ?")
+        params.extend([signature_prefix, signature_prefix + "\uffff"])
+    if severity is not None:
+        clauses.append("severity = ?")
+        params.append(int(severity))
+    if max_severity is not None:
+        clauses.append("severity <= ?")
+        params.append(int(max_severity))
+    if sid is not None:
+        clauses.append("sid = ?")
+        params.append(int(sid))
+    if after_id is not None:
+        clauses.append("id > ?")
+        params.append(int(after_id))
+    return clauses, params
+
+
+def where(clauses):
+    return " WHERE " + " AND ".join(clauses) if clauses else ""
+
+
+def query_alerts(db_path=ALERT_DB_PATH, limit=None, newest_first=False, include_id=False, **filters):
+    if not os.path.exists(db_path):
+        return []
+
+    clauses, params = alert_filters(**filters)
+    sql = "SELECT " + ", ".join((["id"] if include_id else []) + ALERT_FIELDS) + " FROM alerts" + where(clauses)
+    if filters.get("after_id") is not None:
+        # Reading on from a checkpoint goes in insertion order, so a limit
+        # leaves the rest for the next read
+        sql += " ORDER BY id"
+    else:
+        sql += " ORDER BY ts_epoch DESC, id DESC" if newest_first else " ORDER BY ts_epoch, id"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+
+    conn = connect(db_path)
+    try:
+        return [dict(row) for row in conn.execute(sql, params)]
+    finally:
+        conn.close()
+
+
+def page_alerts(db_path=ALERT_DB_PATH, limit=None, cursor=None, **filters):
+    # Pages in insertion order like the file-backed endpoints: a limit alone
+    # returns the newest rows, `cursor` (an alert id from next_cursor or
+    # prev_cursor) returns rows from that id on. next_cursor at the end is
+    # past the newest id, so polling with it returns only new alerts.
+    clauses, params = alert_filters(**filters)
+    select = "SELECT id, " + ", ".join(ALERT_FIELDS) + " FROM alerts"
+    conn = connect(db_path)
+    try:
+        total = conn.execute("SELECT COUNT(*) FROM alerts" + where(clauses), params).fetchone()[0]
+        if cursor is not None:
+            sql = select + where(clauses + ["id >= ?"]) + " ORDER BY id"
+            args = params + [int(cursor)]
+        elif limit is not None:
+            sql = select + where(clauses) + " ORDER BY id DESC"
+            args = list(params)
+        else:
+            sql = select + where(clauses) + " ORDER BY id"
+            args = list(params)
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(int(limit))
+        rows = [dict(row) for row in conn.execute(sql, args)]
+        if cursor is None and limit is not None:
+            rows.reverse()
+
+        next_cursor = prev_cursor = None
+        if rows:
+            next_cursor = conn.execute("SELECT MIN(id) FROM alerts" + where(clauses + ["id > ?"]),
+                                       params + [rows[-1]["id"]]).fetchone()[0]
+            if limit is not None:
+                prev_cursor = conn.execute("SELECT MIN(id) FROM (SELECT id FROM alerts" + where(clauses + ["id < ?"])
+                                           + " ORDER BY id DESC LIMIT ?)",
+                                           params + [rows[0]["id"], int(limit)]).fetchone()[0]
+        if next_cursor is None:
+            newest = conn.execute("SELECT MAX(id) FROM alerts").fetchone()[0] or 0
+            next_cursor = max(newest + 1, int(cursor) if cursor is not None else 0)
+    finally:
+        conn.close()
+
+    for row in rows:
+        del row["id"]
+    return rows, {"total": total, "next_cursor": next_cursor, "prev_cursor": prev_cursor}
+
+
+def max_alert_id(db_path=ALERT_DB_PATH):
+    if not os.path.exists(db_path):
+        return 0
+    conn = connect(db_path)
+    try:
+        return conn.execute("SELECT MAX(id) FROM alerts").fetchone()[0] or 0
+    finally:
+        conn.close()
@@ -0,0 +1,110 @@
+import json
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .alert_parser import DEFAULT_EVE_PATH, event_to_alert, write_alerts_csv
+from .alert_store import append_alerts
+
+# Every alert event carries both "event_type":"alert" and an "alert" object,
+# so any line without this token can be dropped before json.loads. Other
+# event types (flow, dns, tls, stats) practically never contain it.
+ALERT_MARKER = b'"alert"'
+COUNT_BLOCK = 64 * 1024 * 1024
+
+
+def split_chunks(path, workers, min_chunk=8 * 1024 * 1024):
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+
+    n_chunks = max(1, min(workers * 4, size // min_chunk or 1))
+    target = size // n_chunks
+
+    bounds = []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        while start < size:
+            end = min(start + target, size)
+            if end < size:
+                newline = mm.find(b"\n", end)
+                end = size if newline == -1 else newline + 1
+            bounds.append((start, end))
+            start = end
+    return bounds
+
+
+def scan_chunk(path, start, end):
+    alerts = []
+    alert_lines = 0
+    skipped_lines = 0
+    total_lines = 0
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for block_start in range(start, end, COUNT_BLOCK):
+            total_lines += mm[block_start:min(block_start + COUNT_BLOCK, end)].count(b"\n")
+        if end > start and mm[end - 1:end] != b"\n":
+            total_lines += 1
+
+        pos = start
+        while pos < end:
+            hit = mm.find(ALERT_MARKER, pos, end)
+            if hit == -1:
+                break
+            line_start = max(mm.rfind(b"\n", pos, hit) + 1, pos)
+            line_end = mm.find(b"\n", hit, end)
+            if line_end == -1:
+                line_end = end
+            pos = line_end + 1
+
+            try:
+                event = json.loads(mm[line_start:line_end])
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                skipped_lines += 1
+                continue
+            if event.get("event_type") == "alert":
+                alert_lines += 1
+                alerts.append(event_to_alert(event))
+
+    return alerts, total_lines, alert_lines, skipped_lines
+
+
+def parse_suricata_alerts_bulk(eve_path=DEFAULT_EVE_PATH, out_csv="suricata_alerts.csv", workers=None):
+    if not os.path.exists(eve_path):
+        print(f"[!] Suricata eve.json not found at: {eve_path}")
+        return []
+
+    workers = workers or os.cpu_count() or 1
+    chunks = split_chunks(eve_path, workers)
+    print(f"[*] Bulk parsing {eve_path} in {len(chunks)} chunks with {workers} workers")
+
+    alerts = []
+    total_lines = 0
+    alert_lines = 0
+    skipped_lines = 0
+
+    if workers == 1 or len(chunks) <= 1:
+        results = [scan_chunk(eve_path, start, end) for start, end in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # map() yields in submission order, so alerts keep their file order
+            starts, ends = zip(*chunks)
+            results = list(executor.map(scan_chunk, [eve_path] * len(chunks), starts, ends))
+
+    for chunk_alerts, lines, hits, skipped in results:
+        alerts.extend(chunk_alerts)
+        total_lines += lines
+        alert_lines += hits
+        skipped_lines += skipped
+
+    stored = 0
+    if alerts:
+        write_alerts_csv(alerts, os.path.join("logs", out_csv))
+        stored = append_alerts(alerts)
+
+    print(f"[+] Total lines read: {total_lines}")
+    print(f"[+] Alerts parsed:    {len(alerts)} / {alert_lines} potential alert lines")
+    print(f"[!] Malformed alert lines skipped: {skipped_lines}")
+    print(f"[+] Alerts saved to: logs/{out_csv} ({stored} new in alert store)")
+
+    return alerts
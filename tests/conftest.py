@@ -0,0 +1,103 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+import stat
+
+import pytest
+
+from rule_engine import pf_rule_enforcer
+
+# Stand-in pfctl put first on PATH. It keeps its tables in state.json next
+# to it, answers `-t <table> -T add|delete -f <file> -vv` with pfctl's
+# per-address feedback and `-T show` with one entry per line.
+STUB = """#!{python}
+import json, os, sys
+here = os.path.dirname(os.path.abspath(__file__))
+config = json.load(open(os.path.join(here, "config.json")))
+args = sys.argv[1:]
+with open(os.path.join(here, "calls.json"), "a") as log:
+    log.write(json.dumps({{"args": args, "input": open(args[args.index("-f") + 1]).read().split() if "-f" in args else []}}) + "\\n")
+if config.get("fail"):
+    print(config["fail"], file=sys.stderr)
+    sys.exit(1)
+state_path = os.path.join(here, "state.json")
+state = json.load(open(state_path)) if os.path.exists(state_path) else {{}}
+table, op = args[args.index("-t") + 1], args[args.index("-T") + 1]
+current = set(state.get(table, []))
+if op == "show":
+    for address in sorted(current):
+        print("   " + address)
+    sys.exit(0)
+addresses = open(args[args.index("-f") + 1]).read().split()
+changed = 0
+for address in addresses:
+    if address in config.get("conflict", []):
+        print("Y " + address)
+    elif address in config.get("silent", []):
+        continue
+    elif op == "add":
+        print(("A " if address not in current else "  ") + address)
+        changed += address not in current
+        current.add(address)
+    else:
+        print(("D " if address in current else "  ") + address)
+        changed += address in current
+        current.discard(address)
+state[table] = sorted(current)
+json.dump(state, open(state_path, "w"))
+print("{{}}/{{}} addresses {{}}.".format(changed, len(addresses), "added" if op == "add" else "deleted"), file=sys.stderr)
+"""
+
+
+class StubPfctl:
+    def __init__(self, directory):
+        self.directory = directory
+        self.configure()
+
+    def configure(self, **config):
+        with open(os.path.join(self.directory, "config.json"), "w") as f:
+            json.dump(config, f)
+
+    def set_table(self, table, addresses):
+        with open(os.path.join(self.directory, "state.json"), "w") as f:
+            json.dump({table: sorted(addresses)}, f)
+
+    def table(self, table):
+        path = os.path.join(self.directory, "state.json")
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return json.load(f).get(table, [])
+
+    def add_by_hand(self, table, address):
+        path = os.path.join(self.directory, "state.json")
+        state = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+        state[table] = sorted(set(state.get(table, [])) | {address})
+        with open(path, "w") as f:
+            json.dump(state, f)
+
+    def calls(self):
+        path = os.path.join(self.directory, "calls.json")
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return [json.loads(line) for line in f]
+
+
+@pytest.fixture
+def pfctl(tmp_path, monkeypatch):
+    path = tmp_path / "pfctl"
+    path.write_text(STUB.format(python=sys.executable))
+    path.chmod(path.stat().st_mode | stat.S_IXUSR)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ.get('PATH', '')}")
+    monkeypatch.setattr(pf_rule_enforcer, "PFCTL", "pfctl")
+    # Run the stub directly instead of through sudo
+    monkeypatch.setattr(os, "geteuid", lambda: 0)
+    return StubPfctl(str(tmp_path))
+
+
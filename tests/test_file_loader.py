@@ -0,0 +1,116 @@
+# tests/test_file_loader.py
+
+import json
+import os
+import time
+
+import pytest
+
+from backend.utils import file_loader
+from backend.utils.file_loader import load_csv, load_json_lines, load_parsed, load_text
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    file_loader._cache.clear()
+    yield
+    file_loader._cache.clear()
+
+
+def write(path, text, age=60):
+    with open(path, "w") as f:
+        f.write(text)
+    # Old enough to count as settled unless age=0
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+
+
+def append(path, text, age=60):
+    with open(path, "a") as f:
+        f.write(text)
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+
+
+def history(n, start=0):
+    return "".join(json.dumps({"timestamp": f"2026-10-18T10:00:{i:02d}", "n": i}) + "\n" for i in range(start, n))
+
+
+def test_whole_file_without_trailing_newline(tmp_path):
+    text = tmp_path / "summary.txt"
+    write(text, "===\n[2026-10-18T10:00:00] a\n---\nfirst\n===\n[2026-10-18T10:00:01] b\n---\nlast line")
+    assert load_text(str(text))["content"].endswith("last line")
+
+    jsonl = tmp_path / "history.json"
+    write(jsonl, history(3) + json.dumps({"n": 3}))
+    assert [e["n"] for e in load_json_lines(str(jsonl))["entries"]] == [0, 1, 2, 3]
+
+    csv_path = tmp_path / "alerts.csv"
+    write(csv_path, "timestamp,src_ip\n2026-10-18T10:00:00,1.1.1.1\n2026-10-18T10:00:01,2.2.2.2")
+    assert [r["src_ip"] for r in load_csv(str(csv_path))["data"]] == ["1.1.1.1", "2.2.2.2"]
+
+
+def test_unterminated_line_being_written_is_held_back_then_completed(tmp_path):
+    path = tmp_path / "history.json"
+    write(path, history(2) + '{"n": 2, "timest', age=0)
+    # Just written: the partial line is not parsed yet
+    assert [e["n"] for e in load_json_lines(str(path))["entries"]] == [0, 1]
+    # Unchanged on the next look: it is taken as complete (and here invalid)
+    assert [e["n"] for e in load_json_lines(str(path))["entries"]] == [0, 1]
+
+    append(path, 'amp": "2026-10-18T10:00:02"}\n')
+    entries = load_json_lines(str(path))["entries"]
+    assert [e["n"] for e in entries] == [0, 1, 2]
+
+
+def test_provisional_text_line_is_undone_when_it_grows(tmp_path):
+    path = tmp_path / "rules.txt"
+    write(path, "===\n[2026-10-18T10:00:00] a\nADD 1.2.3")
+    assert load_text(str(path))["content"].endswith("ADD 1.2.3")
+    append(path, ".4 TO TABLE suspicious_ips\n===\n[2026-10-18T10:00:05] b\n")
+    page = load_text(str(path))
+    assert page["content"].count("ADD 1.2.3") == 1
+    assert "ADD 1.2.3.4 TO TABLE suspicious_ips" in page["content"]
+    assert page["total"] == 2
+
+
+def test_limit_returns_newest_and_cursors_page(tmp_path):
+    path = tmp_path / "history.json"
+    write(path, history(10))
+    page = load_json_lines(str(path), limit=3)
+    assert [e["n"] for e in page["entries"]] == [7, 8, 9]
+    assert page["total"] == 10
+
+    older = load_json_lines(str(path), limit=3, cursor=page["prev_cursor"])
+    assert [e["n"] for e in older["entries"]] == [4, 5, 6]
+    newer = load_json_lines(str(path), limit=3, cursor=older["next_cursor"])
+    assert [e["n"] for e in newer["entries"]] == [7, 8, 9]
+
+    # Polling with the last next_cursor returns only what was appended
+    assert load_json_lines(str(path), limit=3, cursor=page["next_cursor"])["entries"] == []
+    append(path, history(12, start=10))
+    assert [e["n"] for e in load_json_lines(str(path), cursor=page["next_cursor"])["entries"]] == [10, 11]
+
+
+def test_since_filters_by_timestamp(tmp_path):
+    path = tmp_path / "history.json"
+    write(path, history(10))
+    page = load_json_lines(str(path), since="2026-10-18T10:00:07")
+    assert [e["n"] for e in page["entries"]] == [7, 8, 9]
+
+
+def test_appends_are_parsed_incrementally_and_rewrites_from_scratch(tmp_path):
+    path = tmp_path / "history.json"
+    write(path, history(3))
+    entry = load_parsed(str(path), "jsonl")
+    append(path, history(5, start=3))
+    assert load_parsed(str(path), "jsonl") is entry
+    assert [e["n"] for e in entry.records] == [0, 1, 2, 3, 4]
+
+    # Same inode, larger, but the end of the parsed part changed: parsed again
+    write(path, history(6).replace('"n": 4', '"n": 9'))
+    assert [e["n"] for e in load_parsed(str(path), "jsonl").records] == [0, 1, 2, 3, 9, 5]
+
+
+def test_missing_file_is_an_error(tmp_path):
+    assert load_text(str(tmp_path / "missing.txt"))["status"] == "error"
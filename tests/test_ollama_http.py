@@ -0,0 +1,163 @@
+# tests/test_ollama_http.py
+#
+# OllamaClient and call_ollama against a local http.server stub standing in
+# for the Ollama API.
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from llm_reasoner.ollama_http import OllamaClient, OllamaError
+from llm_reasoner.reasoner import call_ollama
+
+
+class StubOllama(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.requests = []
+        self.connections = set()
+        self.statuses = []    # status to answer with, one per request; 200 once empty
+        self.delay = 0
+        self.in_flight = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server = self.server
+        with server.lock:
+            server.requests.append(payload)
+            server.connections.add(self.client_address)
+            status = server.statuses.pop(0) if server.statuses else 200
+            server.in_flight += 1
+            server.peak = max(server.peak, server.in_flight)
+        if server.delay:
+            time.sleep(server.delay)
+        with server.lock:
+            server.in_flight -= 1
+        body = json.dumps({"response": f"echo: {payload['prompt']}"} if status == 200 else {"error": "stub"})
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = StubOllama()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_client(stub, **kwargs):
+    kwargs.setdefault("backoff", 0)
+    return OllamaClient(host=f"127.0.0.1:{stub.server_address[1]}", **kwargs)
+
+
+def test_generate_returns_response_and_payload(stub):
+    client = make_client(stub)
+    assert client.generate("mistral", "hello", options={"num_ctx": 4096}) == "echo: hello"
+    assert stub.requests == [{"model": "mistral", "prompt": "hello", "stream": False, "options": {"num_ctx": 4096}}]
+    client.close()
+
+
+def test_sequential_requests_reuse_one_connection(stub):
+    client = make_client(stub)
+    for i in range(5):
+        assert client.generate("mistral", f"p{i}") == f"echo: p{i}"
+    assert len(stub.requests) == 5
+    assert len(stub.connections) == 1
+    client.close()
+
+
+def test_concurrent_requests_are_bounded_by_pool(stub):
+    # 8 threads share a client with 2 slots: no more than 2 requests are
+    # ever open and only 2 sockets are created
+    stub.delay = 0.05
+    client = make_client(stub, pool_size=2)
+    results = {}
+
+    def worker(i):
+        results[i] = client.generate("mistral", f"p{i}")
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == {i: f"echo: p{i}" for i in range(8)}
+    assert len(stub.requests) == 8
+    assert stub.peak == 2
+    assert len(stub.connections) == 2
+    client.close()
+
+
+def test_server_errors_are_retried(stub):
+    stub.statuses = [500, 503]
+    client = make_client(stub, retries=2)
+    assert client.generate("mistral", "hello") == "echo: hello"
+    assert len(stub.requests) == 3
+
+
+def test_retries_give_up_after_limit(stub):
+    stub.statuses = [500, 500, 500]
+    client = make_client(stub, retries=1)
+    with pytest.raises(OllamaError):
+        client.generate("mistral", "hello")
+    assert len(stub.requests) == 2
+
+
+def test_client_errors_are_not_retried(stub):
+    stub.statuses = [404]
+    client = make_client(stub, retries=3)
+    with pytest.raises(OllamaError) as e:
+        client.generate("mistral", "hello")
+    assert not e.value.retryable
+    assert len(stub.requests) == 1
+
+
+def test_timeout_is_retried_then_raised(stub):
+    stub.delay = 0.5
+    client = make_client(stub, timeout=0.1, retries=1)
+    started = time.monotonic()
+    with pytest.raises(OllamaError, match="timed out"):
+        client.generate("mistral", "hello")
+    assert time.monotonic() - started < 0.5 * 2
+    assert len(stub.requests) == 2
+
+
+def test_call_ollama_uses_client_settings(stub):
+    # Nothing passed through call_ollama: the client's timeout and retries apply
+    stub.statuses = [500, 500, 500]
+    client = make_client(stub, retries=3)
+    assert call_ollama("mistral", "hello", client=client) == "echo: hello"
+    assert len(stub.requests) == 4
+
+    stub.delay = 0.3
+    stub.requests.clear()
+    client = make_client(stub, timeout=0.05, retries=0)
+    assert call_ollama("mistral", "hello", client=client).startswith("[!] Error calling mistral")
+    assert len(stub.requests) == 1
+
+
+def test_call_ollama_arguments_override_client(stub):
+    stub.statuses = [500]
+    client = make_client(stub, retries=3)
+    assert call_ollama("mistral", "hello", client=client, retries=0).startswith("[!] Error calling mistral")
+    assert len(stub.requests) == 1
@@ -0,0 +1,85 @@
+# tests/test_pf_table_batch.py
+#
+# Batched table updates against the stand-in pfctl from conftest.py.
+
+from rule_engine.pf_rule_enforcer import apply_table_changes, collect_table_changes, modify_table
+
+def test_collect_last_operation_wins_and_canonicalizes():
+    changes, invalid = collect_table_changes([
+        ("ADD", "10.0.0.1", "t"),
+        ("ADD", "10.0.0.0/24", "t"),
+        ("REMOVE", "10.0.0.1/32", "t"),
+        ("ADD", "not-an-ip", "t"),
+        ("ADD", "2001:db8::0001", "u"),
+    ])
+    assert changes == {"t": {"10.0.0.1": "REMOVE", "10.0.0.0/24": "ADD"}, "u": {"2001:db8::1": "ADD"}}
+    assert invalid == [("ADD", "not-an-ip", "t")]
+
+
+def test_one_call_per_table_and_operation(pfctl):
+    pfctl.set_table("t", ["10.0.0.9"])
+    changes, _ = collect_table_changes([("ADD", "10.0.0.1", "t"), ("ADD", "10.0.0.2", "t"),
+                                        ("REMOVE", "10.0.0.9", "t"), ("ADD", "10.0.0.3", "u")])
+    apply_table_changes(changes)
+
+    calls = [(c["args"][1], c["args"][3], c["input"]) for c in pfctl.calls()]
+    assert sorted(calls) == [("t", "add", ["10.0.0.1", "10.0.0.2"]), ("t", "delete", ["10.0.0.9"]),
+                             ("u", "add", ["10.0.0.3"])]
+    assert all(c["args"][4] == "-f" and c["args"][-1] == "-vv" for c in pfctl.calls())
+
+
+def test_added_unchanged_and_deleted_entries(pfctl):
+    pfctl.set_table("t", ["10.0.0.1", "10.0.0.5"])
+    changes, _ = collect_table_changes([("ADD", "10.0.0.1", "t"), ("ADD", "10.0.0.2", "t"),
+                                        ("REMOVE", "10.0.0.5", "t"), ("REMOVE", "10.0.0.6", "t")])
+    results = apply_table_changes(changes)
+
+    assert results == {
+        ("t", "10.0.0.1"): ("ADD", "unchanged", ""),
+        ("t", "10.0.0.2"): ("ADD", "added", ""),
+        ("t", "10.0.0.5"): ("REMOVE", "deleted", ""),
+        ("t", "10.0.0.6"): ("REMOVE", "unchanged", ""),
+    }
+    assert pfctl.table("t") == ["10.0.0.1", "10.0.0.2"]
+
+
+def test_rejected_and_unreported_entries(pfctl):
+    # Y (conflict) is reported per address; an address pfctl says nothing
+    # about was accepted without change
+    pfctl.configure(conflict=["10.0.0.3"], silent=["10.0.0.4"])
+    changes, _ = collect_table_changes([("ADD", "10.0.0.2", "t"), ("ADD", "10.0.0.3", "t"),
+                                        ("ADD", "10.0.0.4", "t")])
+    results = apply_table_changes(changes)
+
+    assert results[("t", "10.0.0.2")] == ("ADD", "added", "")
+    assert results[("t", "10.0.0.3")] == ("ADD", "conflict", "")
+    assert results[("t", "10.0.0.4")] == ("ADD", "unchanged", "")
+
+
+def test_failed_call_fails_every_address_in_it(pfctl):
+    pfctl.set_table("t", ["10.0.0.9"])
+    pfctl.configure(fail="pfctl: Table does not exist.")
+    changes, _ = collect_table_changes([("ADD", "10.0.0.1", "t"), ("ADD", "10.0.0.2", "t"),
+                                        ("REMOVE", "10.0.0.9", "t")])
+    results = apply_table_changes(changes)
+
+    assert results == {
+        ("t", "10.0.0.1"): ("ADD", "failed", "pfctl: Table does not exist."),
+        ("t", "10.0.0.2"): ("ADD", "failed", "pfctl: Table does not exist."),
+        ("t", "10.0.0.9"): ("REMOVE", "failed", "pfctl: Table does not exist."),
+    }
+    # Both operations were still attempted
+    assert len(pfctl.calls()) == 2
+    assert pfctl.table("t") == ["10.0.0.9"]
+
+
+def test_failed_call_without_stderr_reports_exit_status(pfctl):
+    pfctl.configure(fail=" ")
+    changes, _ = collect_table_changes([("ADD", "10.0.0.1", "t")])
+    assert apply_table_changes(changes) == {("t", "10.0.0.1"): ("ADD", "failed", "pfctl exited with 1")}
+
+
+def test_modify_table_reports_results(pfctl, capsys):
+    results = modify_table("ADD", "10.0.0.7", "t")
+    assert results == {("t", "10.0.0.7"): ("ADD", "added", "")}
+    assert "added=1" in capsys.readouterr().out
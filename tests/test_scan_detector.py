@@ -0,0 +1,51 @@
+# tests/test_scan_detector.py
+
+from anomaly_detection.scan_detector import ScanDetector, detect_scans
+from flow_sniffer.flow_table import FlowStats
+
+START = 1_700_000_000.0
+
+
+def flow(ts, packets=1):
+    stats = FlowStats(ts)
+    stats.last_seen = ts
+    stats.packets = packets
+    return stats
+
+
+def vertical_scan(src="10.0.0.66", dst="10.0.0.1", ports=499, start=START):
+    return {(src, 40000, dst, port, "TCP"): flow(start + i * 0.01) for i, port in enumerate(range(1, ports + 1))}
+
+
+def benign(start, count=20):
+    return {(f"10.0.1.{i}", 50000 + i, "10.0.0.1", 443, "TCP"): flow(start + i) for i in range(count)}
+
+
+def test_vertical_scan_alone_is_reported():
+    findings = detect_scans(vertical_scan())
+    assert [fid for fid, _ in findings] == ["10.0.0.66 -> * (scan)"]
+    assert findings[0][1].startswith("Vertical scan")
+
+
+def test_scan_followed_by_later_traffic_is_still_reported():
+    # The later flows move the window far past the scan; it must have been
+    # evaluated before its window was dropped
+    flows = vertical_scan()
+    flows.update(benign(START + 3600))
+    findings = detect_scans(flows)
+    assert [fid for fid, _ in findings] == ["10.0.0.66 -> * (scan)"]
+
+
+def test_streamed_batches_report_each_scan_once():
+    detector = ScanDetector()
+    first = detector.update(vertical_scan())
+    assert len(first) == 1
+    # Same window, nothing new from the scanner
+    assert detector.update(benign(START + 5)) == []
+    # A second scan an hour later is reported on its own
+    assert [fid for fid, _ in detector.update(vertical_scan(src="10.0.0.77", start=START + 3600))] == \
+        ["10.0.0.77 -> * (scan)"]
+
+
+def test_benign_traffic_is_not_reported():
+    assert detect_scans(benign(START, count=200)) == []
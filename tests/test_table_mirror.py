@@ -0,0 +1,58 @@
+# tests/test_table_mirror.py
+#
+# Mirror sync and push against the stand-in pfctl from conftest.py.
+
+import json
+
+from rule_engine.table_mirror import apply_mirrored_changes, load_mirrors
+
+
+def apply(tmp_path, ops, table="suspicious_ips", **kwargs):
+    return apply_mirrored_changes({table: ops}, path=str(tmp_path / "pf_tables.json"), **kwargs)
+
+
+def test_entries_added_by_hand_are_adopted_not_deleted(pfctl, tmp_path):
+    apply(tmp_path, {"1.1.1.1": "ADD"})
+    pfctl.add_by_hand("suspicious_ips", "9.9.9.9")
+    results = apply(tmp_path, {"2.2.2.2": "ADD"})
+
+    assert pfctl.table("suspicious_ips") == ["1.1.1.1", "2.2.2.2", "9.9.9.9"]
+    assert ("suspicious_ips", "9.9.9.9") not in results
+    mirror = load_mirrors(str(tmp_path / "pf_tables.json"))["suspicious_ips"]
+    assert "9.9.9.9" in mirror
+    assert all("9.9.9.9" not in call["input"] for call in pfctl.calls() if "delete" in call["args"])
+
+
+def test_adopted_entry_can_still_be_removed(pfctl, tmp_path):
+    apply(tmp_path, {"1.1.1.1": "ADD"})
+    pfctl.add_by_hand("suspicious_ips", "9.9.9.9")
+    results = apply(tmp_path, {"9.9.9.9": "REMOVE"})
+
+    assert results[("suspicious_ips", "9.9.9.9")][:2] == ("REMOVE", "deleted")
+    assert pfctl.table("suspicious_ips") == ["1.1.1.1"]
+
+
+def test_first_contact_adopts_existing_table(pfctl, tmp_path):
+    pfctl.set_table("suspicious_ips", ["5.5.5.5"])
+    apply(tmp_path, {"6.6.6.6": "ADD"})
+    assert pfctl.table("suspicious_ips") == ["5.5.5.5", "6.6.6.6"]
+
+
+def test_collapsed_prefixes_replace_pushed_hosts(pfctl, tmp_path):
+    apply(tmp_path, {f"10.0.0.{i}": "ADD" for i in range(0, 4)})
+    assert pfctl.table("suspicious_ips") == ["10.0.0.0/30"]
+
+    # Removing one host splits the prefix the mirror pushed
+    apply(tmp_path, {"10.0.0.3": "REMOVE"})
+    assert sorted(pfctl.table("suspicious_ips")) == ["10.0.0.0/31", "10.0.0.2"]
+
+
+def test_only_entries_the_mirror_knew_are_deleted(pfctl, tmp_path):
+    # A mirror file from before `managed` was tracked owns its kernel view:
+    # 3.3.3.3 is no longer a member and goes, while 4.4.4.4, which it never
+    # saw (no sync), stays
+    path = tmp_path / "pf_tables.json"
+    path.write_text(json.dumps({"suspicious_ips": {"members": [], "kernel": ["3.3.3.3"], "synced": 1}}))
+    pfctl.set_table("suspicious_ips", ["3.3.3.3", "4.4.4.4"])
+    apply(tmp_path, {"7.7.7.7": "ADD"}, sync=False)
+    assert pfctl.table("suspicious_ips") == ["4.4.4.4", "7.7.7.7"]
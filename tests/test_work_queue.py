@@ -0,0 +1,41 @@
+# tests/test_work_queue.py
+
+from llm_reasoner.aggregator import aggregate_alerts
+from llm_reasoner.work_queue import drop_reloaded, merge_deferred
+
+
+def alert(second, src="1.1.1.1", severity="2"):
+    return {"timestamp": f"2026-10-18T10:{second // 60:02d}:{second % 60:02d}", "src_ip": src,
+            "dest_ip": "2.2.2.2", "proto": "TCP", "signature": "ET SCAN", "severity": severity}
+
+
+def next_cycle(raw, deferred):
+    return merge_deferred(aggregate_alerts(drop_reloaded(raw, deferred)), deferred)
+
+
+DEFERRED = aggregate_alerts([alert(0, severity="1"), alert(10), alert(20)])
+
+
+def test_fully_reloaded_group_is_counted_once():
+    [group] = next_cycle([alert(0), alert(10), alert(20), alert(30), alert(40)], DEFERRED)
+    assert group["count"] == 5
+    assert (group["first_seen"], group["last_seen"]) == ("2026-10-18T10:00:00", "2026-10-18T10:00:40")
+
+
+def test_partly_reloaded_group_keeps_alerts_before_the_window():
+    # The window starts at 10s: the deferred alert at 0s is kept, 10s and
+    # 20s are not counted twice, 30s is new
+    [group] = next_cycle([alert(10), alert(20), alert(30)], DEFERRED)
+    assert group["count"] == 4
+    assert group["first_seen"] == "2026-10-18T10:00:00"
+    assert group["severity"] == "1"
+
+
+def test_disjoint_window_adds_up():
+    [group] = next_cycle([alert(100), alert(110)], DEFERRED)
+    assert group["count"] == 5
+
+
+def test_other_flows_are_untouched():
+    groups = next_cycle([alert(5, src="9.9.9.9")], DEFERRED)
+    assert [(g["src_ip"], g["count"]) for g in groups] == [("1.1.1.1", 3), ("9.9.9.9", 1)]